@@ -0,0 +1,122 @@
+"""
+================================================================================
+ Module: answerCache.py
+ Description:
+        Cache of parsed correct answers shared by all answer checkers. The
+        stored answer of an example is parsed once into a number, a fraction
+        or variables with their values, so checking an attempt only compares
+        the student answer with the parsed form. The cache is bounded (least
+        recently used answers are dropped) and cleared when the catalogue
+        version changes, which happens whenever examples or answers are
+        created, edited or deleted.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+import re
+import threading
+from fractions import Fraction
+from cachetools import LRUCache
+from .models import Answer
+from .catalogue import get_catalogue_version
+
+# Maximum number of cached answers
+ANSWER_CACHE_SIZE = 10000
+
+NUMBER_PATTERN = re.compile(r'^[0-9,.-]+$')
+FRACTION_PATTERN = re.compile(r"\\frac\{(\d+)\}\{(\d+)\}")
+
+# Parse a number written with decimal comma or point (None if it is not a number)
+def parse_number(text):
+    if not NUMBER_PATTERN.match(text):
+        return None
+
+    try:
+        return float(text.replace(',', '.'))
+    except ValueError:
+        return None
+
+# Correct answer of an example in all the forms the checkers compare
+class CompiledAnswer:
+
+    def __init__(self, text):
+        self.text = text
+
+        # Inline answer
+        self.number = parse_number(text)
+
+        # Fraction answer in Latex (\frac{numerator}{denominator})
+        self.numerator = None
+        self.denominator = None
+        self.fraction = None
+
+        match = FRACTION_PATTERN.match(text)
+        if match:
+            self.numerator = int(match.group(1))
+            self.denominator = int(match.group(2))
+
+            if self.denominator:
+                self.fraction = Fraction(self.numerator, self.denominator)
+
+        # Variable answer (x = 1; y = 2) as variable values in the order of the answer
+        self.variables = {}
+
+        for variable in text.split(';'):
+            if not variable.strip():
+                continue
+
+            name, _, value = variable.partition('=')
+            value = parse_number(value.strip())
+
+            if value is None:
+                self.variables = None
+                break
+
+            self.variables[name.strip()] = value
+
+_answers = LRUCache(maxsize=ANSWER_CACHE_SIZE)
+_answers_version = None
+_answers_lock = threading.Lock()
+
+# Drop the cached answers if the catalogue changed since they were cached
+def check_version():
+    global _answers_version
+
+    version = get_catalogue_version()
+
+    if version != _answers_version:
+        _answers.clear()
+        _answers_version = version
+
+# Get the parsed correct answer of the example
+def get_compiled_answer(example_id):
+    example_id = int(example_id)
+
+    with _answers_lock:
+        check_version()
+        version = _answers_version
+        compiled = _answers.get(example_id)
+
+    if compiled is None:
+        answer = Answer.objects.filter(example_id=example_id).order_by('id').first()
+
+        if answer is None:
+            raise Answer.DoesNotExist(f"Example {example_id} has no answer")
+
+        compiled = CompiledAnswer(answer.answer)
+
+        # Answer loaded before a catalogue change is not cached
+        with _answers_lock:
+            if _answers_version == version:
+                _answers[example_id] = compiled
+
+    return compiled
+
+# Parse and cache answers of examples which are going to be practiced ({example_id: answer text})
+def prewarm_compiled_answers(answers):
+    with _answers_lock:
+        check_version()
+
+        for example_id, text in answers.items():
+            if example_id not in _answers:
+                _answers[example_id] = CompiledAnswer(text)
@@ -8,20 +8,15 @@
 ================================================================================
 """
 
-from django.shortcuts import get_object_or_404
-from django.db import transaction
+from django.http import Http404
+from channels.db import database_sync_to_async
 import math
 import re
-from .models import StudentExample, Answer
-
-# Configuration of Gemini API
-from be.settings import GEMINI_API_KEY
-import google.generativeai as genai
-genai.configure(api_key=GEMINI_API_KEY)
-
-# Exception for handling Gemini API rate limits
-class GeminiRateLimitError(Exception):
-    pass
+from .answerCache import get_compiled_answer, parse_number
+from .spokenNumbers import parse_spoken_number, parse_spoken_fraction, parse_spoken_variables
+from .records import record_attempt, should_continue
+from .verdictCache import get_cached_verdict, cache_verdict
+from .geminiClient import gemini_client, GeminiRateLimitError
 
 # Base class for all answer-checking logic
 class AnswerChecker:
@@ -33,24 +28,18 @@ class AnswerChecker:
 
     @staticmethod
     def updateRecord(student_id, example_id, date, duration, correct):
-        # Updates the students attempt record for a example and returns if new example can be displayed
-        record = get_object_or_404(StudentExample, student_id=student_id, example_id=example_id, date=date)
-
-        try:
-            with transaction.atomic():
-                record.attempts += 1
-
-            record.duration = duration
+        # Answer of a practice session is only evaluated, its attempt is sent in a batch of the session
+        if date is None:
+            return None
 
-            record.solved = correct
-
-            record.save()
+        # Updates the students attempt record for a example and returns if new example can be displayed
+        attempts = record_attempt(student_id, example_id, date, duration, correct)
 
-            # If the student made 3 attempts or the answer is correct, new example can be displayed
-            return record.attempts == 3 or correct
+        if attempts is None:
+            raise Http404("No StudentExample matches the given query.")
 
-        except Exception as e:
-            print({"error": str(e)})
+        # If the student made 3 attempts or the answer is correct, new example can be displayed
+        return should_continue(attempts, correct)
 
     @staticmethod
     def compareAnswers(student_answer, correct_answer):
@@ -61,25 +50,10 @@ class AnswerChecker:
     @staticmethod
     def compareAnswersWithGemini(correct_answer, student_answer, prompt):
         # Uses Gemini API to compare students answer transcription with correct answer
-        try:
-            model = genai.GenerativeModel("gemini-2.0-flash") 
-            response = model.generate_content(prompt)
-
-            # Check for API rate limit to use different class for evaluation
-            if "quota" in response.text.lower() or "limit" in response.text.lower():
-                raise GeminiRateLimitError("API rate limit reached")
-
-            if(response.text.strip().lower() == "true"):
-                return True
-            else:
-                return False 
-        
-        except Exception as e:
-            # Check for API rate limit to use different class for evaluation
-            if "429" in str(e) or "quota" in str(e).lower():
-                raise GeminiRateLimitError("API rate limit reached")
-            else:
-                raise 
+        # (raises GeminiRateLimitError when Gemini cannot be used and the answer has to be evaluated locally)
+        response_text = gemini_client.generate(prompt)
+
+        return response_text.strip().lower() == "true"
         
 # Checks inline numerical answers
 class InlineAnswerChecker(AnswerChecker):
@@ -88,19 +62,18 @@ class InlineAnswerChecker(AnswerChecker):
     @staticmethod
     def verifyAnswer(student_id, example_id, date, duration, student_answer):   
 
-        correct_answer = Answer.objects.get(example_id=example_id).answer
+        correct_answer = get_compiled_answer(example_id).number
         
         # Validate both answers
-        if not InlineAnswerChecker.is_valid_answer(correct_answer) or not InlineAnswerChecker.is_valid_answer(student_answer) or not student_answer:
+        if correct_answer is None or not student_answer or not InlineAnswerChecker.is_valid_answer(student_answer):
             continue_with_next = AnswerChecker.updateRecord(student_id, example_id, date, duration, False)
             return (False, continue_with_next)
         
         # Normalize decimal format
-        correct_answer = float(correct_answer.replace(',', '.'))
-        student_answer = float(student_answer.replace(',', '.'))
+        student_answer = parse_number(student_answer)
         
         # Compare and update record
-        if AnswerChecker.compareAnswers(student_answer, correct_answer):
+        if student_answer is not None and AnswerChecker.compareAnswers(student_answer, correct_answer):
             # Correct answer
             continue_with_next = AnswerChecker.updateRecord(student_id, example_id, date, duration, True)
             return (True, continue_with_next)
@@ -116,30 +89,26 @@ class FractionAnswerChecker(AnswerChecker):
     @staticmethod
     def verifyAnswer(student_id, example_id, date, duration, student_answer):   
 
-        correct_answer = Answer.objects.get(example_id=example_id).answer
-
-        match = re.match(r"\\frac\{(\d+)\}\{(\d+)\}", correct_answer)
+        correct_answer = get_compiled_answer(example_id).fraction
 
-        # Extract numerator and denominator from the correct answers
-        if match:
-            correct_numerator = float(match.group(1).replace(',', '.'))
-            correct_denominator = float(match.group(2).replace(',', '.'))
-        else:
+        if correct_answer is None:
             print("Invalid fraction format.")
         
         # Validate students answer and extract numerator and denominator  
         if(FractionAnswerChecker.is_valid_answer(student_answer[0]) and FractionAnswerChecker.is_valid_answer(student_answer[1])):  
-            student_numerator = float(student_answer[0].replace(',', '.'))
-            student_denominator = float(student_answer[1].replace(',', '.'))
+            student_numerator = parse_number(student_answer[0])
+            student_denominator = parse_number(student_answer[1])
         else:
+            student_numerator = student_denominator = None
+
+        if correct_answer is None or student_numerator is None or not student_denominator:
             continue_with_next = FractionAnswerChecker.updateRecord(student_id, example_id, date, duration, False)
             return (False, continue_with_next)
         
         student_answer = student_numerator / student_denominator
-        correct_answer = correct_numerator / correct_denominator
 
         # Compare and update record
-        if AnswerChecker.compareAnswers(correct_answer, student_answer):
+        if AnswerChecker.compareAnswers(float(correct_answer), student_answer):
             # Correct answer
             continue_with_next = FractionAnswerChecker.updateRecord(student_id, example_id, date, duration, True)
             return (True, continue_with_next)
@@ -155,33 +124,29 @@ class VariableAnswerChecker(AnswerChecker):
     @staticmethod
     def verifyAnswer(student_id, example_id, date, duration, student_answer):   
 
-        correct_answer = Answer.objects.get(example_id=example_id).answer
+        # Values of the variables in the order of the correct answer
+        correct_variables = get_compiled_answer(example_id).variables
 
-        # Extract variables and their values from the correct answer
-        correct_variables = correct_answer.split(';')
-        correct_variables = [variable.strip() for variable in correct_variables if variable.strip()]
+        if correct_variables is None:
+            continue_with_next = FractionAnswerChecker.updateRecord(student_id, example_id, date, duration, False)
+            return (False, continue_with_next)
 
-        correct_values = []
+        correct_values = list(correct_variables.values())
         student_values = []
 
-        # Extract the correct values from the correct answer
-        for variable in correct_variables:
-            value = variable.split('=')[1].strip()
-            correct_values.append(float(value.replace(',', '.'))) 
-
         # Validate and extract values from the students answer
         for value in student_answer:
 
-            if not value or not VariableAnswerChecker.is_valid_answer(value):
+            if not value or not VariableAnswerChecker.is_valid_answer(value) or parse_number(value) is None:
                 continue_with_next = FractionAnswerChecker.updateRecord(student_id, example_id, date, duration, False)
                 return (False, continue_with_next)
 
-            student_values.append(float(value.replace(',', '.')))
+            student_values.append(parse_number(value))
         
         # Compare each value
         for i in range(len(correct_values)):
 
-            if not AnswerChecker.compareAnswers(correct_values[i], student_values[i]):
+            if i >= len(student_values) or not AnswerChecker.compareAnswers(correct_values[i], student_values[i]):
                 # One of the values does not match - incorrect answer
                 continue_with_next = FractionAnswerChecker.updateRecord(student_id, example_id, date, duration, False)
                 return (False, continue_with_next)
@@ -196,19 +161,37 @@ class InlineSpeechAnswerChecker(AnswerChecker):
 
     @staticmethod
     def verifyAnswer(student_id, example_id, date, duration, student_answer):   
-        correct_answer = Answer.objects.get(example_id=example_id).answer
+        result = InlineSpeechAnswerChecker.evaluate(get_compiled_answer(example_id), student_answer)
 
-        try:
-            correct_answer = float(correct_answer.replace(",", "."))
-        except ValueError:
+        if result is None:
             return (False, False)
 
+        is_correct, correct_number = result
+        continue_with_next = InlineSpeechAnswerChecker.updateRecord(student_id, example_id, date, duration, is_correct)
+
+        return (is_correct, continue_with_next, correct_number)
+
+    @staticmethod
+    def evaluate(correct_answer, student_answer):
+        # Compares the spoken answer with the parsed correct answer without updating the record
+        # Returns (is correct, number to display) or None if the correct answer is not a number
+        correct_answer = correct_answer.number
+
+        if correct_answer is None:
+            return None
+
         student_answer = student_answer.replace(",", ".")
 
         # Extract all numbers from the spoken answer
         numbers_in_answer = re.findall(r'\d+\.\d+|\d+', student_answer)
         extracted_numbers = [float(num) for num in numbers_in_answer]
 
+        # Number said by words (dvacet jedna)
+        if not extracted_numbers:
+            spoken_number = parse_spoken_number(student_answer)
+            if spoken_number is not None:
+                extracted_numbers = [spoken_number]
+
         correct_number = None
         is_correct = False
 
@@ -223,104 +206,150 @@ class InlineSpeechAnswerChecker(AnswerChecker):
         if not is_correct and extracted_numbers:
             correct_number = extracted_numbers[-1] 
 
-        continue_with_next = InlineSpeechAnswerChecker.updateRecord(student_id, example_id, date, duration, is_correct)
-
-        return (is_correct, continue_with_next, correct_number)
+        return (is_correct, correct_number)
 
 # Checks spoken fraction-based answers
 class FractionSpeechAnswerChecker(AnswerChecker):
+
+    @staticmethod
+    def canEvaluate(example_id, student_answer):
+        return FractionSpeechAnswerChecker.canEvaluateAnswer(get_compiled_answer(example_id), student_answer)
+
+    @staticmethod
+    def canEvaluateAnswer(correct_answer, student_answer):
+        # Answer is one fraction which can be evaluated without LLM
+        return correct_answer.fraction is not None and parse_spoken_fraction(student_answer) is not None
     
     @staticmethod
     def verifyAnswer(student_id, example_id, date, duration, student_answer):   
-        correct_answer = Answer.objects.get(example_id=example_id).answer
-        print(student_answer)
-        match = re.match(r"\\frac\{(\d+)\}\{(\d+)\}", correct_answer)
-        
-        # Extract numerator and denominator from the correct answers
-        if match:
-            correct_numerator = float(match.group(1).replace(',', '.'))
-            correct_denominator = float(match.group(2).replace(',', '.'))
-        else:
-            return (False, False) 
+        result = FractionSpeechAnswerChecker.evaluate(get_compiled_answer(example_id), student_answer)
 
-        # Extract all numbers from the spoken answer
-        numbers_in_answer = re.findall(r'\d+\.\d+|\d+', student_answer)
+        if result is None:
+            return (False, False)
+
+        is_correct, fraction = result
+        continue_with_next = FractionSpeechAnswerChecker.updateRecord(student_id, example_id, date, duration, is_correct)
+
+        return (is_correct, continue_with_next, fraction)
+
+    @staticmethod
+    def evaluate(correct_answer, student_answer):
+        # Compares the spoken answer with the parsed correct answer without updating the record
+        # Returns (is correct, fraction to display) or None if there is no fraction to compare
+
+        # Numerator and denominator of the correct answer
+        if correct_answer.numerator is None:
+            return None
+
+        correct_numerator = float(correct_answer.numerator)
+        correct_denominator = float(correct_answer.denominator)
 
-        if not numbers_in_answer:
-            return (False, False) 
+        # Fraction said by words or digits (tři čtvrtiny, 3/4)
+        spoken_fraction = parse_spoken_fraction(student_answer)
 
-        student_fractions = []
-        i = 0
-        # Create fractions from extracted numbers in pairs (numerator, denominator)
-        while i < len(numbers_in_answer) - 1:
-            numerator = float(numbers_in_answer[i].replace(',', '.'))
-            denominator = float(numbers_in_answer[i+1].replace(',', '.'))
-            student_fractions.append((numerator, denominator))
-            i += 2 
+        if spoken_fraction is not None:
+            student_fractions = [(float(spoken_fraction[0]), float(spoken_fraction[1]))]
+
+        else:
+            # Extract all numbers from the spoken answer
+            numbers_in_answer = re.findall(r'\d+\.\d+|\d+', student_answer)
+
+            student_fractions = []
+            i = 0
+            # Create fractions from extracted numbers in pairs (numerator, denominator)
+            while i < len(numbers_in_answer) - 1:
+                numerator = float(numbers_in_answer[i].replace(',', '.'))
+                denominator = float(numbers_in_answer[i+1].replace(',', '.'))
+                student_fractions.append((numerator, denominator))
+                i += 2 
+
+        if not student_fractions:
+            return None
 
         # Compare each fraction with the correct answer
         for student_numerator, student_denominator in student_fractions:
             if (AnswerChecker.compareAnswers(correct_numerator, student_numerator) and 
                 AnswerChecker.compareAnswers(correct_denominator, student_denominator)):
                 # Correct answer
-                continue_with_next = FractionSpeechAnswerChecker.updateRecord(student_id, example_id, date, duration, True)
-                return (True, continue_with_next, {"numerator": student_numerator, "denominator": student_denominator})
+                return (True, {"numerator": student_numerator, "denominator": student_denominator})
         # Incorrect answer
-        continue_with_next = FractionSpeechAnswerChecker.updateRecord(student_id, example_id, date, duration, False)
-        return (False, continue_with_next, {"numerator": student_fractions[-1][0], "denominator": student_fractions[-1][1]})
+        return (False, {"numerator": student_fractions[-1][0], "denominator": student_fractions[-1][1]})
 
 # Checks spoken variable-based answers
 class VariableSpeechAnswerChecker(AnswerChecker):
+
+    @staticmethod
+    def canEvaluate(example_id, student_answer):
+        return VariableSpeechAnswerChecker.canEvaluateAnswer(get_compiled_answer(example_id), student_answer)
+
+    @staticmethod
+    def canEvaluateAnswer(correct_answer, student_answer):
+        # Answer consists of variable assignments which can be evaluated without LLM
+        # (variables of the correct answer are single letters which can be said)
+        correct_variables = correct_answer.variables
+
+        return bool(correct_variables) and all(len(name) == 1 and name.isalpha() for name in correct_variables) and \
+            parse_spoken_variables(student_answer) is not None
     
     @staticmethod   
     def verifyAnswer(student_id, example_id, date, duration, student_answer):
+        is_correct, student_values = VariableSpeechAnswerChecker.evaluate(get_compiled_answer(example_id), student_answer)
 
-        correct_answer = Answer.objects.get(example_id=example_id).answer
-        correct_variables = correct_answer.split(';')
-        correct_variables = [variable.strip() for variable in correct_variables if variable.strip()]
+        # Record is updated as correct only if all values match
+        continue_with_next = VariableSpeechAnswerChecker.updateRecord(student_id, example_id, date, duration, is_correct)
+        return (is_correct, continue_with_next, student_values)
 
-        correct_values = []
-        student_values = []
-        
-        # Extract the values from the correct answer
-        for variable in correct_variables:
-            value = variable.split('=')[1].strip()  # Extract value after '='
-            correct_values.append(float(value.replace(',', '.')))  # Store as float
+    @staticmethod
+    def evaluate(correct_answer, student_answer):
+        # Compares the spoken answer with the parsed correct answer without updating the record
+        # Returns (is correct, values to display)
+
+        # Values of the variables in the correct answer
+        correct_variables = correct_answer.variables or {}
+        correct_values = list(correct_variables.values())
+
+        # Variables said by words or digits (x se rovná minus pět)
+        spoken_variables = parse_spoken_variables(student_answer)
+
+        if spoken_variables is not None:
+            student_values = list(spoken_variables.values())
+            correct_by_name = {name.lower(): value for name, value in correct_variables.items()}
+
+            # Each variable has to have the correct value
+            is_correct = bool(correct_by_name) and correct_by_name.keys() == spoken_variables.keys() and all(
+                AnswerChecker.compareAnswers(correct_by_name[name], value) for name, value in spoken_variables.items()
+            )
 
-        # Extract values from the spoken answer
-        student_matches = re.findall(r"([a-zA-Z]+)\s*(rovná se|je)\s*([\d,]+)", student_answer, re.IGNORECASE)
-        
-        for match in student_matches:
-            student_value_str = match[2].replace(',', '.')  
-            try:
-                student_value = float(student_value_str) 
-            except ValueError:
-                student_value = 0.0
-            student_values.append(student_value)
-
-        # Compare sorted lists of values
-        if sorted(correct_values) == sorted(student_values): 
-            # All values match - correct answer
-            continue_with_next = VariableSpeechAnswerChecker.updateRecord(student_id, example_id, date, duration, True)
-            return (True, continue_with_next, student_values)
         else:
-            # One of the values does not match - incorrect answer
-            continue_with_next = VariableSpeechAnswerChecker.updateRecord(student_id, example_id, date, duration, False)
-            return (False, continue_with_next, student_values)
+            student_values = []
+
+            # Extract values from the spoken answer
+            student_matches = re.findall(r"([a-zA-Z]+)\s*(rovná se|je)\s*([\d,]+)", student_answer, re.IGNORECASE)
+            
+            for match in student_matches:
+                student_value_str = match[2].replace(',', '.')  
+                try:
+                    student_value = float(student_value_str) 
+                except ValueError:
+                    student_value = 0.0
+                student_values.append(student_value)
+
+            # Compare sorted lists of values
+            is_correct = bool(correct_values) and sorted(correct_values) == sorted(student_values)
+
+        return (is_correct, student_values)
 
 # Checks spoken answer using LLM (Gemini)
 class LLMAnswerChecker(AnswerChecker):
     
     @staticmethod
-    def verifyAnswer(student_id, example_id, date, duration, student_answer, input_type):
-        correct_answer = Answer.objects.get(example_id=example_id).answer
-
+    def getPrompt(correct_answer, student_answer, input_type):
         # Choose prompt based on the input type
         if input_type == "fraction":
-            prompt = f"""There is a math example with answer written in Latex: {correct_answer}, the user told the answer by voice in czech language: {student_answer}. 
+            return f"""There is a math example with answer written in Latex: {correct_answer}, the user told the answer by voice in czech language: {student_answer}. 
                          Is the users answer correct? Answer just true or false."""
         elif input_type == "variable":
-            prompt = f"""Evaluate LaTeX math answer. 
+            return f"""Evaluate LaTeX math answer. 
                         Correct answer in LaTeX: {correct_answer}
                         User's Czech voice answer: {student_answer}
 
@@ -331,13 +360,60 @@ class LLMAnswerChecker(AnswerChecker):
 
                         Respond only "true" or "false"."""
 
-        is_correct = LLMAnswerChecker.compareAnswersWithGemini(correct_answer, student_answer, prompt)
+    @staticmethod
+    def verifyLocally(student_id, example_id, date, duration, student_answer, input_type):
+        # Gemini cannot be used now (rate limit, open circuit, failed request) - evaluate the answer by script
+        if input_type == "fraction":
+            return FractionSpeechAnswerChecker.verifyAnswer(student_id, example_id, date, duration, student_answer)
+        return VariableSpeechAnswerChecker.verifyAnswer(student_id, example_id, date, duration, student_answer)
+
+    @staticmethod
+    def verifyAnswer(student_id, example_id, date, duration, student_answer, input_type):
+        correct_answer = get_compiled_answer(example_id).text
+        prompt = LLMAnswerChecker.getPrompt(correct_answer, student_answer, input_type)
+
+        # Same transcript of the same answer was already evaluated by LLM
+        is_correct = get_cached_verdict(correct_answer, input_type, student_answer)
+
+        if is_correct is None:
+            try:
+                is_correct = LLMAnswerChecker.compareAnswersWithGemini(correct_answer, student_answer, prompt)
+
+            except GeminiRateLimitError as e:
+                print(f"{input_type} evaluated without Gemini: {e}")
+                return LLMAnswerChecker.verifyLocally(student_id, example_id, date, duration, student_answer, input_type)
+
+            cache_verdict(correct_answer, input_type, student_answer, is_correct)
             
-        if(is_correct):
-            # Correct answer
-            continue_with_next = LLMAnswerChecker.updateRecord(student_id, example_id, date, duration, True)
-            return (True, continue_with_next, "")
-        else:
-            # Incorrect answer
-            continue_with_next = LLMAnswerChecker.updateRecord(student_id, example_id, date, duration, False)
-            return (False, continue_with_next, "")
\ No newline at end of file
+        continue_with_next = LLMAnswerChecker.updateRecord(student_id, example_id, date, duration, is_correct)
+        return (is_correct, continue_with_next, "")
+
+    @staticmethod
+    async def verifyAnswerAsync(student_id, example_id, date, duration, student_answer, input_type):
+        # Database is used from worker threads, Gemini request is awaited without blocking a thread
+        correct_answer = (await database_sync_to_async(get_compiled_answer, thread_sensitive=False)(example_id)).text
+        prompt = LLMAnswerChecker.getPrompt(correct_answer, student_answer, input_type)
+
+        is_correct = await database_sync_to_async(get_cached_verdict, thread_sensitive=False)(
+            correct_answer, input_type, student_answer
+        )
+
+        if is_correct is None:
+            try:
+                response_text = await gemini_client.generate_async(prompt)
+                is_correct = response_text.strip().lower() == "true"
+
+            except GeminiRateLimitError as e:
+                print(f"{input_type} evaluated without Gemini: {e}")
+                return await database_sync_to_async(LLMAnswerChecker.verifyLocally, thread_sensitive=False)(
+                    student_id, example_id, date, duration, student_answer, input_type
+                )
+
+            await database_sync_to_async(cache_verdict, thread_sensitive=False)(
+                correct_answer, input_type, student_answer, is_correct
+            )
+
+        continue_with_next = await database_sync_to_async(LLMAnswerChecker.updateRecord, thread_sensitive=False)(
+            student_id, example_id, date, duration, is_correct
+        )
+        return (is_correct, continue_with_next, "")
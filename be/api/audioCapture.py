@@ -0,0 +1,154 @@
+"""
+================================================================================
+ Module: audioCapture.py
+ Description:
+        Storage of audio answers sent by the client. Audio of the current
+        answer is only kept when answers are dumped, in a ring buffer which
+        grows in chunks up to a fixed size, so a long answer which is never
+        recognized only overwrites its oldest part. Answers with
+        their evaluation are dumped to WAV and JSON files by one background
+        thread of the process, which writes the audio to the file in parts
+        as a stream, so the WAV file is never built in memory.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+import json
+import os
+import queue
+import threading
+import wave
+from datetime import datetime
+from be.settings import SPEECH_DUMP_AUDIO, SPEECH_DUMP_DIR
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+# Audio is written to the WAV file in parts of this size
+WRITE_CHUNK_SIZE = 64 * 1024
+
+# Ring buffer grows by parts of this size until it reaches its capacity
+GROW_CHUNK_SIZE = 64 * 1024
+
+# Maximum number of dumps waiting for the writer, newer dumps are dropped when it is full
+DUMP_QUEUE_SIZE = 100
+
+# Audio of the last max_seconds seconds
+class AudioRingBuffer:
+
+    def __init__(self, max_seconds):
+        # Capacity is a whole number of samples
+        self.capacity = int(max_seconds * SAMPLE_RATE) * SAMPLE_WIDTH
+
+        # Memory is allocated as audio arrives, the whole capacity only for long answers
+        self.buffer = bytearray()
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def write(self, data):
+        if len(data) >= self.capacity:
+            self.buffer = bytearray(data[-self.capacity:])
+            self.start = 0
+            self.size = self.capacity
+            return
+
+        # Buffer has not wrapped around yet, it grows until the data fits or the capacity is reached
+        if len(self.buffer) < self.capacity:
+            end = self.size + len(data)
+            length = min(self.capacity, -(-end // GROW_CHUNK_SIZE) * GROW_CHUNK_SIZE)
+
+            if length > len(self.buffer):
+                self.buffer.extend(bytes(length - len(self.buffer)))
+
+            if end <= self.capacity:
+                self.buffer[self.size:end] = data
+                self.size = end
+                return
+
+        # Data is written after the newest byte and wraps around the end of the buffer
+        end = (self.start + self.size) % self.capacity
+        first_part = min(len(data), self.capacity - end)
+        self.buffer[end:end + first_part] = data[:first_part]
+        self.buffer[:len(data) - first_part] = data[first_part:]
+
+        # Oldest audio was overwritten
+        overflow = self.size + len(data) - self.capacity
+        if overflow > 0:
+            self.start = (self.start + overflow) % self.capacity
+            self.size = self.capacity
+        else:
+            self.size += len(data)
+
+    # Buffered audio from the oldest byte
+    def getvalue(self):
+        end = self.start + self.size
+
+        if end <= self.capacity:
+            return bytes(self.buffer[self.start:end])
+
+        return bytes(self.buffer[self.start:]) + bytes(self.buffer[:end - self.capacity])
+
+    # Memory of the answer is released, the next answer is usually shorter than the capacity
+    def clear(self):
+        self.buffer = bytearray()
+        self.start = 0
+        self.size = 0
+
+# Writes dumped answers in a background thread
+class AudioDumpWriter:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.queue = queue.Queue(maxsize=DUMP_QUEUE_SIZE)
+        self.thread = None
+        self.lock = threading.Lock()
+
+    # Queue the audio and evaluation data of an answer for writing (does not block)
+    def dump(self, student_id, example_id, audio, evaluation_data):
+        with self.lock:
+            if self.thread is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self.thread = threading.Thread(target=self.run, name="audio-dump-writer", daemon=True)
+                self.thread.start()
+
+        try:
+            self.queue.put_nowait((student_id, example_id, audio, evaluation_data))
+        except queue.Full:
+            print(f"Audio dump of example {example_id} dropped, writer is behind")
+
+    def run(self):
+        while True:
+            student_id, example_id, audio, evaluation_data = self.queue.get()
+
+            try:
+                self.write(student_id, example_id, audio, evaluation_data)
+            except Exception as e:
+                print(f"Error in audio dump: {e}")
+
+    def write(self, student_id, example_id, audio, evaluation_data):
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+
+        audio_filepath = os.path.join(self.directory, f"{student_id}_{example_id}_{timestamp}.wav")
+        json_filepath = os.path.join(self.directory, f"{student_id}_{example_id}_{timestamp}.json")
+
+        # Header is completed by the wave module when the file is closed
+        with wave.open(audio_filepath, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(SAMPLE_WIDTH)
+            wav_file.setframerate(SAMPLE_RATE)
+
+            audio = memoryview(audio)
+            for position in range(0, len(audio), WRITE_CHUNK_SIZE):
+                wav_file.writeframesraw(audio[position:position + WRITE_CHUNK_SIZE])
+
+        # Save evaluation data to JSON file
+        with open(json_filepath, "w", encoding="utf-8") as json_file:
+            json.dump(evaluation_data, json_file, indent=4, ensure_ascii=False)
+
+        print(f"Evaluation saved: {json_filepath}")
+
+# Writer of the process, None when dumping is turned off
+audio_dump_writer = AudioDumpWriter(SPEECH_DUMP_DIR) if SPEECH_DUMP_AUDIO else None
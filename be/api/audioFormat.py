@@ -0,0 +1,227 @@
+"""
+================================================================================
+ Module: audioFormat.py
+ Description:
+        Decoding of audio sent by the client to the 16 kHz 16-bit mono PCM
+        used by speech recognition. The client chooses the format in the
+        metadata ("format": "mulaw" or {"encoding": "mulaw", "sample_rate":
+        8000}). Supported are 16-bit PCM, 8-bit mu-law and A-law and
+        IMA-ADPCM (one block with its header in each message) at 8, 16,
+        44.1 and 48 kHz. Other sample rates are converted by a polyphase
+        filter computed with NumPy for all samples of a message at once.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+from math import gcd
+import numpy as np
+
+TARGET_RATE = 16000
+
+ENCODINGS = ["pcm", "mulaw", "alaw", "ima_adpcm"]
+SAMPLE_RATES = [8000, 16000, 44100, 48000]
+
+# Format used by clients which do not send any
+DEFAULT_FORMAT = ("pcm", TARGET_RATE)
+
+# Get (encoding, sample rate) from the format sent by the client, raises ValueError for unsupported format
+def parse_audio_format(value):
+    if isinstance(value, str):
+        encoding, sample_rate = value, TARGET_RATE
+    elif isinstance(value, dict):
+        encoding, sample_rate = value.get("encoding", "pcm"), value.get("sample_rate", TARGET_RATE)
+    else:
+        raise ValueError("Audio format has to be a name or an object")
+
+    encoding = str(encoding).lower()
+
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unsupported audio encoding {encoding}")
+
+    try:
+        sample_rate = int(sample_rate)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid sample rate {sample_rate}")
+
+    if sample_rate not in SAMPLE_RATES:
+        raise ValueError(f"Unsupported sample rate {sample_rate}")
+
+    return encoding, sample_rate
+
+# Samples of all 8-bit mu-law codes (G.711)
+def build_mulaw_table():
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+
+    return np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+
+# Samples of all 8-bit A-law codes (G.711)
+def build_alaw_table():
+    codes = np.arange(256, dtype=np.int32) ^ 0x55
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = np.where(
+        exponent == 0,
+        (mantissa << 4) + 8,
+        ((mantissa << 4) + 0x108) << np.maximum(exponent - 1, 0)
+    )
+
+    return np.where(codes & 0x80, magnitude, -magnitude).astype(np.int16)
+
+MULAW_TABLE = build_mulaw_table()
+ALAW_TABLE = build_alaw_table()
+
+IMA_STEPS = np.array([
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45, 50, 55, 60, 66, 73, 80, 88, 97,
+    107, 118, 130, 143, 157, 173, 190, 209, 230, 253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796,
+    876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327, 3660, 4026, 4428,
+    4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487, 12635, 13899, 15289, 16818, 18500, 20350,
+    22385, 24623, 27086, 29794, 32767,
+])
+IMA_INDEX_CHANGES = np.array([-1, -1, -1, -1, 2, 4, 6, 8] * 2)
+
+# Difference of the prediction and next step index for every (step index, code), flattened for fast lookup
+def build_ima_tables():
+    steps = IMA_STEPS[:, None]
+    codes = np.arange(16)[None, :]
+
+    difference = steps >> 3
+    difference = difference + np.where(codes & 4, steps, 0)
+    difference = difference + np.where(codes & 2, steps >> 1, 0)
+    difference = difference + np.where(codes & 1, steps >> 2, 0)
+    difference = np.where(codes & 8, -difference, difference)
+
+    next_index = np.clip(np.arange(len(IMA_STEPS))[:, None] + IMA_INDEX_CHANGES[None, :], 0, len(IMA_STEPS) - 1)
+
+    return difference.ravel().tolist(), (next_index * 16).ravel().tolist()
+
+IMA_DIFFERENCES, IMA_NEXT_INDEX = build_ima_tables()
+
+# Decode one IMA-ADPCM block (predictor, step index, reserved byte, then codes with the low nibble first)
+def decode_ima_adpcm(block):
+    if len(block) < 4:
+        return np.zeros(0, dtype=np.int16)
+
+    predictor = int.from_bytes(block[0:2], "little", signed=True)
+    step_index = min(block[2], len(IMA_STEPS) - 1)
+
+    packed = np.frombuffer(block, dtype=np.uint8, offset=4)
+    codes = np.empty(len(packed) * 2, dtype=np.int64)
+    codes[0::2] = packed & 0x0F
+    codes[1::2] = packed >> 4
+
+    # Every sample depends on the previous one, only table lookups are left in the loop
+    samples = [predictor]
+    position = step_index * 16
+    differences, next_index = IMA_DIFFERENCES, IMA_NEXT_INDEX
+
+    for code in codes.tolist():
+        predictor += differences[position + code]
+        if predictor > 32767:
+            predictor = 32767
+        elif predictor < -32768:
+            predictor = -32768
+        samples.append(predictor)
+        position = next_index[position + code]
+
+    return np.array(samples, dtype=np.int16)
+
+# Streaming sample rate conversion by a polyphase FIR filter
+class Resampler:
+
+    TAPS_PER_PHASE = 32
+
+    def __init__(self, input_rate, output_rate=TARGET_RATE):
+        divisor = gcd(input_rate, output_rate)
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+
+        # Low-pass filter below the lower of both Nyquist frequencies, windowed sinc
+        length = self.TAPS_PER_PHASE * self.up
+        cutoff = 0.9 / max(self.up, self.down)
+        positions = np.arange(length) - (length - 1) / 2
+        taps = cutoff * np.sinc(cutoff * positions) * np.kaiser(length, 8.0)
+        taps *= self.up / taps.sum()
+
+        # Row p has taps used for output samples of phase p (taps p, p + up, p + 2 up, ...)
+        self.phases = taps.reshape(self.TAPS_PER_PHASE, self.up).T.astype(np.float32)
+
+        # Last input samples of the previous message needed by the filter
+        self.history = np.zeros(self.TAPS_PER_PHASE - 1, dtype=np.float32)
+        self.consumed = 0
+        self.next_output = 0
+
+    def process(self, samples):
+        x = np.concatenate([self.history, samples.astype(np.float32)])
+        total = self.consumed + len(samples)
+
+        # Output samples whose newest input sample has already arrived
+        last_output = (total * self.up - 1) // self.down
+        outputs = np.arange(self.next_output, last_output + 1)
+
+        positions = outputs * self.down
+        newest = positions // self.up - self.consumed + self.TAPS_PER_PHASE - 1
+        indices = newest[:, None] - np.arange(self.TAPS_PER_PHASE)[None, :]
+
+        resampled = np.sum(x[indices] * self.phases[positions % self.up], axis=1)
+
+        self.history = x[len(x) - (self.TAPS_PER_PHASE - 1):]
+        self.consumed = total
+        self.next_output = last_output + 1
+
+        return np.clip(np.round(resampled), -32768, 32767).astype(np.int16)
+
+# Converts messages of the client format to 16 kHz 16-bit mono PCM
+class AudioDecoder:
+
+    def __init__(self, encoding=DEFAULT_FORMAT[0], sample_rate=DEFAULT_FORMAT[1]):
+        self.encoding = encoding
+        self.sample_rate = sample_rate
+        self.resampler = Resampler(sample_rate) if sample_rate != TARGET_RATE else None
+
+        # Odd byte of 16-bit PCM, used with the next message
+        self.remainder = b""
+
+    def decode(self, data):
+        if self.encoding == "pcm":
+            # Audio in the target format is passed as it is
+            if self.resampler is None:
+                return data
+
+            data = self.remainder + data
+            even_length = len(data) - len(data) % 2
+            self.remainder = data[even_length:]
+            samples = np.frombuffer(data, dtype="<i2", count=even_length // 2)
+
+        elif self.encoding == "mulaw":
+            samples = MULAW_TABLE[np.frombuffer(data, dtype=np.uint8)]
+
+        elif self.encoding == "alaw":
+            samples = ALAW_TABLE[np.frombuffer(data, dtype=np.uint8)]
+
+        else:
+            samples = decode_ima_adpcm(data)
+
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+
+        return samples.astype("<i2").tobytes()
+
+# Formats the client can choose from
+def get_supported_formats():
+    return {"encodings": ENCODINGS, "sample_rates": SAMPLE_RATES}
+
+# Decoder for the format requested by the client, returns (decoder, message for the client or None)
+def negotiate_audio_format(decoder, requested):
+    try:
+        encoding, sample_rate = parse_audio_format(requested)
+    except ValueError as e:
+        return decoder, {"format_error": str(e), "supported_formats": get_supported_formats()}
+
+    # Client sends the format with every metadata, the same format keeps the decoder state
+    if (encoding, sample_rate) == (decoder.encoding, decoder.sample_rate):
+        return decoder, None
+
+    return AudioDecoder(encoding, sample_rate), {"format": {"encoding": encoding, "sample_rate": sample_rate}}
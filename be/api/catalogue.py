@@ -0,0 +1,114 @@
+"""
+================================================================================
+ Module: catalogue.py
+ Description:
+        Keeps the version stamp of the task and skill catalogue. Every view
+        and management command which changes skills, tasks or examples bumps
+        the version so that in-memory structures built from the catalogue
+        know they are stale. The version is stored in a database row, so
+        bumps of management commands and other server processes are seen
+        by every process (checked at most once per
+        CATALOGUE_VERSION_CHECK_INTERVAL seconds). Responses of read-only
+        catalogue endpoints are cached per version and served with ETags.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
+from functools import wraps
+import hashlib
+import threading
+import time
+from .models import CatalogueVersion
+
+# Seconds for which the version read from the database is used without reading it again
+CATALOGUE_VERSION_CHECK_INTERVAL = 1.0
+
+# Version last read or bumped by this process and when it was read
+_version = None
+_version_checked = 0
+_version_lock = threading.Lock()
+
+# Row of the version, created with the current time so a re-created version never matches a version seen before
+def get_version_row():
+    row, _ = CatalogueVersion.objects.get_or_create(pk=1, defaults={"version": int(time.time() * 1000)})
+    return row
+
+# Get the current version of the catalogue
+def get_catalogue_version():
+    global _version, _version_checked
+
+    if _version is not None and time.monotonic() - _version_checked < CATALOGUE_VERSION_CHECK_INTERVAL:
+        return _version
+
+    version = get_version_row().version
+
+    with _version_lock:
+        _version = version
+        _version_checked = time.monotonic()
+
+    return version
+
+# Increase the catalogue version and return the new one
+def bump_catalogue_version():
+    global _version, _version_checked
+
+    with transaction.atomic():
+        get_version_row()
+
+        # Row is locked, concurrent bumps get consecutive versions
+        row = CatalogueVersion.objects.select_for_update().get(pk=1)
+        row.version += 1
+        row.save(update_fields=["version"])
+
+    with _version_lock:
+        _version = row.version
+        _version_checked = time.monotonic()
+
+    return row.version
+
+# Cache rendered JSON of a read-only catalogue view for the current catalogue version
+def catalogue_cached(view):
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = f"response:{get_catalogue_version()}:{request.get_full_path()}"
+        response_cache = caches["catalogue"]
+
+        cached = response_cache.get(key)
+
+        if cached is None:
+            response = view(request, *args, **kwargs)
+
+            # Errors are not cached
+            if response.status_code != 200:
+                return response
+
+            # Response of DRF view is not rendered yet
+            if hasattr(response, "data"):
+                content = JSONRenderer().render(response.data)
+            else:
+                content = response.content
+
+            cached = (content, '"%s"' % hashlib.sha256(content).hexdigest())
+            response_cache.set(key, cached, timeout=None)
+
+        content, etag = cached
+
+        # Client already has the current version
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type="application/json")
+
+        # Client has to revalidate the cached response every time
+        response["ETag"] = etag
+        response["Cache-Control"] = "no-cache"
+
+        return response
+
+    return wrapper
@@ -10,57 +10,93 @@
 """
 
 import asyncio
+from functools import partial
 import azure.cognitiveservices.speech as speechsdk
 from channels.generic.websocket import AsyncWebsocketConsumer
-from be.settings import AZURE_API_KEY, AZURE_REGION
-from datetime import datetime
 import os
-from concurrent.futures import ThreadPoolExecutor
 import json
 import django
-import io
-import wave
-from django.test import RequestFactory
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "be.settings")
 django.setup()
 
-from .views import skip_example, delete_example_record
-from .answerChecker import GeminiRateLimitError
-
-AUDIO_DIR = "audioprompts"
-os.makedirs(AUDIO_DIR, exist_ok=True)
-
-# Set to True to enable audio dumping
-DUMP_AUDIO=False
+from channels.db import database_sync_to_async
+from be.settings import SPEECH_EVALUATION_WORKERS, SPEECH_CAPTURE_MAX_SECONDS, SPEECH_EARLY_EVALUATION
+from .models import Example, Answer
+from .utils import calculate_duration
+from .records import arecord_attempt, askip_record, adelete_record
+from .answerChecker import InlineSpeechAnswerChecker, FractionSpeechAnswerChecker, VariableSpeechAnswerChecker, LLMAnswerChecker
+from .answerCache import get_compiled_answer
+from .recognizerPool import acquire_session, release_session
+from .voiceActivity import VoiceActivityDetector
+from .audioCapture import AudioRingBuffer, audio_dump_writer
+from .audioFormat import AudioDecoder, negotiate_audio_format
+from .interimTranscripts import InterimTranscriptSender
+from .earlyEvaluation import EarlyEvaluator, get_decision, match_intent, SKIP, FINISH
+
+# Limits the number of answers evaluated at once by all connections of the process
+evaluation_slots = asyncio.Semaphore(SPEECH_EVALUATION_WORKERS)
 
 class SpeechRecognitionConsumer(AsyncWebsocketConsumer):
 
     async def connect(self):
-        # Buffer for incoming audio data
-        self.speech_data = bytearray()
+        # Buffer for audio of the current answer, only kept when answers are dumped (the oldest audio is overwritten)
+        self.speech_data = AudioRingBuffer(SPEECH_CAPTURE_MAX_SECONDS) if audio_dump_writer else None
+
+        # Audio was sent to recognition since the last final transcript
+        self.has_audio = False
+
+        # Evaluations of final transcripts and early decisions waiting to be sent in order
+        self.evaluation_queue = asyncio.Queue()
+
+        # Decision taken from interim transcripts, kept until the final transcript confirms or retracts it
+        self.early = EarlyEvaluator()
+        self.early_decision = None
+
+        # Parsed correct answer of the current example for evaluation of interim transcripts
+        self.compiled_answer = None
 
-        self.message_queue = asyncio.Queue()
         self.loop = asyncio.get_event_loop()
-        self.executor = ThreadPoolExecutor(max_workers=1)
         self.language = "cs-CZ"
+
+        # Live transcript of the answer being spoken
+        self.interim = InterimTranscriptSender(self.loop, self.send)
         
         # Metadata about language, user and currently solved example
         self.metadata = {}
-        self.audio_format = None
 
-        # Set up Azure speech recognizer and audio stream
-        self.speech_recognizer, self.stream = self.create_speech_recognizer()
+        # Audio is sent as 16 kHz PCM until the client chooses other format
+        self.decoder = AudioDecoder()
+
+        # Take prepared Azure speech recognizer and audio stream, recognition starts with the first audio
+        self.session = await acquire_session(self.language)
+
+        # Silence is not sent to speech recognition
+        self.vad = VoiceActivityDetector()
+        self.utterance_duration = None
         
         await self.accept()
-        
-        # Start receiving audio
-        asyncio.create_task(self.receive_audio())
+
+        # Start evaluating transcripts
+        self.evaluation_task = asyncio.create_task(self.evaluate_transcripts())
 
     async def disconnect(self, close_code):
-        self.stream.close()
-        self.speech_recognizer.stop_continuous_recognition()
-        self.executor.shutdown(wait=False)
+        # Connection may be closed before it was fully set up
+        if hasattr(self, "evaluation_task"):
+            self.evaluation_task.cancel()
+            self.interim.cancel()
+
+            # Client already got the early decision, the final transcript will not come anymore
+            if self.early_decision is not None:
+                decision, metadata, _, duration = self.early_decision
+                try:
+                    await self.apply_decision(decision, metadata, duration)
+                except Exception as e:
+                    print(f"Error in applying early decision: {e}")
+
+        if hasattr(self, "session"):
+            await release_session(self.session)
+
         print("Speech recognition stopped.")
 
     async def receive(self, text_data=None, bytes_data=None):
@@ -70,237 +106,327 @@ class SpeechRecognitionConsumer(AsyncWebsocketConsumer):
             try:
                 new_metadata = json.loads(text_data)
                 self.metadata.update(new_metadata)
+
+                # Answer of the next example is loaded for evaluation of interim transcripts
+                if 'example_id' in new_metadata:
+                    self.compiled_answer = None
+                    self.early.reset()
+                    asyncio.create_task(self.load_compiled_answer(new_metadata['example_id']))
             
                 if 'format' in new_metadata:
-                    self.audio_format = new_metadata['format']
+                    self.decoder, response = negotiate_audio_format(self.decoder, new_metadata['format'])
+                    if response:
+                        await self.send(json.dumps(response))
                 
                 # Check if language was changed
                 if 'language' in new_metadata:
                     self.language = new_metadata['language']
-                    print(f"Language changed to: {self.language}")
-                    self.speech_recognizer.stop_continuous_recognition()
-                    self.speech_recognizer, self.stream = self.create_speech_recognizer()
+
+                    # Session of other language is returned to the pool (or closed if it was already used)
+                    if self.language != self.session.language:
+                        print(f"Language changed to: {self.language}")
+                        session = self.session
+                        self.session = await acquire_session(self.language)
+                        await release_session(session)
                 
             except json.JSONDecodeError:
                 print("Invalid metadata received.")
 
         # Audio data was received via websocket
         elif bytes_data:
-            # Send raw PCM data directly to Azure
-            self.stream.write(bytes_data)
-            
-            # Accumulate audio data to dump
-            self.speech_data.extend(bytes_data)
+            audio, utterance_ended = self.vad.process(self.decoder.decode(bytes_data))
 
-    async def receive_audio(self):
-        while True:
-            await asyncio.sleep(0.1)
+            # Answer duration is measured to the end of speech, not to the arrival of the transcript
+            if utterance_ended:
+                self.utterance_duration = calculate_duration(self.metadata.get('record_date'))
 
-    def create_speech_recognizer(self):
+                # Student stopped speaking, the decision of the last interim transcripts is taken with a lower threshold
+                self.take_early_decision(self.early.utterance_ended())
+            elif self.vad.in_utterance:
+                self.utterance_duration = None
+                self.early.utterance_continued()
 
-        # Azure STT configuration   
-        speech_config = speechsdk.SpeechConfig(subscription=AZURE_API_KEY, region=AZURE_REGION)
-        format = speechsdk.audio.AudioStreamFormat(samples_per_second=16000, bits_per_sample=16, channels=1)
-        stream = speechsdk.audio.PushAudioInputStream(stream_format=format)
-        audio_config = speechsdk.audio.AudioConfig(stream=stream)
+            if not audio:
+                return
 
-        speech_recognizer = speechsdk.SpeechRecognizer(
-            speech_config=speech_config,
-            audio_config=audio_config,
-            language=self.language
-        )
+            if not self.session.started:
+                self.session.start(self.recognized_cb, self.recognizing_cb)
 
-        def recognized_cb(evt: speechsdk.SpeechRecognitionEventArgs):
-            if evt.result.text and self.speech_data:
-                
-                student_id = self.metadata.get('student_id', 'unknown')
-                example_id = self.metadata.get('example_id', 'unknown')
+            # Send PCM data without long pauses to Azure
+            self.session.stream.write(audio)
+            
+            self.has_audio = True
 
-                # Sent audio will be dumped in WAV
-                if DUMP_AUDIO:  
-                   
-                    wav_data = self.convert_pcm_to_wav(self.speech_data)
-                    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            # Accumulate audio data to dump
+            if self.speech_data is not None:
+                self.speech_data.write(audio)
+
+    def recognized_cb(self, evt: speechsdk.SpeechRecognitionEventArgs):
+        # Transcript is only handed over to the event loop, evaluation must not stall the SDK thread
+        if evt.result.text:
+            self.loop.call_soon_threadsafe(self.queue_transcript, evt.result.text)
+
+    def recognizing_cb(self, evt: speechsdk.SpeechRecognitionEventArgs):
+        self.interim.push(evt.result.text)
+
+        if SPEECH_EARLY_EVALUATION and evt.result.text:
+            self.loop.call_soon_threadsafe(self.check_hypothesis, evt.result.text)
+
+    async def load_compiled_answer(self, example_id):
+        try:
+            compiled_answer = await database_sync_to_async(get_compiled_answer, thread_sensitive=False)(example_id)
+        except (Answer.DoesNotExist, TypeError, ValueError):
+            return
+
+        # Client may have moved to another example while the answer was loaded
+        if self.metadata.get('example_id') == example_id:
+            self.compiled_answer = compiled_answer
+
+    # Check the interim transcript for a stable decision (runs in the event loop)
+    def check_hypothesis(self, hypothesis):
+        if self.early_decision is not None:
+            return
+
+        decision = get_decision(self.compiled_answer, self.metadata.get('input_type'), hypothesis, self.language)
+        self.take_early_decision(self.early.update(decision))
+
+    # Send the decision to the client now, the record is updated when the final transcript confirms it
+    def take_early_decision(self, decision):
+        if decision is None or self.early_decision is not None:
+            return
+
+        metadata = dict(self.metadata)
+
+        if self.utterance_duration is not None:
+            duration = self.utterance_duration
+        else:
+            duration = calculate_duration(metadata.get('record_date'))
+
+        self.early_decision = (decision, metadata, self.language, duration)
+        self.interim.cancel()
+
+        self.evaluation_queue.put_nowait(partial(self.get_early_response, decision))
+
+    # Queue the final transcript with the data of the current example (runs in the event loop)
+    def queue_transcript(self, transcript):
+        self.interim.cancel()
+
+        # Early decision belongs to this transcript, next utterance is evaluated from the start
+        early_decision, self.early_decision = self.early_decision, None
+        self.early.reset()
+
+        if not self.has_audio and early_decision is None:
+            return
+
+        # Metadata and audio are taken now, the client may already move to the next example
+        metadata = dict(self.metadata)
+        audio = self.speech_data.getvalue() if self.speech_data is not None else None
+
+        if self.utterance_duration is not None:
+            duration = self.utterance_duration
+        else:
+            duration = calculate_duration(metadata.get('record_date'))
+
+        # Reset accumulated audio data
+        self.has_audio = False
+        if self.speech_data is not None:
+            self.speech_data.clear()
+        self.utterance_duration = None
+
+        if early_decision is not None:
+            self.evaluation_queue.put_nowait(partial(self.confirm_early_decision, early_decision, transcript, audio))
+        else:
+            self.evaluation_queue.put_nowait(
+                partial(self.evaluate_transcript, transcript, metadata, self.language, duration, audio)
+            )
+
+    # Evaluate queued transcripts one by one and send the results in order
+    async def evaluate_transcripts(self):
+        while True:
+            evaluate = await self.evaluation_queue.get()
 
-                    audio_filename = f"{student_id}_{example_id}_{timestamp}.wav"
-                    json_filename = f"{student_id}_{example_id}_{timestamp}.json"
+            try:
+                # Number of evaluations running at once is limited for the whole process
+                async with evaluation_slots:
+                    response_data = await evaluate()
 
-                    audio_filepath = os.path.join(AUDIO_DIR, audio_filename)
-                    json_filepath = os.path.join(AUDIO_DIR, json_filename)
+                if response_data:
+                    await self.send(json.dumps(response_data))
 
-                    with open(audio_filepath, "wb") as f:
-                        f.write(wav_data)
-        
-                from .models import Example, Answer
+            except asyncio.CancelledError:
+                raise
 
-                # Get example text and correct answer
-                try:
-                    example = Example.objects.get(id=example_id)
-                    answer = Answer.objects.filter(example=example).first() 
-                    correct_answer = answer.answer if answer else "No correct answer found"
-                except Example.DoesNotExist:
-                    example_text = "Example not found"
-                    correct_answer = "No correct answer found"
-                else:
-                    example_text = example.example
-
-                # Reset accumulated audio data
-                self.speech_data = bytearray()
-                
-                from .utils import calculate_duration
-                from .answerChecker import InlineSpeechAnswerChecker, FractionSpeechAnswerChecker, VariableSpeechAnswerChecker, LLMAnswerChecker
-
-                # Get data for current example
-                input_type = self.metadata.get('input_type')
-                record_date = self.metadata.get('record_date')
-                duration = calculate_duration(record_date)
-                student_answer = evt.result.text
-
-                # Words to skip example or terminate practice
-                skip_wordsCS = ["přeskočit", "další", "přeskoč", "dál"]
-                skip_wordsEN = ["skip", "next", "continue"]
-                finish_wordsCS = ["konec", "ukončit", "stačí", "hotovo", "skončit", "dost"]
-                finish_wordsEN = ["finish", "end", "stop", "done"]
-
-                if(self.language == "cs-CZ"):
-                    skip_words = skip_wordsCS
-                    finish_words = finish_wordsCS
-                else:
-                    skip_words = skip_wordsEN
-                    finish_words = finish_wordsEN
-
-                # Transcript containts 'skip' words - update record and skip example
-                if any(word in student_answer.lower() for word in skip_words):
-                    factory = RequestFactory()
-                    request = factory.post('skip-example/', {
-                        'student_id': student_id,
-                        'example_id': example_id,
-                        'date': record_date
-                    })
-                    skip_example(request)
-                    response_data = {'skipped': True}
-                    evaluation_data = {
-                        "student_id": student_id,
-                        "example_id": example_id,
-                        "transcription": evt.result.text,
-                        "example_text": example_text,
-                        "correct_answer": correct_answer,
-                        "evaluation": "skipped"
-                    }
-
-                # Transcript containts 'terminate' words - delete record and terminate practice
-                elif any(word in student_answer.lower() for word in finish_words):
-                    factory = RequestFactory()
-                    request = factory.post('delete-record/', {
-                        'student_id': student_id,
-                        'example_id': example_id,
-                        'date': record_date
-                    })
-                    delete_example_record(request)
-                    response_data = {'finished': True}
-                    evaluation_data = {
-                        "student_id": student_id,
-                        "example_id": example_id,
-                        "transcription": evt.result.text,
-                        "example_text": example_text,
-                        "correct_answer": correct_answer,
-                        "evaluation": "terminated"
-                    }
-
-                # Transcript does not contain 'skip' or 'terminate' words - evaluate answer 
-                else:
-                    # Basic answer formats evaluated by script
-                    if input_type == 'INLINE' or input_type == 'WORD':
-                        isCorrect, continue_with_next, student_answer = InlineSpeechAnswerChecker.verifyAnswer(
-                            student_id, example_id, record_date, duration, student_answer
-                        )
-                    # Fraction answer evaluated by LLM
-                    elif input_type == 'FRAC':
-                        
-                        try:
-                            isCorrect, continue_with_next, student_answer = LLMAnswerChecker.verifyAnswer(
-                                student_id, example_id, record_date, duration, student_answer, 'fraction'
-                            )
-
-                        # LLM rate limit reached - use FractionSpeechAnswerChecker
-                        except GeminiRateLimitError:
-                            print("FRAC gemini limit reached - will use FractionSpeechAnswerChecker")
-                            isCorrect, continue_with_next, student_answer = FractionSpeechAnswerChecker.verifyAnswer(
-                                student_id, example_id, record_date, duration, student_answer
-                            )                               
-
-                    # Variable answer evaluated by LLM  
-                    elif input_type == 'VAR':
-
-                        try:
-                            isCorrect, continue_with_next, student_answer = LLMAnswerChecker.verifyAnswer(
-                                student_id, example_id, record_date, duration, student_answer, 'variable'
-                            )
-
-                        # LLM rate limit reached - use VariableSpeechAnswerChecker
-                        except GeminiRateLimitError:
-                            print("VAR gemini limit reached - will use VariableSpeechAnswerChecker")
-                            isCorrect, continue_with_next, student_answer = VariableSpeechAnswerChecker.verifyAnswer(
-                            student_id, example_id, record_date, duration, student_answer
-                        )
-                    
-                    # Return evaluation result back to client
-                    response_data = {
-                        "isCorrect": isCorrect,
-                        "continue_with_next": continue_with_next,
-                        "student_answer": student_answer
-                    }
-
-                    # Advanced evaluation data to be dumped in JSON
-                    evaluation_data = {
-                        "student_id": student_id,
-                        "example_id": example_id,
-                        "transcription": evt.result.text,
-                        "example_text": example_text,
-                        "correct_answer": correct_answer,
-                        "evaluation": isCorrect
-                    }
-
-                # Save evaluation data to JSON file
-                if DUMP_AUDIO:
-                    with open(json_filepath, "w", encoding="utf-8") as json_file:
-                        json.dump(evaluation_data, json_file, indent=4, ensure_ascii=False)
-
-                    print(f"Evaluation saved: {json_filepath}")
-
-                asyncio.run_coroutine_threadsafe(
-                    self.send(json.dumps(response_data)),
-                    self.loop
-                )
-                
-        def recognizing_cb(evt: speechsdk.SpeechRecognitionEventArgs):
-            try:
-                if evt.result.text:
-                    future = asyncio.run_coroutine_threadsafe(
-                        self.message_queue.put(f"[interim] {evt.result.text}"),
-                        self.loop
-                    )
-                    future.result() 
             except Exception as e:
-                print(f"Error in recognizing callback: {e}")
+                print(f"Error in evaluation: {e}")
 
-        speech_recognizer.recognized.connect(recognized_cb)
-        speech_recognizer.recognizing.connect(recognizing_cb)
+    # Result sent to the client for the early decision
+    async def get_early_response(self, decision):
+        kind, student_answer = decision
 
-        # Starts recognition in a separate thread to avoid blocking
-        def start_recognition():
-            speech_recognizer.start_continuous_recognition()
+        if kind == SKIP:
+            return {'skipped': True, 'early': True}
 
-        self.executor.submit(start_recognition)
-        
-        return speech_recognizer, stream
-        
-    def convert_pcm_to_wav(self, pcm_data):
-        # Converts raw PCM data sent from client to WAV format
-        with io.BytesIO() as wav_io:
-            with wave.open(wav_io, 'wb') as wav_file:
-                wav_file.setnchannels(1)        # Mono
-                wav_file.setsampwidth(2)        # 16-bit
-                wav_file.setframerate(16000)    # 16kHz
-                wav_file.writeframes(pcm_data)
-            return wav_io.getvalue()
\ No newline at end of file
+        if kind == FINISH:
+            return {'finished': True, 'early': True}
+
+        # Correct answer always continues with the next example
+        return {
+            "isCorrect": True,
+            "continue_with_next": True,
+            "student_answer": student_answer,
+            "early": True
+        }
+
+    # Final transcript confirms the early decision (the record is updated) or retracts it (evaluated as usual)
+    async def confirm_early_decision(self, early_decision, transcript, audio):
+        decision, metadata, language, duration = early_decision
+
+        final_decision = await database_sync_to_async(self.get_final_decision, thread_sensitive=False)(
+            metadata, language, transcript
+        )
+
+        if final_decision is not None and final_decision[0] == decision[0]:
+            await self.apply_decision(decision, metadata, duration)
+
+            if audio_dump_writer:
+                evaluation = {SKIP: "skipped", FINISH: "terminated"}.get(decision[0], True)
+                await self.dump_answer(metadata, transcript, evaluation, audio)
+
+            return None
+
+        print(f"Early decision {decision[0]} retracted by final transcript: {transcript}")
+
+        response_data = await self.evaluate_transcript(transcript, metadata, language, duration, audio)
+        response_data["retracted"] = True
+        return response_data
+
+    def get_final_decision(self, metadata, language, transcript):
+        try:
+            compiled_answer = get_compiled_answer(metadata.get('example_id'))
+        except (Answer.DoesNotExist, TypeError, ValueError):
+            compiled_answer = None
+
+        return get_decision(compiled_answer, metadata.get('input_type'), transcript, language)
+
+    # Update the record by the decision, done exactly once for each decision
+    async def apply_decision(self, decision, metadata, duration):
+        student_id = metadata.get('student_id', 'unknown')
+        example_id = metadata.get('example_id', 'unknown')
+        record_date = metadata.get('record_date')
+
+        if decision[0] == SKIP or decision[0] == FINISH:
+            await self.apply_intent(decision[0], student_id, example_id, record_date)
+
+        elif await arecord_attempt(student_id, example_id, record_date, duration, True) is None:
+            print(f"Record of example {example_id} not found")
+
+    # Skip the example or terminate the practice
+    async def apply_intent(self, intent, student_id, example_id, record_date):
+        if intent == SKIP:
+            found = await askip_record(student_id, example_id, record_date)
+        else:
+            found = await adelete_record(student_id, example_id, record_date)
+
+        if not found:
+            print(f"Record of example {example_id} not found")
+
+    async def evaluate_transcript(self, transcript, metadata, language, duration, audio):
+        student_id = metadata.get('student_id', 'unknown')
+        example_id = metadata.get('example_id', 'unknown')
+
+        # Get data for current example
+        input_type = metadata.get('input_type')
+        record_date = metadata.get('record_date')
+        student_answer = transcript
+
+        intent = match_intent(student_answer, language)
+
+        # Transcript containts 'skip' words - update record and skip example
+        if intent == SKIP:
+            await self.apply_intent(intent, student_id, example_id, record_date)
+            response_data = {'skipped': True}
+            evaluation = "skipped"
+
+        # Transcript containts 'terminate' words - delete record and terminate practice
+        elif intent == FINISH:
+            await self.apply_intent(intent, student_id, example_id, record_date)
+            response_data = {'finished': True}
+            evaluation = "terminated"
+
+        # Transcript does not contain 'skip' or 'terminate' words - evaluate answer 
+        else:
+            isCorrect, continue_with_next, student_answer = await self.evaluate_answer(
+                student_id, example_id, record_date, duration, student_answer, input_type
+            )
+
+            # Return evaluation result back to client
+            response_data = {
+                "isCorrect": isCorrect,
+                "continue_with_next": continue_with_next,
+                "student_answer": student_answer
+            }
+            evaluation = isCorrect
+
+        # Sent audio and advanced evaluation data will be dumped in WAV and JSON
+        if audio_dump_writer:
+            await self.dump_answer(metadata, transcript, evaluation, audio)
+
+        return response_data
+
+    async def dump_answer(self, metadata, transcript, evaluation, audio):
+        student_id = metadata.get('student_id', 'unknown')
+        example_id = metadata.get('example_id', 'unknown')
+
+        # Get example text and correct answer
+        example = None
+        answer = None
+
+        try:
+            example = await Example.objects.filter(id=example_id).afirst()
+            if example:
+                answer = await Answer.objects.filter(example=example).order_by('id').afirst()
+        except ValueError:
+            pass
+
+        evaluation_data = {
+            "student_id": student_id,
+            "example_id": example_id,
+            "transcription": transcript,
+            "example_text": example.example if example else "Example not found",
+            "correct_answer": answer.answer if answer else "No correct answer found",
+            "evaluation": evaluation
+        }
+        audio_dump_writer.dump(student_id, example_id, audio, evaluation_data)
+
+    async def evaluate_answer(self, student_id, example_id, record_date, duration, student_answer, input_type):
+        # Checkers using only the database run in worker threads
+        def run_checker(checker):
+            return database_sync_to_async(checker.verifyAnswer, thread_sensitive=False)(
+                student_id, example_id, record_date, duration, student_answer
+            )
+
+        # Basic answer formats evaluated by script
+        if input_type == 'INLINE' or input_type == 'WORD':
+            return await run_checker(InlineSpeechAnswerChecker)
+
+        # Fraction answer evaluated by script if it was recognized in the transcript, otherwise by LLM
+        # (LLMAnswerChecker uses FractionSpeechAnswerChecker when Gemini is not available)
+        elif input_type == 'FRAC':
+            if await database_sync_to_async(FractionSpeechAnswerChecker.canEvaluate, thread_sensitive=False)(example_id, student_answer):
+                return await run_checker(FractionSpeechAnswerChecker)
+
+            return await LLMAnswerChecker.verifyAnswerAsync(
+                student_id, example_id, record_date, duration, student_answer, 'fraction'
+            )
+
+        # Variable answer evaluated by script if it was recognized in the transcript, otherwise by LLM
+        # (LLMAnswerChecker uses VariableSpeechAnswerChecker when Gemini is not available)
+        elif input_type == 'VAR':
+            if await database_sync_to_async(VariableSpeechAnswerChecker.canEvaluate, thread_sensitive=False)(example_id, student_answer):
+                return await run_checker(VariableSpeechAnswerChecker)
+
+            return await LLMAnswerChecker.verifyAnswerAsync(
+                student_id, example_id, record_date, duration, student_answer, 'variable'
+            )
+
+        raise ValueError(f"Unknown input type {input_type}")
@@ -13,12 +13,15 @@ import azure.cognitiveservices.speech as speechsdk
 from channels.generic.websocket import AsyncWebsocketConsumer
 import json
 from datetime import datetime
-from be.settings import AZURE_API_KEY, AZURE_REGION
 import django
 import os
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "be.settings")
 django.setup()
 from .utils import get_skill_names_string
+from .recognizerPool import acquire_session, release_session
+from .voiceActivity import VoiceActivityDetector
+from .audioFormat import AudioDecoder, negotiate_audio_format
+from .interimTranscripts import InterimTranscriptSender
 
 SURVEY_DIR = "survey"
 os.makedirs(SURVEY_DIR, exist_ok=True)
@@ -38,8 +41,18 @@ class SurveySpeechTranscriptionConsumer(AsyncWebsocketConsumer):
         self.loop = asyncio.get_event_loop()
         self.executor = asyncio.get_running_loop().run_in_executor
         self.language = "cs-CZ"
+
+        # Live transcript of the answer being spoken
+        self.interim = InterimTranscriptSender(self.loop, self.send)
         
-        self.speech_recognizer, self.stream = self.create_speech_recognizer()
+        # Take prepared Azure speech recognizer and audio stream, recognition starts with the first audio
+        self.session = await acquire_session(self.language)
+
+        # Silence is not sent to speech recognition
+        self.vad = VoiceActivityDetector()
+
+        # Audio is sent as 16 kHz PCM until the client chooses other format
+        self.decoder = AudioDecoder()
         
         await self.accept()
         print("WebSocket connection established")
@@ -47,8 +60,9 @@ class SurveySpeechTranscriptionConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
 
         # User terminated question answering - save the transcription 
-        self.stream.close()
-        self.speech_recognizer.stop_continuous_recognition()
+        if hasattr(self, "session"):
+            self.interim.cancel()
+            await release_session(self.session)
 
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
 
@@ -77,45 +91,44 @@ class SurveySpeechTranscriptionConsumer(AsyncWebsocketConsumer):
                 self.skills = metadata.get("skills")
                 self.skill_names = await get_skill_names_string(self.skills)
 
+                if 'format' in metadata:
+                    self.decoder, response = negotiate_audio_format(self.decoder, metadata['format'])
+                    if response:
+                        await self.send(json.dumps(response))
+
                 # Check if language was changed
-                if 'language' in metadata:
+                if 'language' in metadata and metadata['language'] != self.session.language:
                     self.language = metadata['language']
-                    self.speech_recognizer.stop_continuous_recognition()
-                    self.speech_recognizer, self.stream = self.create_speech_recognizer()
+                    session = self.session
+                    self.session = await acquire_session(self.language)
+                    await release_session(session)
 
             except json.JSONDecodeError:
                 print("Invalid metadata received")
 
         # Audio data was received via websocket
         elif bytes_data:
-            self.stream.write(bytes_data)
+            audio, _ = self.vad.process(self.decoder.decode(bytes_data))
+            if not audio:
+                return
 
-    def create_speech_recognizer(self):
+            if not self.session.started:
+                self.session.start(self.recognized_cb, self.recognizing_cb)
 
-        # Azure STT configuration   
-        speech_config = speechsdk.SpeechConfig(subscription=AZURE_API_KEY, region=AZURE_REGION)
-        audio_format = speechsdk.audio.AudioStreamFormat(samples_per_second=16000, bits_per_sample=16, channels=1)
-        stream = speechsdk.audio.PushAudioInputStream(stream_format=audio_format)
-        audio_config = speechsdk.audio.AudioConfig(stream=stream)
-        
-        speech_recognizer = speechsdk.SpeechRecognizer(
-            speech_config=speech_config,
-            audio_config=audio_config,
-            language=self.language  
-        )
-        
-        def recognized_cb(evt: speechsdk.SpeechRecognitionEventArgs):
-            if evt.result.text:
-
-                self.full_transcript += evt.result.text + " "
-                
-                asyncio.run_coroutine_threadsafe(
-                    self.send(json.dumps({"transcription": evt.result.text})),
-                    self.loop
-                )            
-        
-        speech_recognizer.recognized.connect(recognized_cb)
-        
-        speech_recognizer.start_continuous_recognition_async()
-        
-        return speech_recognizer, stream
\ No newline at end of file
+            self.session.stream.write(audio)
+
+    def recognized_cb(self, evt: speechsdk.SpeechRecognitionEventArgs):
+        if evt.result.text:
+
+            self.full_transcript += evt.result.text + " "
+
+            # Interim transcript waiting for sending is replaced by the final one
+            self.loop.call_soon_threadsafe(self.interim.cancel)
+            
+            asyncio.run_coroutine_threadsafe(
+                self.send(json.dumps({"transcription": evt.result.text})),
+                self.loop
+            )
+
+    def recognizing_cb(self, evt: speechsdk.SpeechRecognitionEventArgs):
+        self.interim.push(evt.result.text)
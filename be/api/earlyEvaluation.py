@@ -0,0 +1,138 @@
+"""
+================================================================================
+ Module: earlyEvaluation.py
+ Description:
+        Decides spoken answers from interim transcripts before speech
+        recognition finishes the utterance. Every interim hypothesis is
+        matched against the skip and finish words and checked by the local
+        answer checkers. Only a hypothesis which is as a whole a command or
+        the correct number decides, so a number or a word said in the middle
+        of a longer answer does not. A decision (skip, finish or correct
+        answer) is taken once the same decision comes from several
+        hypotheses in a row, or from fewer of them when the student stops
+        speaking (short answers give only a few hypotheses). Incorrect answers and answers which need the
+        LLM are always left to the final transcript.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+from be.settings import SPEECH_EARLY_STABLE_HYPOTHESES, SPEECH_EARLY_END_HYPOTHESES
+from .answerChecker import AnswerChecker, FractionSpeechAnswerChecker, VariableSpeechAnswerChecker
+from .spokenNumbers import parse_spoken_number, tokenize
+
+SKIP = "skip"
+FINISH = "finish"
+CORRECT = "correct"
+
+# Words to skip example or terminate practice
+SKIP_WORDS = {
+    "cs-CZ": ["přeskočit", "další", "přeskoč", "dál"],
+    "en-US": ["skip", "next", "continue"],
+}
+FINISH_WORDS = {
+    "cs-CZ": ["konec", "ukončit", "stačí", "hotovo", "skončit", "dost"],
+    "en-US": ["finish", "end", "stop", "done"],
+}
+
+# Get the command said in the transcript (SKIP, FINISH or None), words are matched as whole words
+# With whole_utterance the transcript has to consist only of the command words
+def match_intent(transcript, language, whole_utterance=False):
+    # Languages other than Czech use English words
+    if language != "cs-CZ":
+        language = "en-US"
+
+    words = tokenize(transcript)
+
+    for intent, intent_words in [(SKIP, SKIP_WORDS[language]), (FINISH, FINISH_WORDS[language])]:
+        if whole_utterance:
+            if words and all(word in intent_words for word in words):
+                return intent
+
+        elif any(word in intent_words for word in words):
+            return intent
+
+    return None
+
+# Check that the whole transcript is the correct number, returns the number or None
+def match_number(correct_answer, transcript):
+    if correct_answer.number is None:
+        return None
+
+    number = parse_spoken_number(transcript.replace(",", "."))
+
+    if number is not None and AnswerChecker.compareAnswers(number, correct_answer.number):
+        return number
+
+    return None
+
+# Decision which can be taken without the LLM and the record: (SKIP, None), (FINISH, None), (CORRECT, student answer)
+# or None if the transcript has to be evaluated normally
+def get_decision(correct_answer, input_type, transcript, language):
+    intent = match_intent(transcript, language, whole_utterance=True)
+    if intent:
+        return (intent, None)
+
+    if correct_answer is None:
+        return None
+
+    result = None
+
+    if input_type == 'INLINE' or input_type == 'WORD':
+        number = match_number(correct_answer, transcript)
+        if number is not None:
+            result = (True, number)
+
+    elif input_type == 'FRAC':
+        if FractionSpeechAnswerChecker.canEvaluateAnswer(correct_answer, transcript):
+            result = FractionSpeechAnswerChecker.evaluate(correct_answer, transcript)
+
+    elif input_type == 'VAR':
+        if VariableSpeechAnswerChecker.canEvaluateAnswer(correct_answer, transcript):
+            result = VariableSpeechAnswerChecker.evaluate(correct_answer, transcript)
+
+    if result and result[0]:
+        return (CORRECT, result[1])
+
+    return None
+
+# Tracks decisions of interim hypotheses of one utterance
+class EarlyEvaluator:
+
+    def __init__(self, stable_hypotheses=SPEECH_EARLY_STABLE_HYPOTHESES, end_hypotheses=SPEECH_EARLY_END_HYPOTHESES):
+        self.stable_hypotheses = stable_hypotheses
+        self.end_hypotheses = end_hypotheses
+        self.reset()
+
+    # Start of the next utterance or the next example
+    def reset(self):
+        self.decision = None
+        self.count = 0
+        self.ended = False
+
+    # Decision of the next hypothesis, returns the decision if it is stable now
+    def update(self, decision):
+        if decision is not None and self.decision is not None and decision[0] == self.decision[0]:
+            self.count += 1
+        else:
+            self.count = 1 if decision is not None else 0
+
+        self.decision = decision
+
+        # Hypotheses arriving after the end of speech are the last ones of the utterance
+        if self.count >= (self.end_hypotheses if self.ended else self.stable_hypotheses):
+            return self.decision
+
+        return None
+
+    # Student stopped speaking, no more hypotheses of the utterance come, so fewer of them are enough
+    def utterance_ended(self):
+        self.ended = True
+
+        if self.decision is not None and self.count >= self.end_hypotheses:
+            return self.decision
+
+        return None
+
+    # Student started speaking again, the utterance goes on
+    def utterance_continued(self):
+        self.ended = False
@@ -0,0 +1,102 @@
+"""
+================================================================================
+ Module: exampleIndex.py
+ Description:
+        In-memory index of examples assigned to each skill. Every skill has
+        a bitmap (Python integer) with a bit set for each of its example ids,
+        so examples having all of the given skills are counted by a bitwise
+        AND of the bitmaps. The index is updated in place by the views which
+        change example skills and reloaded when another process changed
+        the catalogue.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+import threading
+from collections import defaultdict
+from .models import ExampleSkill
+from .catalogue import get_catalogue_version
+
+class ExampleSkillIndex:
+
+    def __init__(self, version, links):
+        self.version = version
+
+        # Collect example ids of each skill and turn them into bitmaps
+        example_ids = defaultdict(list)
+        for example_id, skill_id in links:
+            example_ids[skill_id].append(example_id)
+
+        self.bitmaps = {}
+        for skill_id, ids in example_ids.items():
+            bits = bytearray(max(ids) // 8 + 1)
+            for example_id in ids:
+                bits[example_id // 8] |= 1 << (example_id % 8)
+            self.bitmaps[skill_id] = int.from_bytes(bits, "little")
+
+    @classmethod
+    def load(cls, version):
+        links = ExampleSkill.objects.values_list("example_id", "skill_id").iterator(chunk_size=5000)
+        return cls(version, links)
+
+    # Count examples which have all the provided skills
+    def count_examples(self, skill_ids):
+        result = None
+
+        for skill_id in set(skill_ids):
+            bitmap = self.bitmaps.get(skill_id, 0)
+            result = bitmap if result is None else result & bitmap
+
+            if not result:
+                return 0
+
+        return result.bit_count() if result else 0
+
+    # Apply changed skills of examples ({example_id: set of skill ids} before and after the change)
+    def apply_changes(self, before, after):
+        for example_id in set(before) | set(after):
+            old_skills = before.get(example_id, set())
+            new_skills = after.get(example_id, set())
+            bit = 1 << example_id
+
+            for skill_id in old_skills - new_skills:
+                self.bitmaps[skill_id] = self.bitmaps.get(skill_id, 0) & ~bit
+
+            for skill_id in new_skills - old_skills:
+                self.bitmaps[skill_id] = self.bitmaps.get(skill_id, 0) | bit
+
+_index = None
+_index_lock = threading.Lock()
+
+# Get the example index for the current catalogue version, reload it if it is stale
+def get_example_index():
+    global _index
+
+    version = get_catalogue_version()
+    index = _index
+
+    if index is None or index.version != version:
+        with _index_lock:
+            if _index is None or _index.version != version:
+                _index = ExampleSkillIndex.load(version)
+            index = _index
+
+    return index
+
+# Update the loaded index after the catalogue was bumped to new_version by this process
+def update_example_index(before, after, new_version):
+    global _index
+
+    with _index_lock:
+        # Nothing loaded yet or already loaded with this change
+        if _index is None or _index.version == new_version:
+            return
+
+        # Index is exactly one version behind - only this change is missing
+        if _index.version == new_version - 1:
+            _index.apply_changes(before, after)
+            _index.version = new_version
+
+        # Another change happened meanwhile - load the index again on next use
+        else:
+            _index = None
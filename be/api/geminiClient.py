@@ -0,0 +1,187 @@
+"""
+================================================================================
+ Module: geminiClient.py
+ Description:
+        Process-wide client of the Gemini API used for answer evaluation.
+        Requests are limited by a token bucket and have a timeout. After
+        repeated failures or a rate limit response a circuit breaker stops
+        sending requests, so answers are evaluated by the local checkers
+        right away instead of waiting for failing requests. After a pause
+        one request is let through to probe if the API works again.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+import asyncio
+import threading
+import time
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from be.settings import GEMINI_API_KEY, GEMINI_MODEL, GEMINI_REQUESTS_PER_MINUTE, GEMINI_BURST
+from be.settings import GEMINI_TIMEOUT, GEMINI_FAILURE_THRESHOLD, GEMINI_RESET_TIMEOUT
+
+genai.configure(api_key=GEMINI_API_KEY)
+
+# Exception for answers which cannot be evaluated by Gemini now (rate limit, open circuit or failed request)
+class GeminiRateLimitError(Exception):
+    pass
+
+# Limits the rate of requests, tokens are refilled continuously up to the capacity
+class TokenBucket:
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    # Take one token if there is any
+    def try_acquire(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        return True
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+class GeminiClient:
+
+    def __init__(self, model_name, requests_per_minute, burst, timeout, failure_threshold, reset_timeout):
+        self.model = genai.GenerativeModel(model_name)
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.bucket = TokenBucket(requests_per_minute / 60, burst)
+        self.lock = threading.Lock()
+
+        # Circuit breaker state
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probing = False
+
+        self.counters = {
+            "requests": 0,
+            "successes": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "rate_limited": 0,
+            "rejected_by_limiter": 0,
+            "rejected_by_breaker": 0,
+        }
+
+    # Check if a request can be sent now
+    def acquire(self):
+        with self.lock:
+            if self.state == OPEN:
+                # Let one request through to check if the API works again
+                if time.monotonic() - self.opened_at >= self.reset_timeout:
+                    self.state = HALF_OPEN
+                else:
+                    self.counters["rejected_by_breaker"] += 1
+                    raise GeminiRateLimitError("Gemini circuit is open")
+
+            if self.state == HALF_OPEN:
+                if self.probing:
+                    self.counters["rejected_by_breaker"] += 1
+                    raise GeminiRateLimitError("Gemini circuit is half-open")
+                self.probing = True
+
+            if not self.bucket.try_acquire():
+                self.probing = False
+                self.counters["rejected_by_limiter"] += 1
+                raise GeminiRateLimitError("Gemini request limit reached")
+
+            self.counters["requests"] += 1
+
+    def record_success(self):
+        with self.lock:
+            self.counters["successes"] += 1
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self.probing = False
+
+    # Open the circuit after too many failures in a row or right away when the quota is exhausted
+    def record_failure(self, counter=None, open_circuit=False):
+        with self.lock:
+            self.counters["failures"] += 1
+            if counter:
+                self.counters[counter] += 1
+            self.consecutive_failures += 1
+            self.probing = False
+
+            if open_circuit or self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    # Count the failed request and raise the error for the local evaluation
+    def handle_error(self, e):
+        if isinstance(e, google_exceptions.ResourceExhausted) or "429" in str(e) or "quota" in str(e).lower():
+            self.record_failure("rate_limited", open_circuit=True)
+            raise GeminiRateLimitError("API rate limit reached") from e
+
+        if isinstance(e, (google_exceptions.DeadlineExceeded, asyncio.TimeoutError)):
+            self.record_failure("timeouts")
+            raise GeminiRateLimitError("Gemini request timed out") from e
+
+        self.record_failure()
+        raise GeminiRateLimitError("Gemini request failed") from e
+
+    # Send the prompt and return the text of the response
+    def generate(self, prompt):
+        self.acquire()
+
+        try:
+            response = self.model.generate_content(prompt, request_options={"timeout": self.timeout})
+            text = response.text
+
+        except Exception as e:
+            self.handle_error(e)
+
+        self.record_success()
+        return text
+
+    # Async version used in websocket communication
+    async def generate_async(self, prompt):
+        self.acquire()
+
+        try:
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(prompt, request_options={"timeout": self.timeout}),
+                timeout=self.timeout
+            )
+            text = response.text
+
+        except Exception as e:
+            self.handle_error(e)
+
+        self.record_success()
+        return text
+
+    # State and counters for monitoring
+    def get_state(self):
+        with self.lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "open_for": round(time.monotonic() - self.opened_at, 1) if self.state != CLOSED else None,
+                "tokens": round(self.bucket.tokens, 2),
+                **self.counters,
+            }
+
+gemini_client = GeminiClient(
+    GEMINI_MODEL,
+    requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+    burst=GEMINI_BURST,
+    timeout=GEMINI_TIMEOUT,
+    failure_threshold=GEMINI_FAILURE_THRESHOLD,
+    reset_timeout=GEMINI_RESET_TIMEOUT,
+)
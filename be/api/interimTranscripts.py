@@ -0,0 +1,56 @@
+"""
+================================================================================
+ Module: interimTranscripts.py
+ Description:
+        Sends interim transcripts of the answer being spoken to the client.
+        Speech recognition reports a new hypothesis many times per second,
+        only the newest one is kept and at most one message is sent per
+        SPEECH_INTERIM_INTERVAL seconds. The recognizer thread only hands
+        the hypothesis over to the event loop and never waits for sending.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+import asyncio
+import json
+from be.settings import SPEECH_INTERIM_INTERVAL
+
+class InterimTranscriptSender:
+
+    def __init__(self, loop, send, interval=SPEECH_INTERIM_INTERVAL):
+        self.loop = loop
+        self.send = send
+        self.interval = interval
+
+        # Newest hypothesis not sent yet and the scheduled sending
+        self.text = None
+        self.scheduled = None
+        self.last_sent = 0
+
+    # Called from the recognizer thread with every hypothesis
+    def push(self, text):
+        if text:
+            self.loop.call_soon_threadsafe(self.update, text)
+
+    def update(self, text):
+        self.text = text
+
+        if self.scheduled is None:
+            delay = max(0, self.last_sent + self.interval - self.loop.time())
+            self.scheduled = self.loop.call_later(delay, self.flush)
+
+    def flush(self):
+        self.scheduled = None
+        text, self.text = self.text, None
+
+        if text:
+            self.last_sent = self.loop.time()
+            asyncio.ensure_future(self.send(json.dumps({"interim": text})), loop=self.loop)
+
+    # Drop the hypothesis waiting for sending, the final transcript replaces it (runs in the event loop)
+    def cancel(self):
+        if self.scheduled is not None:
+            self.scheduled.cancel()
+            self.scheduled = None
+
+        self.text = None
@@ -0,0 +1,99 @@
+"""
+================================================================================
+ Module: benchmark_idle_sockets.py
+ Description:
+        Management command which opens many speech WebSockets to a running
+        server and keeps them connected without sending any audio. CPU time
+        and number of threads of the server process are read from /proc
+        before and while the sockets are idle.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+import asyncio
+import os
+import time
+import websockets
+
+# CPU time (user + system) of the process in seconds
+def read_cpu_time(pid):
+    with open(f"/proc/{pid}/stat") as stat_file:
+        # Process name may contain spaces, fields are counted after it
+        fields = stat_file.read().rsplit(")", 1)[1].split()
+
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def read_thread_count(pid):
+    with open(f"/proc/{pid}/status") as status_file:
+        for line in status_file:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+
+    return None
+
+# CPU usage of the process in percent of one core over the duration
+async def measure_cpu(pid, duration):
+    cpu_start, time_start = read_cpu_time(pid), time.monotonic()
+    await asyncio.sleep(duration)
+    cpu_end, time_end = read_cpu_time(pid), time.monotonic()
+
+    return (cpu_end - cpu_start) / (time_end - time_start) * 100
+
+class Command(BaseCommand):
+    help = "Measure idle CPU and thread count of the server with many connected silent speech sockets"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pid", type=int, required=True, help="Process id of the server")
+        parser.add_argument("--url", default="ws://localhost:8000/ws/speech/", help="Speech WebSocket URL")
+        parser.add_argument("--connections", type=int, default=500, help="Number of sockets to open")
+        parser.add_argument("--duration", type=float, default=30, help="Seconds to measure idle sockets")
+
+    def handle(self, *args, **options):
+        pid = options["pid"]
+
+        if not os.path.exists(f"/proc/{pid}"):
+            raise CommandError(f"Process {pid} does not exist")
+
+        asyncio.run(self.run(pid, options["url"], options["connections"], options["duration"]))
+
+    async def run(self, pid, url, connection_count, duration):
+        self.stdout.write(f"Measuring server without connections for {duration:.0f} s")
+        baseline_threads = read_thread_count(pid)
+        baseline_cpu = await measure_cpu(pid, duration)
+
+        # Sockets are opened in small groups so the server is not flooded
+        opening = asyncio.Semaphore(50)
+
+        async def open_socket():
+            async with opening:
+                return await websockets.connect(url, open_timeout=30)
+
+        started = time.monotonic()
+        results = await asyncio.gather(*[open_socket() for _ in range(connection_count)], return_exceptions=True)
+        sockets = [result for result in results if not isinstance(result, Exception)]
+
+        self.stdout.write(
+            f"Opened {len(sockets)} of {connection_count} sockets in {time.monotonic() - started:.1f} s"
+        )
+
+        try:
+            # Let the recognizers start before measuring
+            await asyncio.sleep(5)
+
+            self.stdout.write(f"Measuring idle sockets for {duration:.0f} s")
+            idle_threads = read_thread_count(pid)
+            idle_cpu = await measure_cpu(pid, duration)
+
+        finally:
+            await asyncio.gather(*[socket.close() for socket in sockets], return_exceptions=True)
+
+        # Threads left after the sockets were closed show leaked sessions
+        await asyncio.sleep(5)
+        closed_threads = read_thread_count(pid)
+
+        self.stdout.write(f"Threads: {baseline_threads} without connections, {idle_threads} with idle sockets, "
+                          f"{closed_threads} after closing")
+        self.stdout.write(self.style.SUCCESS(
+            f"CPU: {baseline_cpu:.1f} % without connections, {idle_cpu:.1f} % with {len(sockets)} idle sockets"
+        ))
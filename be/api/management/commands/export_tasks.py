@@ -0,0 +1,113 @@
+"""
+================================================================================
+ Module: export_tasks.py
+ Description:
+        Management command which exports tasks with their examples, answers,
+        steps and skills as JSONL. The skill tree is exported first (parents
+        before their subskills), so skills can be matched by their path in
+        another database. Each task line is followed by lines of its
+        examples. Rows are read with server-side cursors in chunks, so the
+        whole catalogue is never loaded into memory.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from api.models import Task, Example, Step, Answer, Skill
+import json
+import sys
+import time
+
+class Command(BaseCommand):
+    help = "Export tasks and their examples to a JSONL file (use - for standard output)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Output JSONL file")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Number of rows fetched from the database at once")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("Chunk size has to be positive")
+
+        path = options["path"]
+        report = self.stderr if path == "-" else self.stdout
+
+        skill_count = 0
+        task_count = 0
+        example_count = 0
+        started = time.monotonic()
+
+        output_file = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+
+        try:
+            # Tasks and examples refer to the skills by the exported ids
+            for skill in self.get_skill_tree():
+                self.write_row(output_file, {
+                    "type": "skill",
+                    "id": skill["id"],
+                    "name": skill["name"],
+                    "parent": skill["parent_skill_id"],
+                    "skill_type": skill["skill_type"],
+                })
+                skill_count += 1
+
+            tasks = Task.objects.order_by("id").prefetch_related("skills")
+
+            for task in tasks.iterator(chunk_size=chunk_size):
+                self.write_row(output_file, {
+                    "type": "task",
+                    "name": task.name,
+                    "form": task.form,
+                    "skills": sorted(skill.id for skill in task.skills.all()),
+                })
+                task_count += 1
+
+                examples = Example.objects.filter(task=task).order_by("id").prefetch_related(
+                    Prefetch("answers", queryset=Answer.objects.order_by("id")),
+                    Prefetch("steps", queryset=Step.objects.order_by("order")),
+                    "exampleskill_set"
+                )
+
+                for example in examples.iterator(chunk_size=chunk_size):
+                    self.write_row(output_file, {
+                        "type": "example",
+                        "example": example.example,
+                        "input_type": example.input_type,
+                        "answers": [answer.answer for answer in example.answers.all()],
+                        "steps": [step.text for step in example.steps.all()],
+                        "skills": sorted(relation.skill_id for relation in example.exampleskill_set.all()),
+                    })
+                    example_count += 1
+
+        finally:
+            if output_file is not sys.stdout:
+                output_file.close()
+
+        elapsed = time.monotonic() - started
+        report.write(self.style.SUCCESS(
+            f"Exported {skill_count} skills, {task_count} tasks and {example_count} examples in {elapsed:.1f} s "
+            f"({example_count / max(elapsed, 1e-9):.0f} examples/s)."
+        ))
+
+    # Skills ordered so that every parent comes before its subskills
+    def get_skill_tree(self):
+        skills = list(Skill.objects.order_by("id").values("id", "name", "parent_skill_id", "skill_type"))
+        subskills = {}
+
+        for skill in skills:
+            subskills.setdefault(skill["parent_skill_id"], []).append(skill)
+
+        ordered = []
+        stack = list(reversed(subskills.get(None, [])))
+
+        while stack:
+            skill = stack.pop()
+            ordered.append(skill)
+            stack += reversed(subskills.get(skill["id"], []))
+
+        return ordered
+
+    def write_row(self, output_file, row):
+        output_file.write(json.dumps(row, ensure_ascii=False) + "\n")
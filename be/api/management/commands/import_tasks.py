@@ -0,0 +1,243 @@
+"""
+================================================================================
+ Module: import_tasks.py
+ Description:
+        Management command which imports tasks with their examples, answers,
+        steps and skills from a JSONL file created by export_tasks. The file
+        is read line by line and examples are written in batches with bulk
+        inserts, so memory use does not grow with the size of the file.
+        Exported skills are matched by their name and parent (missing ones
+        are created), so the file can be imported into another database.
+        Tasks which already exist are skipped, with --replace their examples
+        are replaced by the imported ones.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api.models import Task, Answer, Skill, ExampleSkill, Step, Example
+from api.utils import bulk_create_examples, create_skill_relations, catalogue_changed
+from api.utils import add_skill_to_closure, get_example_skill_sets
+from api.catalogue import bump_catalogue_version
+import json
+import sys
+import time
+
+class Command(BaseCommand):
+    help = "Import tasks and their examples from a JSONL file (use - for standard input)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="JSONL file created by export_tasks")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of examples written in one batch")
+        parser.add_argument("--replace", action="store_true", help="Replace examples of tasks which already exist (records of students are deleted with them)")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("Batch size has to be positive")
+
+        path = options["path"]
+        replace = options["replace"]
+        self.verbosity = options["verbosity"]
+        self.report = self.stderr if path == "-" else self.stdout
+
+        # Exported skill ids mapped to skills of this database, files without skills refer to skills of this database
+        self.skill_map = {}
+        self.skill_ids = set(Skill.objects.values_list("id", flat=True))
+
+        self.batch = []
+        self.skill_count = 0
+        self.task_count = 0
+        self.skipped_count = 0
+        self.example_count = 0
+        self.started = time.monotonic()
+
+        task = None
+        skip_task = False
+        task_skill_ids = []
+        related_skill_sets = set()
+
+        input_file = sys.stdin if path == "-" else open(path, encoding="utf-8")
+
+        try:
+            for line_number, line in enumerate(input_file, start=1):
+                if not line.strip():
+                    continue
+
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise CommandError(f"Line {line_number}: invalid JSON ({e})")
+
+                if row.get("type") == "skill":
+                    if task is not None:
+                        raise CommandError(f"Line {line_number}: skill after the first task")
+
+                    self.import_skill(row, line_number)
+
+                elif row.get("type") == "task":
+                    # Examples of the previous task are written before the next task starts
+                    self.flush()
+
+                    if not row.get("name"):
+                        raise CommandError(f"Line {line_number}: task without name")
+
+                    task_skill_ids = self.check_skills(row.get("skills", []), line_number)
+
+                    task, created = Task.objects.get_or_create(name=row["name"])
+
+                    # Examples of an existing task would be imported twice
+                    skip_task = not created and not replace
+                    if skip_task:
+                        self.skipped_count += 1
+                        continue
+
+                    if not created:
+                        self.delete_examples(task)
+                        task.skills.clear()
+
+                    task.form = row.get("form") or "classic"
+                    task.save()
+                    task.skills.add(*task_skill_ids)
+
+                    related_skill_sets.add(frozenset(task_skill_ids))
+                    self.task_count += 1
+
+                elif row.get("type") == "example":
+                    if task is None:
+                        raise CommandError(f"Line {line_number}: example before the first task")
+
+                    if skip_task:
+                        continue
+
+                    if not row.get("example") or not row.get("input_type"):
+                        raise CommandError(f"Line {line_number}: example without text or input type")
+
+                    # Examples without own skills get the skills of their task
+                    example_skill_ids = self.check_skills(row.get("skills", task_skill_ids), line_number)
+
+                    self.batch.append((
+                        Example(example=row["example"], input_type=row["input_type"], task=task),
+                        row.get("answers", []),
+                        row.get("steps", []),
+                        example_skill_ids,
+                    ))
+
+                    if len(self.batch) >= batch_size:
+                        self.flush()
+
+                else:
+                    raise CommandError(f"Line {line_number}: unknown row type {row.get('type')!r}")
+
+            self.flush()
+
+        finally:
+            if input_file is not sys.stdin:
+                input_file.close()
+
+        # Relations between skills of the imported tasks
+        for skill_ids in related_skill_sets:
+            create_skill_relations(skill_ids)
+
+        # Tasks and skill relations changed without examples are not covered by the bumps of the batches
+        bump_catalogue_version()
+
+        elapsed = time.monotonic() - self.started
+        self.report.write(self.style.SUCCESS(
+            f"Imported {self.task_count} tasks and {self.example_count} examples in {elapsed:.1f} s "
+            f"({self.example_count / max(elapsed, 1e-9):.0f} examples/s), "
+            f"created {self.skill_count} skills, skipped {self.skipped_count} existing tasks."
+        ))
+
+    # Find the skill with the same name and parent or create it, its parent has to be imported before it
+    def import_skill(self, row, line_number):
+        if row.get("id") is None or not row.get("name"):
+            raise CommandError(f"Line {line_number}: skill without id or name")
+
+        parent_id = None
+        if row.get("parent") is not None:
+            parent_id = self.skill_map.get(row["parent"])
+            if parent_id is None:
+                raise CommandError(f"Line {line_number}: parent skill {row['parent']} is not imported before its subskill")
+
+        # Deleted skill with the same path is used only if there is no other one
+        skill = Skill.objects.filter(name=row["name"], parent_skill_id=parent_id).order_by("deleted", "id").first()
+
+        if skill is None:
+            with transaction.atomic():
+                parent = Skill.objects.get(id=parent_id) if parent_id is not None else None
+                skill = Skill.objects.create(
+                    name=row["name"],
+                    parent_skill=parent,
+                    skill_type=row.get("skill_type") or (parent.skill_type if parent else None),
+                    height=parent.height + 1 if parent else 0,
+                )
+
+                # Link the skill to its ancestors
+                add_skill_to_closure(skill)
+
+            self.skill_count += 1
+
+        self.skill_map[row["id"]] = skill.id
+
+    # Skills of this database for the skills of the row, all of them have to be known
+    def check_skills(self, skill_ids, line_number):
+        if self.skill_map:
+            unknown_ids = set(skill_ids) - set(self.skill_map)
+        else:
+            unknown_ids = set(skill_ids) - self.skill_ids
+
+        if unknown_ids:
+            raise CommandError(f"Line {line_number}: unknown skills {sorted(unknown_ids)}")
+
+        if self.skill_map:
+            skill_ids = [self.skill_map[skill_id] for skill_id in skill_ids]
+
+        return sorted(set(skill_ids))
+
+    # Delete examples of the task which is replaced
+    def delete_examples(self, task):
+        with transaction.atomic():
+            skill_sets = get_example_skill_sets(list(task.example_set.values_list("id", flat=True)))
+            Example.objects.filter(task=task).delete()
+
+            catalogue_changed(before=skill_sets)
+
+    # Write the collected examples with their answers, steps and skills
+    def flush(self):
+        if not self.batch:
+            return
+
+        with transaction.atomic():
+            examples = bulk_create_examples([example for example, _, _, _ in self.batch])
+
+            answers = []
+            steps = []
+            example_skills = []
+            skill_sets = {}
+
+            for example, example_answers, example_steps, example_skill_ids in self.batch:
+                answers += [Answer(example=example, answer=answer) for answer in example_answers if answer]
+                steps += [
+                    Step(example=example, order=order, text=text)
+                    for order, text in enumerate(example_steps, start=1) if text
+                ]
+                example_skills += [ExampleSkill(example=example, skill_id=skill_id) for skill_id in example_skill_ids]
+                skill_sets[example.id] = set(example_skill_ids)
+
+            Answer.objects.bulk_create(answers)
+            Step.objects.bulk_create(steps)
+            ExampleSkill.objects.bulk_create(example_skills)
+
+            catalogue_changed(after=skill_sets)
+
+        self.example_count += len(examples)
+        self.batch = []
+
+        if self.verbosity > 1:
+            elapsed = time.monotonic() - self.started
+            self.report.write(
+                f"{self.example_count} examples ({self.example_count / max(elapsed, 1e-9):.0f} examples/s)"
+            )
+
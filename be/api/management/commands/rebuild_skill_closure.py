@@ -0,0 +1,24 @@
+"""
+================================================================================
+ Module: rebuild_skill_closure.py
+ Description:
+        Management command which recreates the skill closure table from
+        the parent skills, e.g. after skills were imported by SQL.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+from django.core.management.base import BaseCommand
+from api.utils import rebuild_skill_closure
+from api.catalogue import bump_catalogue_version
+
+class Command(BaseCommand):
+    help = "Rebuild the skill ancestor/descendant closure table"
+
+    def handle(self, *args, **kwargs):
+        row_count = rebuild_skill_closure()
+
+        # Skill graph has to be reloaded from the new closure rows
+        bump_catalogue_version()
+
+        self.stdout.write(self.style.SUCCESS(f'Skill closure rebuilt ({row_count} rows).'))
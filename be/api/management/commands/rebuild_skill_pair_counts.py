@@ -0,0 +1,24 @@
+"""
+================================================================================
+ Module: rebuild_skill_pair_counts.py
+ Description:
+        Management command which recreates counts of examples for every
+        pair of skills from the example skills in one aggregate query.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+from django.core.management.base import BaseCommand
+from api.utils import rebuild_skill_pair_counts
+from api.catalogue import bump_catalogue_version
+
+class Command(BaseCommand):
+    help = "Rebuild counts of examples having both skills of each skill pair"
+
+    def handle(self, *args, **kwargs):
+        row_count = rebuild_skill_pair_counts()
+
+        # Cached responses with example counts have to be created again
+        bump_catalogue_version()
+
+        self.stdout.write(self.style.SUCCESS(f'Skill pair counts rebuilt ({row_count} pairs).'))
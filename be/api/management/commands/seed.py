@@ -1,13 +1,13 @@
 from django.core.management.base import BaseCommand
 from api.models import Skill 
+from api.utils import add_skill_to_closure
 
 class Command(BaseCommand):
 
     def handle(self, *args, **kwargs):
         # Create example data
-        Skill.objects.create(name='add-sub')
-        Skill.objects.create(name='mult-div')
-        Skill.objects.create(name='frac')
+        for name in ['add-sub', 'mult-div', 'frac']:
+            add_skill_to_closure(Skill.objects.create(name=name))
         
 
         self.stdout.write(self.style.SUCCESS('Database seeded successfully!'))
\ No newline at end of file
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_skill_closure(apps, schema_editor):
+    Skill = apps.get_model('api', 'Skill')
+    SkillClosure = apps.get_model('api', 'SkillClosure')
+
+    parents = dict(Skill.objects.values_list('id', 'parent_skill_id'))
+    rows = []
+
+    for skill_id in parents:
+        rows.append(SkillClosure(ancestor_id=skill_id, descendant_id=skill_id, depth=0))
+
+        depth = 1
+        visited = {skill_id}
+        parent_id = parents[skill_id]
+        while parent_id is not None and parent_id not in visited:
+            rows.append(SkillClosure(ancestor_id=parent_id, descendant_id=skill_id, depth=depth))
+            visited.add(parent_id)
+            parent_id = parents.get(parent_id)
+            depth += 1
+
+    SkillClosure.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_delete_audioprompt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(default=0)),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='api.skill')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='api.skill')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_skill_closure')],
+            },
+        ),
+        migrations.RunPython(populate_skill_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def populate_skill_pair_counts(apps, schema_editor):
+    ExampleSkill = apps.get_model('api', 'ExampleSkill')
+    SkillPairCount = apps.get_model('api', 'SkillPairCount')
+
+    pairs = ExampleSkill.objects.filter(
+        example__exampleskill__skill_id__gte=F('skill_id')
+    ).values(
+        'skill_id', 'example__exampleskill__skill_id'
+    ).annotate(count=Count('example_id', distinct=True))
+
+    SkillPairCount.objects.bulk_create([
+        SkillPairCount(
+            skill_low_id=pair['skill_id'],
+            skill_high_id=pair['example__exampleskill__skill_id'],
+            count=pair['count']
+        )
+        for pair in pairs
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_skillclosure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillPairCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('skill_high', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.skill')),
+                ('skill_low', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.skill')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('skill_low', 'skill_high'), name='unique_skill_pair_count')],
+            },
+        ),
+        migrations.RunPython(populate_skill_pair_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_skillpaircount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMVerdict',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('answer', models.CharField(max_length=255)),
+                ('input_type', models.CharField(max_length=20)),
+                ('transcript', models.TextField()),
+                ('verdict', models.BooleanField()),
+                ('created', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
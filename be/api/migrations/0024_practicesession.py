@@ -0,0 +1,46 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:33
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_llmverdict'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PracticeSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('started', models.DateTimeField(auto_now_add=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.student')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PracticeBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batches', to='api.practicesession')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='studentexample',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='records', to='api.practicesession'),
+        ),
+        migrations.AddConstraint(
+            model_name='studentexample',
+            constraint=models.UniqueConstraint(fields=('session', 'example'), name='unique_session_example'),
+        ),
+        migrations.AddConstraint(
+            model_name='practicebatch',
+            constraint=models.UniqueConstraint(fields=('session', 'key'), name='unique_practice_batch_key'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_catalogueversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='llmverdict',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
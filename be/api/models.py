@@ -7,6 +7,7 @@
 ================================================================================
 """
 
+import uuid
 from django.db import models
 from django.contrib.auth.hashers import make_password, check_password
 
@@ -79,14 +80,61 @@ class Skill(models.Model):
         symmetrical=True,  
     )
     
+class SkillClosure(models.Model):
+    ancestor = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='ancestor_links')
+
+    # Number of edges between ancestor and descendant (0 for the skill itself)
+    depth = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_skill_closure')
+        ]
+
 class ExampleSkill(models.Model):
     example = models.ForeignKey(Example, on_delete=models.CASCADE)
     skill = models.ForeignKey(Skill, on_delete=models.CASCADE)
 
+class SkillPairCount(models.Model):
+    # Pair is stored once with skill_low_id <= skill_high_id, equal ids hold example count of one skill
+    skill_low = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='+')
+    skill_high = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='+')
+
+    # Number of examples having both skills
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['skill_low', 'skill_high'], name='unique_skill_pair_count')
+        ]
+
+# Single row with the version stamp of the task and skill catalogue, shared by all processes
+class CatalogueVersion(models.Model):
+    version = models.BigIntegerField()
+
 class Student(models.Model):
     username = models.CharField(max_length=255,unique=True)
     passphrase = models.CharField(max_length=255)
 
+# One practice run of a student, its attempts are written in batches
+class PracticeSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    started = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+# Batch of attempts already written, a repeated batch with the same key is not applied again
+class PracticeBatch(models.Model):
+    session = models.ForeignKey(PracticeSession, on_delete=models.CASCADE, related_name='batches')
+    key = models.CharField(max_length=64)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'key'], name='unique_practice_batch_key')
+        ]
+
 class StudentExample(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     example = models.ForeignKey(Example, on_delete=models.CASCADE)
@@ -96,9 +144,13 @@ class StudentExample(models.Model):
     solved = models.BooleanField(default=False)
     skipped = models.BooleanField(default=False)
 
+    # Records written by practice session batches, records of the single record endpoints have none
+    session = models.ForeignKey(PracticeSession, on_delete=models.CASCADE, null=True, blank=True, related_name='records')
+
     class Meta:
         constraints = [
-            models.UniqueConstraint(fields=['student', 'example', 'date'], name='unique_student_example_date')
+            models.UniqueConstraint(fields=['student', 'example', 'date'], name='unique_student_example_date'),
+            models.UniqueConstraint(fields=['session', 'example'], name='unique_session_example')
         ]
 
 class Admin(models.Model):
@@ -113,3 +165,17 @@ class Admin(models.Model):
     def check_password(self, password):
         return check_password(password, self.password)
 
+
+class LLMVerdict(models.Model):
+    # Hash of the correct answer, input type and normalized transcript
+    key = models.CharField(max_length=64, unique=True)
+
+    answer = models.CharField(max_length=255)
+    input_type = models.CharField(max_length=20)
+    transcript = models.TextField()
+
+    # Evaluation of the transcript by the LLM
+    verdict = models.BooleanField()
+
+    # Verdict expires LLM_VERDICT_TTL seconds after it was first stored, expired rows are deleted by new verdicts
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
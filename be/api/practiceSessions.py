@@ -0,0 +1,154 @@
+"""
+================================================================================
+ Module: practiceSessions.py
+ Description:
+        Practice sessions with batched attempts. A session is created once
+        per practice run and has an id generated by the server. Attempts of
+        the run are sent in batches, each batch is written with one query
+        loading the records of its examples, one bulk insert of new records
+        and one bulk update of the existing ones. A batch with an
+        idempotency key which was already applied is not applied again, so
+        the client can safely repeat a batch whose response was lost.
+        Records of examples shown in the run are created with the session,
+        so attempts answered by voice and attempts of the batches are
+        counted in the same record.
+        Attempts carry the result of the answer as the client evaluated it
+        (solved), it is trusted the same way as the time of the attempt
+        sent to the single record endpoints.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from .models import Example, PracticeSession, PracticeBatch, StudentExample
+from .records import should_continue
+
+RECORD_FIELDS = ["attempts", "duration", "solved", "skipped"]
+
+class InvalidAttemptError(Exception):
+    pass
+
+def create_session(student_id):
+    return PracticeSession.objects.create(student_id=student_id)
+
+# Check that the session exists and belongs to the student (the id sent by the client may not be valid)
+def session_exists(session_id, student_id):
+    try:
+        return PracticeSession.objects.filter(id=session_id, student_id=student_id).exists()
+    except ValidationError:
+        return False
+
+# Check the idempotency key and the finished flag of the batch, returns the key as a string or None
+def parse_batch(idempotency_key, finished):
+    if not isinstance(finished, bool):
+        raise InvalidAttemptError("Finished has to be true or false")
+
+    if idempotency_key is None or idempotency_key == "":
+        return None
+
+    if not isinstance(idempotency_key, (str, int)) or isinstance(idempotency_key, bool):
+        raise InvalidAttemptError("Idempotency key has to be a string")
+
+    idempotency_key = str(idempotency_key)
+
+    if len(idempotency_key) > PracticeBatch._meta.get_field("key").max_length:
+        raise InvalidAttemptError("Idempotency key is too long")
+
+    return idempotency_key
+
+# Check the attempts sent by the client and return them as (example id, duration, solved, skipped)
+# (solved is the result evaluated by the client)
+def parse_attempts(attempts):
+    if not isinstance(attempts, list):
+        raise InvalidAttemptError("Attempts have to be a list")
+
+    parsed = []
+
+    for attempt in attempts:
+        if not isinstance(attempt, dict):
+            raise InvalidAttemptError("Attempt has to be an object")
+
+        try:
+            example_id = int(attempt["example_id"])
+            duration = int(attempt.get("duration", 0))
+        except (KeyError, TypeError, ValueError):
+            raise InvalidAttemptError("Attempt needs example_id and a numeric duration")
+
+        solved = attempt.get("solved")
+        if solved is not None and not isinstance(solved, bool):
+            raise InvalidAttemptError("Solved has to be true, false or null")
+
+        parsed.append((example_id, duration, solved, bool(attempt.get("skipped", False))))
+
+    return parsed
+
+# State of the records shown to the client after the batch
+def get_record_states(records):
+    return [{
+        "example_id": record.example_id,
+        "attempts": record.attempts,
+        "solved": record.solved,
+        "skipped": record.skipped,
+        "next_example": record.skipped or should_continue(record.attempts, record.solved),
+    } for record in records]
+
+# Write a batch of attempts to the records of the session
+# Returns (record states, True if the batch was applied before) or None if the session does not exist
+def apply_attempts(session_id, attempts, idempotency_key=None, finished=False):
+    idempotency_key = parse_batch(idempotency_key, finished)
+    attempts = parse_attempts(attempts)
+    example_ids = {example_id for example_id, _, _, _ in attempts}
+
+    with transaction.atomic():
+        # Batches of one session are written one after another
+        session = PracticeSession.objects.select_for_update().filter(id=session_id).first()
+
+        if session is None:
+            return None
+
+        if idempotency_key:
+            _, created = PracticeBatch.objects.get_or_create(session=session, key=idempotency_key)
+
+            if not created:
+                records = StudentExample.objects.filter(session=session, example_id__in=example_ids).order_by('id')
+                return get_record_states(records), True
+
+        if Example.objects.filter(id__in=example_ids).count() != len(example_ids):
+            raise InvalidAttemptError("Unknown example")
+
+        records = {
+            record.example_id: record
+            for record in StudentExample.objects.filter(session=session, example_id__in=example_ids)
+        }
+        existing = set(records)
+
+        for example_id, duration, solved, skipped in attempts:
+            record = records.get(example_id)
+
+            if record is None:
+                record = StudentExample(student_id=session.student_id, example_id=example_id, session=session)
+                records[example_id] = record
+
+            # Skipped record does not count attempts and duration, same as skip_record
+            if skipped:
+                record.skipped = True
+                record.attempts = 0
+                record.duration = 0
+                continue
+
+            record.attempts += 1
+            record.duration = duration
+
+            if solved is not None:
+                record.solved = solved
+
+        StudentExample.objects.bulk_create([records[example_id] for example_id in records if example_id not in existing])
+        StudentExample.objects.bulk_update([records[example_id] for example_id in existing], RECORD_FIELDS)
+
+        if finished and session.finished is None:
+            session.finished = timezone.now()
+            session.save(update_fields=["finished"])
+
+    return get_record_states(records.values()), False
@@ -0,0 +1,202 @@
+"""
+================================================================================
+ Module: recognizerPool.py
+ Description:
+        Pool of prepared Azure speech recognizer sessions kept for each
+        language. A session has its recognizer, audio stream and an opened
+        connection to the service ready before a client connects, so the
+        recognition of the first answer does not wait for the connection
+        setup. Sessions are checked out by the speech consumers on connect
+        or language switch. Unused sessions are returned to the pool, used
+        ones are closed (the audio stream cannot be reopened) and the pool
+        is refilled in the background. Azure drops idle connections, so
+        sessions older than SPEECH_POOL_SESSION_TTL seconds or with a
+        dropped connection are closed instead of being handed out.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import azure.cognitiveservices.speech as speechsdk
+from be.settings import AZURE_API_KEY, AZURE_REGION, SPEECH_RECOGNIZER_THREADS
+from be.settings import SPEECH_POOL_LANGUAGES, SPEECH_POOL_MIN_SIZE, SPEECH_POOL_MAX_SIZE, SPEECH_POOL_SESSION_TTL
+
+# Creating, starting and stopping of recognizers of all connections of the process (blocking SDK calls)
+recognizer_executor = ThreadPoolExecutor(max_workers=SPEECH_RECOGNIZER_THREADS, thread_name_prefix="speech-recognizer")
+
+# Recognizer with its audio stream, used by one connection at a time
+class RecognizerSession:
+
+    def __init__(self, language):
+        self.language = language
+
+        # Azure STT configuration
+        speech_config = speechsdk.SpeechConfig(subscription=AZURE_API_KEY, region=AZURE_REGION)
+        audio_format = speechsdk.audio.AudioStreamFormat(samples_per_second=16000, bits_per_sample=16, channels=1)
+        self.stream = speechsdk.audio.PushAudioInputStream(stream_format=audio_format)
+        audio_config = speechsdk.audio.AudioConfig(stream=self.stream)
+
+        self.recognizer = speechsdk.SpeechRecognizer(
+            speech_config=speech_config,
+            audio_config=audio_config,
+            language=language
+        )
+
+        # Connection to the service is opened before the session is used
+        self.connection = speechsdk.Connection.from_recognizer(self.recognizer)
+        self.disconnected = False
+        self.connection.disconnected.connect(self.disconnected_cb)
+        self.connection.open(True)
+
+        self.created = time.monotonic()
+        self.recognition_start = None
+
+    def disconnected_cb(self, evt):
+        self.disconnected = True
+
+    # Session can be handed out, its connection was not dropped and is not too old
+    def is_usable(self, ttl):
+        return not self.disconnected and time.monotonic() - self.created < ttl
+
+    @property
+    def started(self):
+        return self.recognition_start is not None
+
+    # Connect the callbacks of the connection and start the recognition in the shared executor
+    def start(self, recognized_cb, recognizing_cb=None):
+        self.recognizer.recognized.connect(recognized_cb)
+        if recognizing_cb:
+            self.recognizer.recognizing.connect(recognizing_cb)
+
+        self.recognition_start = recognizer_executor.submit(self.recognizer.start_continuous_recognition)
+        return self.recognition_start
+
+    # Stop the recognition and release the connection (blocking)
+    def close(self):
+        self.stream.close()
+
+        # Recognition has to be started before it can be stopped
+        if self.started and self.recognition_start.exception() is None:
+            self.recognizer.stop_continuous_recognition()
+
+        self.recognizer.recognized.disconnect_all()
+        self.recognizer.recognizing.disconnect_all()
+        self.connection.disconnected.disconnect_all()
+        self.connection.close()
+
+class RecognizerPool:
+
+    def __init__(self, languages, min_size, max_size, session_ttl):
+        self.languages = languages
+        self.min_size = min_size
+        self.max_size = max_size
+        self.session_ttl = session_ttl
+
+        self.lock = threading.Lock()
+        self.idle = {language: deque() for language in languages}
+
+        # Sessions being created in the background for each language
+        self.pending = {language: 0 for language in languages}
+        self.warmed_up = False
+
+    # Create sessions in the background until the pool has the minimal size
+    def refill(self, language):
+        if language not in self.languages:
+            return
+
+        with self.lock:
+            missing = self.min_size - len(self.idle[language]) - self.pending[language]
+            self.pending[language] += max(missing, 0)
+
+        for _ in range(missing):
+            recognizer_executor.submit(self.add_session, language)
+
+    def add_session(self, language):
+        try:
+            session = RecognizerSession(language)
+        except Exception as e:
+            print(f"Recognizer session could not be created: {e}")
+            session = None
+
+        with self.lock:
+            self.pending[language] -= 1
+            if session is not None and len(self.idle[language]) < self.max_size:
+                self.idle[language].append(session)
+                return
+
+        if session is not None:
+            session.close()
+
+    # Fill the pools of all languages, done on the first checkout so commands do not connect to Azure
+    def warm_up(self):
+        with self.lock:
+            if self.warmed_up:
+                return
+            self.warmed_up = True
+
+        for language in self.languages:
+            self.refill(language)
+
+    # Remove sessions which cannot be handed out anymore, returns them to be closed (called with the lock)
+    def remove_stale(self, language):
+        idle = self.idle.get(language)
+        if not idle:
+            return []
+
+        stale = [session for session in idle if not session.is_usable(self.session_ttl)]
+        if stale:
+            self.idle[language] = deque(session for session in idle if session.is_usable(self.session_ttl))
+
+        return stale
+
+    # Take a prepared session of the language or create a new one (blocking)
+    def checkout(self, language):
+        self.warm_up()
+
+        with self.lock:
+            stale = self.remove_stale(language)
+            session = self.idle[language].popleft() if self.idle.get(language) else None
+
+        for stale_session in stale:
+            recognizer_executor.submit(stale_session.close)
+
+        if session is None:
+            session = RecognizerSession(language)
+
+        self.refill(language)
+        return session
+
+    # Return an unused session to the pool, close a used one (blocking)
+    def release(self, session):
+        if not session.started and session.is_usable(self.session_ttl):
+            with self.lock:
+                idle = self.idle.get(session.language)
+                if idle is not None and len(idle) < self.max_size:
+                    idle.append(session)
+                    return
+
+        session.close()
+        self.refill(session.language)
+
+    # Number of prepared sessions for monitoring
+    def get_state(self):
+        with self.lock:
+            return {language: len(sessions) for language, sessions in self.idle.items()}
+
+recognizer_pool = RecognizerPool(SPEECH_POOL_LANGUAGES, SPEECH_POOL_MIN_SIZE, SPEECH_POOL_MAX_SIZE, SPEECH_POOL_SESSION_TTL)
+
+# Check out a session of the language without blocking the event loop
+async def acquire_session(language):
+    return await asyncio.get_running_loop().run_in_executor(recognizer_executor, recognizer_pool.checkout, language)
+
+# Hand the session back to the pool without blocking the event loop
+async def release_session(session):
+    # Waiting for the start in the executor could use up its threads
+    if session.started:
+        await asyncio.wait([asyncio.wrap_future(session.recognition_start)])
+
+    await asyncio.get_running_loop().run_in_executor(recognizer_executor, recognizer_pool.release, session)
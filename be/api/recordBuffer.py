@@ -0,0 +1,399 @@
+"""
+================================================================================
+ Module: recordBuffer.py
+ Description:
+        Write-behind buffer of attempts of student records. Attempts and
+        skips are applied to the state of the record kept in memory, so
+        the number of attempts (and whether the next example is shown) is
+        known without a query, and the changes are written later by one
+        background thread of the process. Changes of all records waiting
+        for writing are written with one UPDATE statement per
+        FLUSH_CHUNK_SIZE records every RECORD_BUFFER_FLUSH_INTERVAL seconds,
+        sooner when RECORD_BUFFER_MAX_PENDING records are waiting, and when
+        the process exits. With RECORD_BUFFER_JOURNAL every change is also
+        appended to a local journal before it is confirmed (changes of
+        requests arriving at once are synced to the disk together), changes
+        not written before a crash are written again from the journal when
+        the buffer starts (a crash right after writing may count them
+        twice). The buffer starts with the first change, so management
+        commands and the autoreloader do not touch the journal, and the
+        journal is locked by the process using it. The buffer is turned off by default, it can only be used
+        when answers of one student are handled by one process.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+from cachetools import TTLCache
+from datetime import timezone as dt_timezone
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from be.settings import RECORD_BUFFER, RECORD_BUFFER_FLUSH_INTERVAL, RECORD_BUFFER_MAX_PENDING, RECORD_BUFFER_JOURNAL
+from .models import StudentExample
+
+# Records whose state is kept in memory, a record loaded again gets the changes still waiting for writing
+STATE_CACHE_SIZE = 10000
+STATE_TTL = 3600
+
+# Maximum number of records changed by one UPDATE statement
+FLUSH_CHUNK_SIZE = 500
+
+# Change of one record waiting for writing, attempts are added to the written value unless the record was skipped
+def new_change():
+    return {"attempts": 0, "duration": None, "solved": None, "skipped": False}
+
+# Apply an attempt (or a skip) to the change of a record or to the state of a record
+def apply_operation(change, duration=None, solved=None, skip=False):
+    # Skipped record does not count attempts and duration, same as skip_record
+    if skip:
+        change.update(attempts=0, duration=0, skipped=True)
+        return
+
+    change["attempts"] += 1
+    change["duration"] = duration
+
+    if solved is not None:
+        change["solved"] = solved
+
+# Change with the newer change applied after the older one
+def merge_changes(older, newer):
+    if newer["skipped"]:
+        return dict(newer)
+
+    return {
+        "attempts": older["attempts"] + newer["attempts"],
+        "duration": newer["duration"] if newer["duration"] is not None else older["duration"],
+        "solved": newer["solved"] if newer["solved"] is not None else older["solved"],
+        "skipped": older["skipped"],
+    }
+
+# Key of the record in the buffer, the date is parsed so different spellings of it give the same key
+# Returns None if the date is not valid
+def get_record_key(student_id, example_id, date):
+    try:
+        date = StudentExample._meta.get_field("date").to_python(date)
+    except ValidationError:
+        return None
+
+    if date is None:
+        return None
+
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+
+    return (str(student_id), str(example_id), date.astimezone(dt_timezone.utc))
+
+# Write changes of records {record id: change} with one UPDATE per chunk
+def write_changes(changes):
+    record_ids = list(changes)
+
+    with transaction.atomic():
+        for position in range(0, len(record_ids), FLUSH_CHUNK_SIZE):
+            chunk = record_ids[position:position + FLUSH_CHUNK_SIZE]
+
+            attempts = [
+                When(pk=record_id, then=Value(changes[record_id]["attempts"]) if changes[record_id]["skipped"]
+                     else F("attempts") + changes[record_id]["attempts"])
+                for record_id in chunk
+            ]
+            fields = {"attempts": Case(*attempts, default=F("attempts"), output_field=StudentExample._meta.get_field("attempts"))}
+
+            for field in ["duration", "solved"]:
+                cases = [
+                    When(pk=record_id, then=Value(changes[record_id][field]))
+                    for record_id in chunk if changes[record_id][field] is not None
+                ]
+                if cases:
+                    fields[field] = Case(*cases, default=F(field), output_field=StudentExample._meta.get_field(field))
+
+            skipped = [record_id for record_id in chunk if changes[record_id]["skipped"]]
+            if skipped:
+                fields["skipped"] = Case(When(pk__in=skipped, then=Value(True)), default=F("skipped"))
+
+            StudentExample.objects.filter(pk__in=chunk).update(**fields)
+
+class RecordWriteBuffer:
+
+    def __init__(self, flush_interval, max_pending, journal=None):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.journal = journal
+
+        # State of records {(student, example, date): state} and changes waiting for writing {record id: change}
+        self.states = TTLCache(maxsize=STATE_CACHE_SIZE, ttl=STATE_TTL)
+        self.pending = {}
+        self.flushing = {}
+        self.lock = threading.Lock()
+
+        # Odd while changes are being written, records are not loaded from the database then
+        self.generation = 0
+        self.flush_lock = threading.Lock()
+
+        self.thread = None
+        self.start_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = False
+
+        # Journal segment written now and closed segments with changes not written yet
+        self.journal_lock = None
+        self.journal_file = None
+        self.segment = 0
+        self.segments = []
+
+        # Number of operations written to the journal and synced to the disk (synced with sync_lock)
+        self.written = 0
+        self.synced = 0
+        self.sync_lock = threading.Lock()
+
+    # Start the writer thread and write changes left in the journal, done with the first change
+    def start(self):
+        with self.start_lock:
+            if self.thread is not None:
+                return
+
+            if self.journal:
+                self.lock_journal()
+                self.replay_journal()
+
+            self.thread = threading.Thread(target=self.run, name="record-write-buffer", daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+
+    # Only one process may replay and write the journal, the lock is released when the process exits
+    def lock_journal(self):
+        os.makedirs(os.path.dirname(self.journal) or ".", exist_ok=True)
+
+        self.journal_lock = open(f"{self.journal}.lock", "a")
+
+        try:
+            fcntl.flock(self.journal_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print(f"Journal {self.journal} is used by another process, waiting for it")
+            fcntl.flock(self.journal_lock, fcntl.LOCK_EX)
+
+    def replay_journal(self):
+        # Segments are numbered, the lock file is not a segment
+        paths = [path for path in glob.glob(f"{self.journal}.*") if path.rsplit(".", 1)[1].isdigit()]
+        paths.sort(key=lambda path: int(path.rsplit(".", 1)[1]))
+
+        for path in paths:
+            with open(path, encoding="utf-8") as journal_file:
+                for line in journal_file:
+                    # Last line of a crashed process may be written only partly
+                    try:
+                        operation = json.loads(line)
+                    except ValueError:
+                        continue
+
+                    change = self.pending.setdefault(operation["id"], new_change())
+                    apply_operation(change, operation.get("duration"), operation.get("solved"), operation.get("skip", False))
+
+        self.segments = paths
+        self.segment = int(paths[-1].rsplit(".", 1)[1]) + 1 if paths else 0
+
+        if self.pending:
+            print(f"Replaying {len(self.pending)} record changes from the journal")
+            self.wake.set()
+
+    # State of the record with the changes waiting for writing, None if the record does not exist
+    def get_state(self, key):
+        while True:
+            with self.lock:
+                state = self.states.get(key)
+                if state is not None:
+                    return state
+
+                generation = self.generation
+
+            # Changes are being written, the record would be loaded with some of them
+            if generation % 2:
+                with self.flush_lock:
+                    continue
+
+            record = StudentExample.objects.filter(
+                student_id=key[0], example_id=key[1], date=key[2]
+            ).values("id", "attempts", "solved", "skipped").first()
+
+            if record is None:
+                return None
+
+            with self.lock:
+                # Loaded by another thread meanwhile
+                state = self.states.get(key)
+                if state is not None:
+                    return state
+
+                # Changes were written meanwhile, the loaded record may be missing them
+                if self.generation != generation:
+                    continue
+
+                state = record
+                change = self.pending.get(record["id"])
+
+                if change is not None:
+                    state["attempts"] = merge_changes({**new_change(), "attempts": record["attempts"]}, change)["attempts"]
+                    state["solved"] = change["solved"] if change["solved"] is not None else record["solved"]
+                    state["skipped"] = record["skipped"] or change["skipped"]
+
+                self.states[key] = state
+                return state
+
+    # Apply the attempt or the skip to the record, returns its state after it or None if the record does not exist
+    def apply(self, key, duration=None, solved=None, skip=False):
+        if key is None:
+            return None
+
+        # Changes left in the journal are loaded before any record
+        self.start()
+
+        state = self.get_state(key)
+
+        if state is None:
+            return None
+
+        with self.lock:
+            # State may have been dropped from the cache meanwhile, it stays valid for this change
+            self.states[key] = state
+            apply_operation(state, duration, solved, skip)
+            apply_operation(self.pending.setdefault(state["id"], new_change()), duration, solved, skip)
+
+            if self.journal:
+                self.write_journal({"id": state["id"], "duration": duration, "solved": solved, "skip": skip})
+                written = self.written
+
+            result = dict(state)
+
+            if len(self.pending) >= self.max_pending:
+                self.wake.set()
+
+        # Change is confirmed once it is on the disk
+        if self.journal:
+            self.sync_journal(written)
+
+        return result
+
+    # Count one attempt of the record and return the number of attempts after it (None if the record does not exist)
+    # Duration has to be converted by parse_duration
+    def record_attempt(self, student_id, example_id, date, duration, solved=None):
+        state = self.apply(get_record_key(student_id, example_id, date), duration, solved)
+        return state["attempts"] if state else None
+
+    # Mark the record as skipped (returns False if it does not exist)
+    def skip_record(self, student_id, example_id, date):
+        return self.apply(get_record_key(student_id, example_id, date), skip=True) is not None
+
+    # Forget the record before it is deleted, its changes are not written
+    def discard(self, student_id, example_id, date):
+        key = get_record_key(student_id, example_id, date)
+
+        with self.lock:
+            state = self.states.pop(key, None)
+
+            if state is not None:
+                self.pending.pop(state["id"], None)
+
+    # Append the operation to the journal (called with the lock), it is synced to the disk by sync_journal
+    def write_journal(self, operation):
+        if self.journal_file is None:
+            self.journal_file = open(f"{self.journal}.{self.segment}", "a", encoding="utf-8")
+
+        self.journal_file.write(json.dumps(operation) + "\n")
+        self.journal_file.flush()
+        self.written += 1
+
+    # Sync the journal to the disk up to the operation, one sync covers all operations written before it
+    def sync_journal(self, written):
+        with self.sync_lock:
+            if self.synced >= written:
+                return
+
+            with self.lock:
+                journal_file, written = self.journal_file, self.written
+
+            # Segment is closed only with sync_lock, after it was synced
+            if journal_file is not None:
+                os.fsync(journal_file.fileno())
+
+            self.synced = written
+
+    def run(self):
+        while not self.stopped:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error writing records: {e}")
+
+    # Write all changes waiting for writing
+    def flush(self):
+        with self.flush_lock:
+            with self.sync_lock, self.lock:
+                if not self.pending:
+                    return
+
+                self.flushing, self.pending = self.pending, {}
+                self.generation += 1
+
+                # Journal of the written changes is closed, next changes go to a new segment
+                if self.journal_file is not None:
+                    os.fsync(self.journal_file.fileno())
+                    self.journal_file.close()
+                    self.journal_file = None
+                    self.synced = self.written
+                    self.segments.append(f"{self.journal}.{self.segment}")
+                    self.segment += 1
+
+                segments = list(self.segments)
+
+            try:
+                # Connection of the writer thread may have been closed by the database
+                close_old_connections()
+                write_changes(self.flushing)
+
+            except Exception:
+                # Changes are kept for the next flush, their journal segments stay
+                with self.lock:
+                    for record_id, change in self.pending.items():
+                        self.flushing[record_id] = merge_changes(self.flushing.get(record_id, new_change()), change)
+                    self.pending, self.flushing = self.flushing, {}
+                    self.generation += 1
+                raise
+
+            with self.lock:
+                self.flushing = {}
+                self.generation += 1
+                self.segments = self.segments[len(segments):]
+
+            for path in segments:
+                os.remove(path)
+
+    # Write the remaining changes when the process exits
+    def close(self):
+        self.stopped = True
+        self.wake.set()
+
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error writing records at exit: {e}")
+
+        if self.journal_file is not None:
+            self.journal_file.close()
+
+        # Another process may use the journal now
+        if self.journal_lock is not None:
+            self.journal_lock.close()
+
+# Buffer of the process, None when records are written directly
+record_buffer = RecordWriteBuffer(
+    RECORD_BUFFER_FLUSH_INTERVAL, RECORD_BUFFER_MAX_PENDING, RECORD_BUFFER_JOURNAL or None
+) if RECORD_BUFFER else None
@@ -0,0 +1,98 @@
+"""
+================================================================================
+ Module: records.py
+ Description:
+        Service for records of students practicing examples, used by the
+        HTTP views and the speech WebSocket consumers (async variants).
+        Every change is written with a single UPDATE statement using
+        database expressions, so concurrent submissions of the same record
+        do not overwrite each other and no record has to be loaded before
+        it is changed. With the write-behind buffer (recordBuffer.py)
+        attempts and skips are counted in memory and written in batches.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+from channels.db import database_sync_to_async
+from django.db import connection, transaction
+from django.db.models import F, Func
+from .models import StudentExample
+from .recordBuffer import record_buffer
+
+# Number of attempts after which the next example is shown
+ATTEMPT_LIMIT = 3
+
+# MySQL LAST_INSERT_ID(expr) - stores the value for the connection so it can be read without another query
+class LastInsertId(Func):
+    function = "LAST_INSERT_ID"
+
+def get_records(student_id, example_id, date):
+    return StudentExample.objects.filter(student_id=student_id, example_id=example_id, date=date)
+
+# Create the record that the student started practicing the example, the date identifies it
+# Record of a practice session gets the attempts of its batches too
+def create_record(student_id, example_id, session_id=None):
+    return StudentExample.objects.create(student_id=student_id, example_id=example_id, session_id=session_id)
+
+# Duration sent by the client converted as the database field does it, None if it is not valid
+def parse_duration(duration):
+    try:
+        return StudentExample._meta.get_field("duration").get_prep_value(duration)
+    except (TypeError, ValueError):
+        return None
+
+# Count one attempt of the record and return the number of attempts after it (None if the record does not exist)
+def record_attempt(student_id, example_id, date, duration, solved=None):
+    if record_buffer is not None:
+        # Buffered duration is written later, invalid value has to fail now as it does in the update
+        parsed_duration = parse_duration(duration)
+        if parsed_duration is None:
+            raise ValueError(f"Invalid duration {duration}")
+
+        return record_buffer.record_attempt(student_id, example_id, date, parsed_duration, solved)
+
+    fields = {"duration": duration}
+
+    if solved is not None:
+        fields["solved"] = solved
+
+    records = get_records(student_id, example_id, date)
+
+    if connection.vendor == "mysql":
+        if not records.update(attempts=LastInsertId(F("attempts") + 1), **fields):
+            return None
+
+        # Value of LAST_INSERT_ID(expr) is returned to the client with the result of the update
+        return connection.connection.insert_id()
+
+    # Other databases - the updated row stays locked until the count is read
+    with transaction.atomic():
+        if not records.update(attempts=F("attempts") + 1, **fields):
+            return None
+
+        return records.values_list("attempts", flat=True).first()
+
+# Check if the next example should be shown after the attempt
+def should_continue(attempts, solved):
+    return attempts >= ATTEMPT_LIMIT or solved
+
+# Mark the record as skipped, attempts and duration are not relevant then (returns False if it does not exist)
+def skip_record(student_id, example_id, date):
+    if record_buffer is not None:
+        return record_buffer.skip_record(student_id, example_id, date)
+
+    return get_records(student_id, example_id, date).update(skipped=True, attempts=0, duration=0) > 0
+
+# Delete the record (returns False if it does not exist)
+def delete_record(student_id, example_id, date):
+    if record_buffer is not None:
+        record_buffer.discard(student_id, example_id, date)
+
+    deleted, _ = get_records(student_id, example_id, date).delete()
+    return deleted > 0
+
+# Async variants for the WebSocket consumers, the queries run in worker threads
+acreate_record = database_sync_to_async(create_record, thread_sensitive=False)
+arecord_attempt = database_sync_to_async(record_attempt, thread_sensitive=False)
+askip_record = database_sync_to_async(skip_record, thread_sensitive=False)
+adelete_record = database_sync_to_async(delete_record, thread_sensitive=False)
@@ -0,0 +1,53 @@
+"""
+================================================================================
+ Module: sampling.py
+ Description:
+        Implements sampling of practice examples. Matching examples are
+        streamed as ids only and a reservoir of each skill path is kept,
+        so the full set of examples is never loaded. The final selection
+        is balanced across the skill paths.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+# Sample up to limit example ids balanced across strata (skill paths)
+# rows yield (example_id, list of stratum indexes the example belongs to)
+def sample_stratified(rows, stratum_count, limit, rng):
+    reservoirs = [[] for _ in range(stratum_count)]
+    seen = [0] * stratum_count
+
+    # Reservoir sampling (Algorithm R) of each stratum
+    for example_id, strata in rows:
+        for stratum in strata:
+            seen[stratum] += 1
+
+            if len(reservoirs[stratum]) < limit:
+                reservoirs[stratum].append(example_id)
+            else:
+                position = rng.randrange(seen[stratum])
+                if position < limit:
+                    reservoirs[stratum][position] = example_id
+
+    for reservoir in reservoirs:
+        rng.shuffle(reservoir)
+
+    # Draw from the strata in turns so every path gets the same share while it has examples
+    order = list(range(stratum_count))
+    rng.shuffle(order)
+
+    selected = []
+    selected_ids = set()
+    while len(selected) < limit and any(reservoirs):
+        for stratum in order:
+            reservoir = reservoirs[stratum]
+
+            # Skip examples already drawn for another path
+            while reservoir and reservoir[-1] in selected_ids:
+                reservoir.pop()
+
+            if reservoir and len(selected) < limit:
+                example_id = reservoir.pop()
+                selected.append(example_id)
+                selected_ids.add(example_id)
+
+    return selected
@@ -0,0 +1,137 @@
+"""
+================================================================================
+ Module: skillGraph.py
+ Description:
+        In-memory index of the skill tree. All skills, their parents and
+        related skills are loaded in one pass and the tree is then walked
+        without further database queries. Ancestors are taken from the
+        skill closure table. The index is reloaded whenever the catalogue
+        version changes.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+import threading
+from collections import defaultdict
+from .models import Skill, SkillClosure
+from .catalogue import get_catalogue_version
+
+class SkillGraph:
+
+    def __init__(self, version, skills, related_pairs, ancestor_links=()):
+        self.version = version
+
+        # Skill data by id (deleted skills included so old paths can be resolved)
+        self.skills = {skill["id"]: skill for skill in skills}
+
+        # Non-deleted children of each skill ordered by id
+        self.children = defaultdict(list)
+        for skill in sorted(skills, key=lambda s: s["id"]):
+            if skill["parent_skill"] is not None and not skill["deleted"]:
+                self.children[skill["parent_skill"]].append(skill["id"])
+
+        # Symmetrical related skills relation
+        self.related = defaultdict(set)
+        for from_id, to_id in related_pairs:
+            self.related[from_id].add(to_id)
+            self.related[to_id].add(from_id)
+
+        # Ancestors of each skill ordered from its parent to the root
+        self.ancestors = defaultdict(list)
+        for descendant_id, ancestor_id, depth in sorted(ancestor_links, key=lambda link: (link[0], link[2])):
+            self.ancestors[descendant_id].append(ancestor_id)
+
+    @classmethod
+    def load(cls, version):
+        # Load the whole skill tree with three queries
+        skills = list(Skill.objects.values("id", "name", "parent_skill", "skill_type", "height", "deleted"))
+        related_pairs = Skill.related_skills.through.objects.values_list("from_skill_id", "to_skill_id")
+        ancestor_links = SkillClosure.objects.filter(depth__gt=0).values_list("descendant_id", "ancestor_id", "depth")
+
+        return cls(version, skills, list(related_pairs), list(ancestor_links))
+
+    def get(self, skill_id):
+        return self.skills.get(skill_id)
+
+    def exists(self, skill_id):
+        skill = self.skills.get(skill_id)
+        return skill is not None and not skill["deleted"]
+
+    def get_parent(self, skill_id):
+        return self.skills[skill_id]["parent_skill"]
+
+    # Ancestors of the skill ordered from its parent to the root
+    def get_ancestors(self, skill_id):
+        if skill_id in self.ancestors:
+            return self.ancestors[skill_id]
+
+        # Skill without closure rows (root skill or inserted outside the app) - walk the parents
+        ancestors = []
+        visited = {skill_id}
+
+        parent_id = self.skills[skill_id]["parent_skill"]
+        while parent_id is not None and parent_id in self.skills and parent_id not in visited:
+            ancestors.append(parent_id)
+            visited.add(parent_id)
+            parent_id = self.skills[parent_id]["parent_skill"]
+
+        return ancestors
+
+    # Distance of the skill from the root of its tree
+    def get_depth(self, skill_id):
+        return len(self.get_ancestors(skill_id))
+
+    def get_children(self, skill_id):
+        return self.children.get(skill_id, [])
+
+    # Non-deleted skills related to the skill
+    def get_related(self, skill_id, skill_type=None):
+        return sorted(
+            related_id for related_id in self.related.get(skill_id, ())
+            if self.exists(related_id) and (skill_type is None or self.skills[related_id]["skill_type"] == skill_type)
+        )
+
+    # Check if two skills share the same parent
+    def are_siblings(self, skill1_id, skill2_id):
+        return self.skills[skill1_id]["parent_skill"] == self.skills[skill2_id]["parent_skill"]
+
+    # Create root-to-leaf paths in the tree formed by the provided skills
+    def get_paths(self, skill_ids):
+        selected = {skill_id for skill_id in skill_ids if skill_id in self.skills}
+
+        # Leaves are provided skills which are not a parent of another provided skill
+        parents = {self.skills[skill_id]["parent_skill"] for skill_id in selected}
+        leaves = selected - parents
+
+        paths = []
+        for leaf_id in leaves:
+            path = [leaf_id]
+
+            # Extend the path upwards while the ancestors are provided too
+            for ancestor_id in self.get_ancestors(leaf_id):
+                if ancestor_id not in selected:
+                    break
+                path.append(ancestor_id)
+
+            paths.append(path[::-1])
+
+        # Order paths as a depth-first walk from the roots would
+        return sorted(paths)
+
+_graph = None
+_graph_lock = threading.Lock()
+
+# Get the skill graph for the current catalogue version, reload it if it is stale
+def get_skill_graph():
+    global _graph
+
+    version = get_catalogue_version()
+    graph = _graph
+
+    if graph is None or graph.version != version:
+        with _graph_lock:
+            if _graph is None or _graph.version != version:
+                _graph = SkillGraph.load(version)
+            graph = _graph
+
+    return graph
@@ -0,0 +1,337 @@
+"""
+================================================================================
+ Module: spokenNumbers.py
+ Description:
+        Parses numbers, fractions and variable assignments from transcripts
+        of spoken answers in Czech and English, both written by words
+        ("tři čtvrtiny", "dvacet jedna", "x se rovná minus pět",
+        "three quarters") and by digits. The result is given in the same
+        form as the parsed correct answers. When the whole transcript cannot
+        be read as one answer, None is returned and the answer is left to
+        the LLM.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+import re
+
+# Numbers 0-19
+UNITS = {
+    "nula": 0, "jedna": 1, "jeden": 1, "jedno": 1, "jednu": 1, "dva": 2, "dvě": 2, "tři": 3, "čtyři": 4,
+    "pět": 5, "šest": 6, "sedm": 7, "osm": 8, "devět": 9, "deset": 10, "jedenáct": 11, "dvanáct": 12,
+    "třináct": 13, "čtrnáct": 14, "patnáct": 15, "šestnáct": 16, "sedmnáct": 17, "osmnáct": 18, "devatenáct": 19,
+
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15,
+    "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+
+TENS = {
+    "dvacet": 20, "třicet": 30, "čtyřicet": 40, "padesát": 50, "šedesát": 60, "sedmdesát": 70,
+    "osmdesát": 80, "devadesát": 90,
+
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+
+# Czech numbers with the unit first (jedenadvacet = 21)
+for unit_word, unit in [("jedna", 1), ("jeden", 1), ("dva", 2), ("tři", 3), ("čtyři", 4), ("pět", 5),
+                        ("šest", 6), ("sedm", 7), ("osm", 8), ("devět", 9)]:
+    for tens_word in ["dvacet", "třicet", "čtyřicet", "padesát", "šedesát", "sedmdesát", "osmdesát", "devadesát"]:
+        TENS[f"{unit_word}a{tens_word}"] = TENS[tens_word] + unit
+
+HUNDREDS = {"sto", "sta", "stě", "set", "hundred"}
+THOUSANDS = {"tisíc", "tisíce", "thousand"}
+
+# Denominators said as words (tři čtvrtiny, three quarters)
+DENOMINATORS = {"půl": 2}
+
+for stem, denominator in [
+    ("polovin", 2), ("třetin", 3), ("čtvrtin", 4), ("pětin", 5), ("šestin", 6), ("sedmin", 7), ("osmin", 8),
+    ("devítin", 9), ("desetin", 10), ("jedenáctin", 11), ("dvanáctin", 12), ("třináctin", 13), ("čtrnáctin", 14),
+    ("patnáctin", 15), ("šestnáctin", 16), ("sedmnáctin", 17), ("osmnáctin", 18), ("devatenáctin", 19),
+    ("dvacetin", 20), ("třicetin", 30), ("čtyřicetin", 40), ("padesátin", 50), ("setin", 100), ("tisícin", 1000),
+]:
+    for suffix in ["a", "y", "", "u", "ě"]:
+        DENOMINATORS[stem + suffix] = denominator
+
+for word, denominator in [
+    ("half", 2), ("halve", 2), ("third", 3), ("quarter", 4), ("fourth", 4), ("fifth", 5), ("sixth", 6),
+    ("seventh", 7), ("eighth", 8), ("ninth", 9), ("tenth", 10), ("eleventh", 11), ("twelfth", 12),
+    ("thirteenth", 13), ("fourteenth", 14), ("fifteenth", 15), ("sixteenth", 16), ("seventeenth", 17),
+    ("eighteenth", 18), ("nineteenth", 19), ("twentieth", 20), ("thirtieth", 30), ("fortieth", 40),
+    ("fiftieth", 50), ("hundredth", 100), ("thousandth", 1000),
+]:
+    DENOMINATORS[word] = denominator
+    DENOMINATORS[word + "s"] = denominator
+
+DENOMINATORS["halves"] = 2
+
+MINUS = {"minus", "mínus", "záporné", "záporná", "záporný", "negative", "-"}
+DECIMAL_POINT = {"celá", "celé", "celých", "celou", "point", "tečka", "čárka", "comma"}
+FRACTION_LINE = {"/", "lomeno", "děleno", "over"}
+
+# Words that only introduce the answer
+FILLERS = {
+    "je", "to", "výsledek", "výsledkem", "odpověď", "správně", "tedy", "takže", "asi", "myslím", "ehm", "hm",
+    "is", "the", "answer", "result", "it", "its", "that", "so", "equals", "think", "um", "uh",
+}
+
+# Names of variables as they are spelled out
+VARIABLE_NAMES = {
+    "iks": "x", "ix": "x", "ex": "x", "ypsilon": "y", "ipsilon": "y", "why": "y", "zet": "z", "zed": "z", "zee": "z",
+}
+
+# Words assigning a value to a variable (x se rovná 5, x je 5, x equals 5)
+ASSIGNMENT = {"=", "se", "rovná", "rovno", "je", "equals", "equal", "is", "to"}
+SEPARATORS = {"a", "and", ";", "pak", "then"}
+
+TOKEN_PATTERN = re.compile(r"\d+(?:[.,]\d+)?|[^\W\d_]+|[/=;\-]")
+
+# Split the transcript into lowercase words, numbers and symbols
+def tokenize(text):
+    text = text.lower()
+
+    # Words joined by hyphen (twenty-one) are separate words
+    text = re.sub(r"(?<=[^\W\d_])-(?=[^\W\d_])", " ", text)
+
+    return TOKEN_PATTERN.findall(text)
+
+def is_digits(token):
+    return token[0].isdigit()
+
+# Read a whole number said by words or digits starting at position
+# Returns (value, next position) or None
+def read_integer(tokens, position):
+    if position >= len(tokens):
+        return None
+
+    token = tokens[position]
+
+    if is_digits(token):
+        if not token.isdigit():
+            return None
+        return int(token), position + 1
+
+    # Zero is a number on its own
+    if UNITS.get(token) == 0:
+        return 0, position + 1
+
+    total = 0
+    group = 0
+    start = position
+
+    while position < len(tokens):
+        token = tokens[position]
+
+        if token in UNITS and UNITS[token] > 0:
+            unit = UNITS[token]
+
+            # Unit follows nothing, hundreds or tens (dvacet jedna, hundred and one)
+            if group % 100 == 0 or (group % 100 >= 20 and group % 10 == 0 and unit < 10):
+                group += unit
+            else:
+                break
+
+        elif token in TENS:
+            if group % 100 != 0:
+                break
+            group += TENS[token]
+
+        elif token in HUNDREDS:
+            if group == 0:
+                group = 100
+            elif group < 10:
+                group *= 100
+            else:
+                break
+
+        elif token in THOUSANDS:
+            if total:
+                break
+            total = (group or 1) * 1000
+            group = 0
+
+        # English "and" between hundreds and the rest (one hundred and five)
+        elif token == "and" and group >= 100 and group % 100 == 0 and position + 1 < len(tokens) and \
+                (tokens[position + 1] in UNITS or tokens[position + 1] in TENS):
+            pass
+
+        else:
+            break
+
+        position += 1
+
+    if position == start:
+        return None
+
+    return total + group, position
+
+# Read a number with optional sign and decimal part
+# Returns (value, next position) or None
+def read_number(tokens, position):
+    negative = position < len(tokens) and tokens[position] in MINUS
+    if negative:
+        position += 1
+
+    if position >= len(tokens):
+        return None
+
+    token = tokens[position]
+
+    # Decimal number written by digits
+    if is_digits(token) and not token.isdigit():
+        value, position = float(token.replace(",", ".")), position + 1
+
+    else:
+        result = read_integer(tokens, position)
+        if result is None:
+            return None
+
+        value, position = result
+
+        # Decimal part said by words (dva celé pět, two point five)
+        if position < len(tokens) and tokens[position] in DECIMAL_POINT:
+            digits = ""
+            decimal_position = position + 1
+
+            while decimal_position < len(tokens):
+                result = read_integer(tokens, decimal_position)
+                if result is None:
+                    break
+                digits += str(result[0])
+                decimal_position = result[1]
+
+            if not digits:
+                return None
+
+            value, position = float(f"{value}.{digits}"), decimal_position
+
+    return (-value if negative else value), position
+
+# Read a fraction (tři čtvrtiny, 3/4, tři lomeno čtyři, a half)
+# Returns ((numerator, denominator), next position) or None
+def read_fraction(tokens, position):
+    negative = position < len(tokens) and tokens[position] in MINUS
+    if negative:
+        position += 1
+
+    if position >= len(tokens):
+        return None
+
+    # Half without numerator (půl)
+    if tokens[position] == "půl":
+        numerator, position = 1, position
+
+    # Article in place of one (a half, a quarter)
+    elif tokens[position] in ("a", "an") and position + 1 < len(tokens) and tokens[position + 1] in DENOMINATORS:
+        numerator, position = 1, position + 1
+
+    else:
+        result = read_integer(tokens, position)
+        if result is None:
+            return None
+        numerator, position = result
+
+    if position >= len(tokens):
+        return None
+
+    token = tokens[position]
+
+    # Denominator said as a word
+    if token in DENOMINATORS:
+        denominator, position = DENOMINATORS[token], position + 1
+
+    # Denominator after a fraction line (lomeno, over, divided by, /)
+    else:
+        if token in FRACTION_LINE:
+            position += 1
+        elif token == "divided" and position + 1 < len(tokens) and tokens[position + 1] == "by":
+            position += 2
+        else:
+            return None
+
+        result = read_integer(tokens, position)
+        if result is None:
+            return None
+        denominator, position = result
+
+    if not denominator:
+        return None
+
+    return ((-numerator if negative else numerator), denominator), position
+
+# Remove words which only introduce the answer
+def strip_fillers(tokens):
+    return [token for token in tokens if token not in FILLERS]
+
+# Parse a transcript consisting of one number (None if it is not just a number)
+def parse_spoken_number(text):
+    tokens = strip_fillers(tokenize(text))
+
+    result = read_number(tokens, 0)
+    if result is None or result[1] != len(tokens):
+        return None
+
+    return float(result[0])
+
+# Parse a transcript consisting of one fraction as (numerator, denominator) (None if it is not just a fraction)
+def parse_spoken_fraction(text):
+    tokens = strip_fillers(tokenize(text))
+
+    result = read_fraction(tokens, 0)
+    if result is None or result[1] != len(tokens):
+        return None
+
+    return result[0]
+
+# Get variable name from a token (single letter or its spelling)
+def read_variable_name(token):
+    if token in VARIABLE_NAMES:
+        return VARIABLE_NAMES[token]
+
+    if len(token) == 1 and token.isalpha():
+        return token
+
+    return None
+
+# Parse a transcript consisting of variable assignments (x se rovná pět a y je 3)
+# Returns {variable name: value} in the order of the transcript or None
+def parse_spoken_variables(text):
+    tokens = tokenize(text)
+    variables = {}
+    position = 0
+
+    while position < len(tokens):
+        token = tokens[position]
+        name = read_variable_name(token)
+
+        # Variable followed by an assignment word starts the next assignment
+        if name is not None and position + 1 < len(tokens) and tokens[position + 1] in ASSIGNMENT:
+            position += 1
+            while position < len(tokens) and tokens[position] in ASSIGNMENT:
+                position += 1
+
+            # Value is a fraction or a number
+            fraction = read_fraction(tokens, position)
+            if fraction is not None:
+                (numerator, denominator), position = fraction
+                value = numerator / denominator
+            else:
+                number = read_number(tokens, position)
+                if number is None:
+                    return None
+                value, position = number
+
+            if name in variables:
+                return None
+
+            variables[name] = float(value)
+
+        # Words between the assignments
+        elif token in SEPARATORS or token in FILLERS:
+            position += 1
+
+        else:
+            return None
+
+    return variables or None
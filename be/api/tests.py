@@ -0,0 +1,145 @@
+"""
+================================================================================
+ Module: tests.py
+ Description:
+        Regression tests of the number of database queries of the practice
+        endpoints, the count must not grow with the number of examples, and
+        tests of batches of attempts of practice sessions.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+import json
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from .models import Task, Example, Answer, Step, Skill, ExampleSkill, Student, StudentExample, PracticeBatch
+from .catalogue import bump_catalogue_version
+from .utils import rebuild_skill_closure
+
+class GetExamplesQueryCountTest(TestCase):
+
+    def setUp(self):
+        self.parent = Skill.objects.create(name="Sčítání")
+        self.child = Skill.objects.create(name="Do 20", parent_skill=self.parent)
+        self.other = Skill.objects.create(name="Odčítání")
+        self.task = Task.objects.create(name="Příklady")
+
+        rebuild_skill_closure()
+
+        # Version row is read at most once per second, the count must not depend on the timing of the test
+        patcher = mock.patch("api.catalogue.CATALOGUE_VERSION_CHECK_INTERVAL", 3600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_examples(self, count):
+        for number in range(count):
+            example = Example.objects.create(example=f"{number} + 1", input_type="INLINE", task=self.task)
+            Answer.objects.create(example=example, answer=str(number + 1))
+            # Steps are created out of order, the endpoint returns them by their order
+            Step.objects.create(example=example, text="Zapiš výsledek", order=2)
+            Step.objects.create(example=example, text="Přičti jedna", order=1)
+
+            # Skill outside the selected path does not prevent the match
+            for skill in [self.parent, self.child, self.other]:
+                ExampleSkill.objects.create(example=example, skill=skill)
+
+        # Skill graph and example index are loaded again for the new catalogue
+        bump_catalogue_version()
+
+    def get_examples(self, **params):
+        params["topics"] = json.dumps([self.parent.id, self.child.id])
+        return self.client.get(reverse("get-examples"), params)
+
+    def assert_query_count(self, example_count, query_count, **params):
+        self.create_examples(example_count)
+
+        # Skill graph is loaded by the first request
+        self.get_examples(**params)
+
+        with self.assertNumQueries(query_count):
+            response = self.get_examples(**params)
+
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_query_count_with_few_examples(self):
+        # Matching examples, their answers and their steps
+        examples = self.assert_query_count(2, 3)
+        self.assertEqual(len(examples), 2)
+
+    def test_query_count_with_many_examples(self):
+        examples = self.assert_query_count(30, 3)
+        self.assertEqual(len(examples), 30)
+
+        # Answers and steps come from the prefetch in their order
+        self.assertEqual([step["order"] for step in examples[0]["steps"]], [1, 2])
+
+    def test_query_count_with_limit(self):
+        # Sampled ids are loaded by one more query
+        examples = self.assert_query_count(30, 4, limit=5, seed=1)
+        self.assertEqual(len(examples), 5)
+
+class PracticeSessionTest(TestCase):
+
+    def setUp(self):
+        self.student = Student.objects.create(username="Žák")
+        task = Task.objects.create(name="Příklady")
+        self.example = Example.objects.create(example="1 + 1", input_type="INLINE", task=task)
+        Answer.objects.create(example=self.example, answer="2")
+
+        response = self.client.post(reverse("create-practice-session"), {"student_id": self.student.id}, content_type="application/json")
+        self.session_id = response.json()["session_id"]
+
+    def post_attempts(self, attempts, idempotency_key=None, finished=False):
+        return self.client.post(
+            reverse("add-practice-attempts", args=[self.session_id]),
+            {"attempts": attempts, "idempotency_key": idempotency_key, "finished": finished},
+            content_type="application/json"
+        )
+
+    def test_repeated_batch_is_not_applied_again(self):
+        attempts = [{"example_id": self.example.id, "duration": 5, "solved": False}]
+
+        first = self.post_attempts(attempts, "batch-1")
+        repeated = self.post_attempts(attempts, "batch-1")
+
+        self.assertFalse(first.json()["duplicate"])
+        self.assertTrue(repeated.json()["duplicate"])
+        self.assertEqual(repeated.json()["records"], first.json()["records"])
+        self.assertEqual(StudentExample.objects.get(session_id=self.session_id).attempts, 1)
+
+    def test_unknown_example_is_rejected(self):
+        response = self.post_attempts([{"example_id": self.example.id + 1, "duration": 5}], "batch-1")
+
+        self.assertEqual(response.status_code, 400)
+
+        # Key of the rejected batch is not kept, the corrected batch can be sent with it
+        self.assertFalse(PracticeBatch.objects.exists())
+        self.assertFalse(StudentExample.objects.exists())
+
+    def test_finished_batch_closes_session(self):
+        response = self.post_attempts([{"example_id": self.example.id, "duration": 5, "solved": True}], "batch-1", True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["records"][0]["next_example"])
+        self.assertIsNotNone(self.student.practicesession_set.get().finished)
+
+    def test_answer_of_session_is_only_evaluated(self):
+        record = self.client.post(reverse("create-example-record"), {
+            "student_id": self.student.id, "example_id": self.example.id, "session_id": self.session_id
+        }, content_type="application/json")
+        self.assertEqual(record.status_code, 201)
+
+        response = self.client.post(reverse("check-answer"), {
+            "student_id": self.student.id, "example_id": self.example.id, "session_id": self.session_id,
+            "duration": 5, "student_answer": "3", "answer_type": "inline", "attempts": 2
+        }, content_type="application/json")
+
+        # Third incorrect attempt moves to the next example, the attempt itself comes in a batch
+        self.assertEqual(response.json(), {"isCorrect": False, "continue_with_next": True})
+        self.assertEqual(StudentExample.objects.get(session_id=self.session_id).attempts, 0)
+
+        # Batch counts the attempt in the record created for the session
+        self.post_attempts([{"example_id": self.example.id, "duration": 5, "solved": False}], "batch-1")
+        self.assertEqual(StudentExample.objects.get(session_id=self.session_id).attempts, 1)
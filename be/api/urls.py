@@ -28,6 +28,9 @@ urlpatterns = [
     path('skip-example/', views.skip_example, name='skip-example'),
     path('check-answer/', views.check_answer, name='check-answer'),
 
+    path('practice-sessions/', views.create_practice_session, name='create-practice-session'),
+    path('practice-sessions/<uuid:session_id>/attempts/', views.add_practice_attempts, name='add-practice-attempts'),
+
 
     path('create-skill/', views.create_skill, name='create_skill'),
     path('skills/<int:skill_id>/delete/', views.delete_skill, name='delete-skill'),
@@ -48,6 +51,8 @@ urlpatterns = [
     path('login/admin', views.login_admin, name='login_admin'),
 
     path('survey-answer/', views.save_survey_answer, name='save-survey-answer'),   
+
+    path('llm-status/', views.get_llm_status, name='llm-status'),
  
 ]
 
@@ -7,54 +7,181 @@
 ================================================================================
 """
 
-from .models import Skill, ExampleSkill
-from collections import defaultdict
+from django.db import transaction, connection
+from collections import Counter
+from django.db.models import Max, Count, F
+from .models import Skill, Example, ExampleSkill, SkillClosure, SkillPairCount
+from .skillGraph import get_skill_graph
+from .exampleIndex import get_example_index, update_example_index
+from .catalogue import bump_catalogue_version
 from datetime import datetime, timezone
 from asgiref.sync import sync_to_async
 
 # Get the height of a skill in the skill tree
 def get_height(id):
-    
-    skill = Skill.objects.get(id=id)
-    
-    distance = 0
-    while skill.parent_skill:  
-        skill = skill.parent_skill
-        distance += 1
-    return distance
+
+    # The deepest ancestor link is the distance from the root
+    height = SkillClosure.objects.filter(descendant_id=id).aggregate(height=Max('depth'))['height']
+
+    # Skill without closure rows (inserted outside the app) - use parents from the skill graph
+    if height is None:
+        return get_skill_graph().get_depth(id)
+
+    return height
+
+# Insert closure rows of a newly created skill (link to itself and to all its ancestors)
+def add_skill_to_closure(skill):
+    rows = [SkillClosure(ancestor_id=skill.id, descendant_id=skill.id, depth=0)]
+
+    if skill.parent_skill_id:
+        rows += [
+            SkillClosure(ancestor_id=ancestor_id, descendant_id=skill.id, depth=depth + 1)
+            for ancestor_id, depth in SkillClosure.objects.filter(
+                descendant_id=skill.parent_skill_id
+            ).values_list('ancestor_id', 'depth')
+        ]
+
+    SkillClosure.objects.bulk_create(rows)
+
+# Recreate the whole closure table from parent skills
+def rebuild_skill_closure():
+    parents = dict(Skill.objects.values_list('id', 'parent_skill_id'))
+    rows = []
+
+    for skill_id in parents:
+        rows.append(SkillClosure(ancestor_id=skill_id, descendant_id=skill_id, depth=0))
+
+        depth = 1
+        visited = {skill_id}
+        parent_id = parents[skill_id]
+        while parent_id is not None and parent_id not in visited:
+            rows.append(SkillClosure(ancestor_id=parent_id, descendant_id=skill_id, depth=depth))
+            visited.add(parent_id)
+            parent_id = parents.get(parent_id)
+            depth += 1
+
+    with transaction.atomic():
+        SkillClosure.objects.all().delete()
+        SkillClosure.objects.bulk_create(rows, batch_size=1000)
+
+    return len(rows)
 
 # Return the count of examples that have all the skills provided in skill_ids
 def examples_with_skills(skill_ids):
     
-    try:
-        if not skill_ids:
-            return 0
-            
-        skill_ids_set = set(skill_ids)
-        
-        example_skills = ExampleSkill.objects.filter(skill__in=skill_ids).values('example', 'skill')
-        
-        # Group skills by example
-        example_to_skills = {}
-        for item in example_skills:
-            example_id = item['example']
-            skill_id = item['skill']
-            
-            if example_id not in example_to_skills:
-                example_to_skills[example_id] = set()
-            example_to_skills[example_id].add(skill_id)
-        
-        # Count examples that have all required skills
-        valid_count = sum(1 for skills in example_to_skills.values() 
-                         if skill_ids_set.issubset(skills))
-                         
-        return valid_count
-
-    except Skill.DoesNotExist:
+    if not skill_ids:
         return 0
 
+    return get_example_index().count_examples(skill_ids)
+
+# Get skills of the provided examples as {example_id: set of skill ids}
+def get_example_skill_sets(example_ids):
+    skill_sets = {example_id: set() for example_id in example_ids}
+
+    for example_id, skill_id in ExampleSkill.objects.filter(example_id__in=example_ids).values_list('example_id', 'skill_id'):
+        skill_sets[example_id].add(skill_id)
+
+    return skill_sets
+
+# All skill pairs (skill_low, skill_high) of one example including the skill with itself
+def get_skill_pairs(skill_ids):
+    skill_ids = sorted(skill_ids)
+    return [(skill_ids[i], skill_ids[j]) for i in range(len(skill_ids)) for j in range(i, len(skill_ids))]
+
+# Update persisted counts of examples per skill pair by the changed skills of examples
+def update_skill_pair_counts(before, after):
+    delta = Counter()
+
+    for example_id in set(before) | set(after):
+        delta.update(get_skill_pairs(after.get(example_id, ())))
+        delta.subtract(get_skill_pairs(before.get(example_id, ())))
+
+    delta = {pair: change for pair, change in delta.items() if change}
+    if not delta:
+        return
+
+    skill_ids = {skill_id for pair in delta for skill_id in pair}
+
+    with transaction.atomic():
+        # Missing rows of added pairs are created empty first, a row created meanwhile by a concurrent
+        # change is kept, so both changes are then added to the same locked row
+        SkillPairCount.objects.bulk_create([
+            SkillPairCount(skill_low_id=skill_low_id, skill_high_id=skill_high_id, count=0)
+            for (skill_low_id, skill_high_id), change in delta.items() if change > 0
+        ], ignore_conflicts=True)
+
+        # Lock rows of the changed pairs
+        existing = {
+            (row.skill_low_id, row.skill_high_id): row
+            for row in SkillPairCount.objects.select_for_update().filter(
+                skill_low_id__in=skill_ids, skill_high_id__in=skill_ids
+            )
+        }
+
+        updated_rows = []
+        for (skill_low_id, skill_high_id), change in delta.items():
+            row = existing.get((skill_low_id, skill_high_id))
+
+            if row:
+                # Count below zero means the counts were not in sync with the examples
+                if row.count + change < 0:
+                    print(f"Warning: count of skill pair ({skill_low_id}, {skill_high_id}) would drop to {row.count + change}, "
+                          f"run rebuild_skill_pair_counts")
+
+                row.count = max(row.count + change, 0)
+                updated_rows.append(row)
+
+        SkillPairCount.objects.bulk_update(updated_rows, ['count'])
+
+        # Pairs without any example are not kept
+        SkillPairCount.objects.filter(id__in=[row.id for row in updated_rows if row.count == 0]).delete()
+
+# Recreate all skill pair counts from example skills
+def rebuild_skill_pair_counts():
+    pairs = ExampleSkill.objects.filter(
+        example__exampleskill__skill_id__gte=F('skill_id')
+    ).values(
+        'skill_id', 'example__exampleskill__skill_id'
+    ).annotate(count=Count('example_id', distinct=True))
+
+    rows = [
+        SkillPairCount(skill_low_id=pair['skill_id'], skill_high_id=pair['example__exampleskill__skill_id'], count=pair['count'])
+        for pair in pairs
+    ]
+
+    with transaction.atomic():
+        SkillPairCount.objects.all().delete()
+        SkillPairCount.objects.bulk_create(rows, batch_size=1000)
+
+    return len(rows)
+
+# Get counts of examples having both skills for all pairs of the provided skills as {(skill1, skill2): count}
+def get_skill_pair_counts(skill_ids):
+    counts = {}
+
+    for skill_low_id, skill_high_id, count in SkillPairCount.objects.filter(
+        skill_low_id__in=skill_ids, skill_high_id__in=skill_ids
+    ).values_list('skill_low_id', 'skill_high_id', 'count'):
+        counts[(skill_low_id, skill_high_id)] = count
+        counts[(skill_high_id, skill_low_id)] = count
+
+    return counts
+
+# Update skill pair counts in the current transaction, then bump the catalogue version once the transaction
+# is committed and update the in-memory indexes.
+# Changed skills of examples are passed as {example_id: set of skill ids} before and after the change.
+def catalogue_changed(before=None, after=None):
+
+    update_skill_pair_counts(before or {}, after or {})
+
+    def commit():
+        version = bump_catalogue_version()
+        update_example_index(before or {}, after or {}, version)
+
+    transaction.on_commit(commit)
+
 # Build a tree of skills starting from the given skill
-def build_skill_tree(skill, visited=None, skill_ids=None, related_skills=None, withCounts=None):
+def build_skill_tree(skill_id, visited=None, skill_ids=None, related_skills=None, withCounts=None):
     if visited is None:
         visited = set()
 
@@ -62,23 +189,23 @@ def build_skill_tree(skill, visited=None, skill_ids=None, related_skills=None, w
         related_skills = set()
     
     # Avoid infinite loops
-    if skill.id in visited:
+    if skill_id in visited:
         return None  
     
-    visited.add(skill.id)
+    visited.add(skill_id)
 
-    children = Skill.objects.filter(parent_skill=skill)
+    graph = get_skill_graph()
+    skill = graph.get(skill_id)
+    children = graph.get_children(skill_id)
 
     if skill_ids is None:
-        skill_ids = [skill.id]
+        skill_ids = [skill_id]
     else:
-        skill_ids.append(skill.id)
+        skill_ids.append(skill_id)
 
     examples_count = 0
 
-    print("With count", withCounts)
-    print("Skill ids", skill_ids)
-    if related_skills and skill in related_skills:
+    if related_skills and skill_id in related_skills:
         examples_count = examples_with_skills(skill_ids)
     
     # Edge case for Equations which are not related to Operations
@@ -87,53 +214,21 @@ def build_skill_tree(skill, visited=None, skill_ids=None, related_skills=None, w
     
     
     # Skip general skills like Operations or Number Domains
-    if skill.height >= 3:
+    if skill["height"] >= 3:
         return {
-        "id": skill.id,
-        "name": skill.name,
+        "id": skill_id,
+        "name": skill["name"],
         "examples": examples_count,
         "subskills": [
-            build_skill_tree(child, visited, skill_ids.copy(), related_skills)
-            for child in children if related_skills and child in related_skills
+            build_skill_tree(child_id, visited, skill_ids.copy(), related_skills)
+            for child_id in children if related_skills and child_id in related_skills
         ]
         }
 
 # Create skill paths for given skill ids based on skill tree
 def get_skill_paths(skill_ids, merge=True):
 
-    skills = Skill.objects.filter(id__in=skill_ids).select_related('parent_skill')
-    
-    skill_dict = {skill.id: skill for skill in skills}
-    
-    parent_map = defaultdict(list)
-    for skill in skills:
-        if skill.parent_skill_id:
-            parent_map[skill.parent_skill_id].append(skill.id)
-    
-    paths = []
-    visited = set()
-    
-    # Build paths from a given skill
-    def build_paths(skill_id, current_path):
-        if skill_id in visited:
-            return
-        visited.add(skill_id)
-        
-        new_path = current_path + [skill_id]
-        children = parent_map.get(skill_id, [])
-
-        if children:
-            for child in children:
-                build_paths(child, new_path)
-        else:
-            paths.append(new_path)
-
-    # Identify root skills (no parent or parent not in selected skills)
-    root_skills = [skill.id for skill in skills if not skill.parent_skill_id or skill.parent_skill_id not in skill_dict]
-
-    # Build paths starting from each root
-    for root in root_skills:
-        build_paths(root, [])
+    paths = get_skill_graph().get_paths(skill_ids)
 
     # Merge overlapping paths into unique paths
     if merge:       
@@ -145,9 +240,7 @@ def get_skill_paths(skill_ids, merge=True):
 def merge_unique_lists(input_lists):
     result = []
 
-    # Check if two skills share the same parent
-    def are_siblings(skill1, skill2):
-        return skill1.parent_skill == skill2.parent_skill
+    graph = get_skill_graph()
     
     if(len(input_lists) == 1):
         return input_lists
@@ -155,16 +248,65 @@ def merge_unique_lists(input_lists):
     for i in range(len(input_lists)):
         
         for j in range(i + 1, len(input_lists)):
-
-            list_i_skills = [Skill.objects.get(id=skill_id) for skill_id in input_lists[i]]
-            list_j_skills = [Skill.objects.get(id=skill_id) for skill_id in input_lists[j]]
             
             # If no sibling skills between the two lists, merge them    
-            if not any(are_siblings(skill1, skill2) for skill1 in list_i_skills for skill2 in list_j_skills):
+            if not any(graph.are_siblings(skill1, skill2) for skill1 in input_lists[i] for skill2 in input_lists[j]):
                 result.append(input_lists[i] + input_lists[j])
 
     return result
 
+# Add all skill_ids to the related_skills field of each skill
+def create_skill_relations(skill_ids):
+
+    skills = list(Skill.objects.filter(id__in=skill_ids))
+
+    # Both directions of each relation are inserted in one query, existing relations are skipped
+    RelatedSkills = Skill.related_skills.through
+    RelatedSkills.objects.bulk_create([
+        RelatedSkills(from_skill_id=skill.id, to_skill_id=related_skill.id)
+        for skill in skills
+        for related_skill in skills
+        if related_skill != skill and related_skill.skill_type != skill.skill_type
+    ], ignore_conflicts=True)
+
+class UnknownExampleIdsError(Exception):
+    pass
+
+# Create examples in one query and set their primary keys
+def bulk_create_examples(examples, batch_size=None):
+    if not examples:
+        return examples
+
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Example.objects.bulk_create(examples, batch_size=batch_size)
+
+    # MySQL does not return ids of inserted rows - rows of one insert get increasing ids after the current maximum
+    try:
+        with transaction.atomic():
+            max_id = Example.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+            Example.objects.bulk_create(examples, batch_size=batch_size)
+
+            created_ids = list(Example.objects.filter(
+                id__gt=max_id, task_id__in={example.task_id for example in examples}
+            ).order_by('id').values_list('id', flat=True))
+
+            # Examples of the same tasks were inserted concurrently, the insert is rolled back
+            if len(created_ids) != len(examples):
+                raise UnknownExampleIdsError()
+
+    except UnknownExampleIdsError:
+        # Examples are inserted one by one, each gets its id from its own insert
+        for example in examples:
+            example.pk = None
+            example.save(force_insert=True)
+
+        return examples
+
+    for example, example_id in zip(examples, created_ids):
+        example.pk = example_id
+
+    return examples
+
 # Calculate the duration in milliseconds from the record date to now
 def calculate_duration(record_date_str):
    
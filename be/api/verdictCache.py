@@ -0,0 +1,94 @@
+"""
+================================================================================
+ Module: verdictCache.py
+ Description:
+        Remembers how the LLM evaluated spoken answers. Verdicts are keyed
+        by the correct answer, the input type and the normalized transcript,
+        so a transcript already evaluated for the same answer is decided
+        without calling the LLM. Recent verdicts are kept in memory (bounded,
+        least recently used dropped), all verdicts are stored in the
+        database for LLM_VERDICT_TTL seconds.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+import hashlib
+import re
+import threading
+import unicodedata
+from datetime import timedelta
+from cachetools import TTLCache
+from django.db import transaction
+from django.utils import timezone
+from be.settings import LLM_VERDICT_CACHE_SIZE, LLM_VERDICT_TTL
+from .models import LLMVerdict
+
+_verdicts = TTLCache(maxsize=LLM_VERDICT_CACHE_SIZE, ttl=LLM_VERDICT_TTL)
+_verdicts_lock = threading.Lock()
+
+# Counters of verdicts found in memory, found in database and missing
+_stats = {"memory_hits": 0, "database_hits": 0, "misses": 0}
+
+# Normalize the transcript so the same spoken answer gives the same key
+def normalize_transcript(transcript):
+    transcript = unicodedata.normalize("NFC", transcript).lower()
+
+    # Punctuation added by speech recognition is not part of the answer
+    transcript = re.sub(r"[.!?…\"']+", " ", transcript)
+
+    return " ".join(transcript.split())
+
+def get_verdict_key(answer, input_type, transcript):
+    text = "\x1f".join([answer, input_type, normalize_transcript(transcript)])
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+# Verdicts stored before this time are expired
+def get_expiry():
+    return timezone.now() - timedelta(seconds=LLM_VERDICT_TTL)
+
+# Get the verdict of an already evaluated transcript (None if it was not evaluated yet)
+def get_cached_verdict(answer, input_type, transcript):
+    key = get_verdict_key(answer, input_type, transcript)
+
+    with _verdicts_lock:
+        verdict = _verdicts.get(key)
+
+        if verdict is not None:
+            _stats["memory_hits"] += 1
+            return verdict
+
+    verdict = LLMVerdict.objects.filter(
+        key=key, created__gte=get_expiry()
+    ).values_list("verdict", flat=True).first()
+
+    with _verdicts_lock:
+        if verdict is None:
+            _stats["misses"] += 1
+        else:
+            _stats["database_hits"] += 1
+            _verdicts[key] = verdict
+
+    return verdict
+
+# Store the verdict of the LLM for the transcript
+def cache_verdict(answer, input_type, transcript, verdict):
+    key = get_verdict_key(answer, input_type, transcript)
+
+    with _verdicts_lock:
+        _verdicts[key] = verdict
+
+    with transaction.atomic():
+        # Expired verdicts are deleted, including an expired verdict of this transcript which is then stored again
+        LLMVerdict.objects.filter(created__lt=get_expiry()).delete()
+
+        LLMVerdict.objects.update_or_create(key=key, defaults={
+            "answer": answer,
+            "input_type": input_type,
+            "transcript": normalize_transcript(transcript),
+            "verdict": verdict,
+        })
+
+# Get counters of cache hits and misses of this process
+def get_verdict_stats():
+    with _verdicts_lock:
+        return dict(_stats, memory_size=len(_verdicts))
@@ -18,23 +18,36 @@ from django.shortcuts import get_object_or_404
 from django.contrib.auth.hashers import make_password, check_password
 from django.http import JsonResponse
 from django.db import transaction
-from .models import Task, Example, Answer, Student, Skill, ExampleSkill, StudentExample, Admin, Step
+from django.db.models import Q, Count, Prefetch
+from .models import Task, Example, Answer, Student, Skill, ExampleSkill, Admin, Step
 from .serializers import ExampleSerializer, SkillSerializer, RecordInitSerializer
-from .utils import get_height, build_skill_tree, get_skill_paths, get_skill_names_string_sync
+from .utils import get_height, build_skill_tree, get_skill_paths, get_skill_names_string_sync, add_skill_to_closure
+from .utils import catalogue_changed, get_example_skill_sets, get_skill_pair_counts, bulk_create_examples
+from .utils import create_skill_relations
+from .skillGraph import get_skill_graph
+from .catalogue import catalogue_cached
+from .sampling import sample_stratified
+from .answerCache import prewarm_compiled_answers
+from .records import create_record, record_attempt, skip_record, delete_record, parse_duration, should_continue, ATTEMPT_LIMIT
+from .practiceSessions import create_session, session_exists, apply_attempts, InvalidAttemptError
+from .geminiClient import gemini_client
+from .verdictCache import get_verdict_stats
 from .answerChecker import InlineAnswerChecker, FractionAnswerChecker, VariableAnswerChecker
 import json
 import random
 from datetime import datetime
 import os
 
-# Add all skill_ids to the related_skills field of each skill
-def create_skill_relations(skill_ids):
-
-    skills = Skill.objects.filter(id__in=skill_ids)
+# Check that the example fits into the example model fields
+def is_valid_example(example_text, input_type):
+    return (
+        len(str(example_text)) <= Example._meta.get_field('example').max_length and
+        len(str(input_type)) <= Example._meta.get_field('input_type').max_length
+    )
 
-    for skill in skills:
-        related_skills = [s for s in skills if s != skill and s.skill_type != skill.skill_type]
-        skill.related_skills.add(*related_skills)  
+# Get (order, text) of the non-empty steps of an example
+def get_step_rows(steps):
+    return [(index, step_text) for index, step_text in enumerate(steps, start=1) if step_text]
 
 # Creates a new task and its examples
 @api_view(['POST'])
@@ -47,66 +60,67 @@ def create_task(request):
     if not task_name:
         return Response({"error": "Nebyl zadán název sady"}, status=status.HTTP_400_BAD_REQUEST)
 
-    skills = Skill.objects.filter(id__in=skill_ids)
+    skills = list(Skill.objects.filter(id__in=skill_ids))
 
-    if not skills.exists():
+    if not skills:
         return Response({"error": "Nebyly zadány žádné dovednosti"}, status=status.HTTP_400_BAD_REQUEST)
 
-    task_instance, created = Task.objects.get_or_create(name=task_name)
+    new_skill_ids = {skill.id for skill in skills}
 
-    task_instance.form = task_form 
+    # Validate required fields
+    examples_data = [
+        example_data for example_data in examples_data
+        if example_data.get('example') and example_data.get('input_type') and
+        is_valid_example(example_data.get('example'), example_data.get('input_type'))
+    ]
 
-    task_instance.save()
+    with transaction.atomic():
+        task_instance, created = Task.objects.get_or_create(name=task_name)
 
-    # Assign skills to the task
-    task_instance.skills.add(*skills)
+        task_instance.form = task_form 
 
-    created_examples = []
+        task_instance.save()
 
-    # Loop through each example data and create it
-    for example_data in examples_data:
-        example_text = example_data.get('example')
-        input_type = example_data.get('input_type')
-        answer_text = example_data.get('answer')
-        steps = example_data.get('steps', [])
+        # Assign skills to the task
+        task_instance.skills.add(*skills)
 
-        # Validate required fields
-        if not example_text or not input_type:
-            continue 
+        # Create all examples, then their answers, skills and steps with one query each
+        examples = bulk_create_examples([
+            Example(example=example_data.get('example'), input_type=example_data.get('input_type'), task=task_instance)
+            for example_data in examples_data
+        ])
 
-        
-        example_payload = {
-            'example': example_text,
-            'input_type': input_type,
-            'task': task_instance.id  
-        }
-        example_serializer = ExampleSerializer(data=example_payload)
-        
-        if example_serializer.is_valid():
-            with transaction.atomic():  
-                example_instance = example_serializer.save()
-
-                # Create answer of example
-                if answer_text:
-                    Answer.objects.create(example=example_instance, answer=answer_text)
-
-                # Assign skills to the example
-                for skill in skills:
-                    ExampleSkill.objects.create(example=example_instance, skill=skill)
-                
-                create_skill_relations(skill_ids)
-
-                # Create example steps if any
-                for index, step_text in enumerate(steps, start=1):
-                    if step_text:  
-                        Step.objects.create(
-                            example=example_instance,
-                            text=step_text,
-                            order=index  
-                        )
-
-                
-                created_examples.append(example_serializer.data)
+        answers = []
+        example_skills = []
+        steps = []
+
+        for example_instance, example_data in zip(examples, examples_data):
+            answer_text = example_data.get('answer')
+
+            # Create answer of example
+            if answer_text:
+                answers.append(Answer(example=example_instance, answer=answer_text))
+
+            # Assign skills to the example
+            example_skills += [ExampleSkill(example=example_instance, skill=skill) for skill in skills]
+
+            # Create example steps if any
+            steps += [
+                Step(example=example_instance, text=step_text, order=order)
+                for order, step_text in get_step_rows(example_data.get('steps', []))
+            ]
+
+        Answer.objects.bulk_create(answers)
+        ExampleSkill.objects.bulk_create(example_skills)
+        Step.objects.bulk_create(steps)
+
+        if examples:
+            create_skill_relations(skill_ids)
+
+        # Skills and their relations changed
+        catalogue_changed(after={example.id: new_skill_ids for example in examples})
+
+    created_examples = ExampleSerializer(examples, many=True).data
     
     return Response({"created_examples": created_examples}, status=status.HTTP_201_CREATED)
 
@@ -127,86 +141,170 @@ def edit_task(request):
     except Task.DoesNotExist:
         return Response({"error": "Task not found."}, status=status.HTTP_404_NOT_FOUND)
 
-    # Update task attributes
-    if task_name:
-        task_instance.name = task_name
-        task_instance.form = task_form
-        task_instance.save()
-
-    skills = Skill.objects.filter(id__in=skill_ids)
-    if not skills.exists():
+    skills = list(Skill.objects.filter(id__in=skill_ids))
+    if not skills:
         return Response({"error": "At least one valid skill ID is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Update tasks skills
-    task_instance.skills.set(skills)
+    new_skill_ids = {skill.id for skill in skills}
 
-    updated_examples = []
+    # Current examples of the task with everything needed to compute the changes
+    existing_examples = {
+        example.id: example
+        for example in Example.objects.filter(task=task_instance).prefetch_related(
+            Prefetch('answers', queryset=Answer.objects.order_by('id')),
+            Prefetch('steps', queryset=Step.objects.order_by('order')),
+            'exampleskill_set'
+        )
+    }
+    examples_by_text = {example.example: example for example in existing_examples.values()}
 
-    # Loop through each example in the request data
+    # Validate required fields, examples which do not fit into the model are left out as in create_task
+    examples_data = [
+        example_data for example_data in examples_data
+        if example_data.get('example') and example_data.get('input_type') and
+        is_valid_example(example_data.get('example'), example_data.get('input_type'))
+    ]
+
+    # Check provided example ids before anything is written
     for example_data in examples_data:
         example_id = example_data.get('example_id')
-        example_text = example_data.get('example')
-        input_type = example_data.get('input_type')
-        answer_text = example_data.get('answer')
-        steps = example_data.get('steps', [])
-
-        if not example_text or not input_type:
-            continue  
-
-        # If example_id is provided, try to update the existing example
-        if example_id:
-            try:
-                example_instance = Example.objects.get(id=example_id, task=task_instance)
+        if example_id and int(example_id) not in existing_examples:
+            return Response({"error": f"Example with ID {example_id} not found."},
+                            status=status.HTTP_404_NOT_FOUND)
+
+    with transaction.atomic():
+        # Update task attributes
+        if task_name and (task_instance.name != task_name or task_instance.form != task_form):
+            task_instance.name = task_name
+            task_instance.form = task_form
+            task_instance.save()
+
+        # Update tasks skills
+        task_instance.skills.set(skills)
+
+        # Rows to be written in bulk
+        changed_examples = {}
+        new_examples = []
+        new_examples_data = []
+        changed_answers = []
+        new_answers = []
+        new_example_skills = []
+        removed_skill_example_ids = set()
+        changed_steps = []
+        new_steps = []
+        removed_step_ids = []
+
+        # Edited examples in the order of the request data
+        edited_examples = []
+
+        # Skills of the edited examples before and after the edit for the in-memory indexes
+        skill_sets_before = {}
+        skill_sets_after = {}
+
+        # Loop through each example in the request data
+        for example_data in examples_data:
+            example_id = example_data.get('example_id')
+            example_text = example_data.get('example')
+            input_type = example_data.get('input_type')
+
+            # If example_id is provided, update the existing example,
+            # otherwise check by example text or create a new one
+            if example_id:
+                example_instance = existing_examples[int(example_id)]
+            else:
+                example_instance = examples_by_text.get(example_text)
+
+            if example_instance is None:
+                new_examples.append(Example(example=example_text, input_type=input_type, task=task_instance))
+                new_examples_data.append(example_data)
+                edited_examples.append(new_examples[-1])
+                continue
+
+            if example_instance.example != example_text or example_instance.input_type != input_type:
                 example_instance.example = example_text
                 example_instance.input_type = input_type
-                example_instance.save()
-            except Example.DoesNotExist:
-                return Response({"error": f"Example with ID {example_id} not found."},
-                                status=status.HTTP_404_NOT_FOUND)
-        
-        # If no example_id is provided, check by example text or create a new one
-        else:
-            example_instance, created = Example.objects.update_or_create(
-                example=example_text,
-                task=task_instance,
-                defaults={'input_type': input_type}
-            )
+                changed_examples[example_instance.id] = example_instance
+
+            # Update or create answer
+            answer_text = example_data.get('answer')
+            answers = list(example_instance.answers.all())
+            if answer_text:
+                if not answers:
+                    new_answers.append(Answer(example=example_instance, answer=answer_text))
+                elif answers[0].answer != answer_text:
+                    answers[0].answer = answer_text
+                    changed_answers.append(answers[0])
+
+            # Update related skills to the example
+            current_skill_ids = {relation.skill_id for relation in example_instance.exampleskill_set.all()}
+            if example_instance.id not in skill_sets_before:
+                skill_sets_before[example_instance.id] = current_skill_ids
+            skill_sets_after[example_instance.id] = new_skill_ids
+
+            if current_skill_ids - new_skill_ids:
+                removed_skill_example_ids.add(example_instance.id)
+            new_example_skills += [
+                ExampleSkill(example=example_instance, skill_id=skill_id)
+                for skill_id in new_skill_ids - current_skill_ids
+            ]
 
-        # Update or create answer
-        if answer_text:
-            answer_instance, _ = Answer.objects.update_or_create(
-                example=example_instance,
-                defaults={'answer': answer_text}
-            )
+            # Update steps by their order
+            current_steps = {step.order: step for step in example_instance.steps.all()}
+            step_rows = get_step_rows(example_data.get('steps', []))
 
-        # Update related skills to the example
-        existing_relations = ExampleSkill.objects.filter(example=example_instance)
-        new_skill_ids = set(skill.id for skill in skills)
-        existing_relations.exclude(skill_id__in=new_skill_ids).delete()
+            for order, step_text in step_rows:
+                step = current_steps.pop(order, None)
+                if step is None:
+                    new_steps.append(Step(example=example_instance, order=order, text=step_text))
+                elif step.text != step_text:
+                    step.text = step_text
+                    changed_steps.append(step)
 
-        for skill in skills:
-            ExampleSkill.objects.update_or_create(example=example_instance, skill=skill)
-        
-        create_skill_relations(skill_ids)
-
-        # Update or create Step instances
-        Step.objects.filter(example=example_instance).delete() 
-        for index, step_text in enumerate(steps, start=1):
-            if step_text:
-                Step.objects.create(
-                    example=example_instance,
-                    order=index,
-                    text=step_text
-                )
+            removed_step_ids += [step.id for step in current_steps.values()]
+
+            edited_examples.append(example_instance)
+
+        # Write all changes with one query per kind of change
+        Example.objects.bulk_update(changed_examples.values(), ['example', 'input_type'])
+        bulk_create_examples(new_examples)
+
+        for example_instance, example_data in zip(new_examples, new_examples_data):
+            if example_data.get('answer'):
+                new_answers.append(Answer(example=example_instance, answer=example_data.get('answer')))
+
+            skill_sets_after[example_instance.id] = new_skill_ids
+            new_example_skills += [ExampleSkill(example=example_instance, skill_id=skill_id) for skill_id in new_skill_ids]
+
+            new_steps += [
+                Step(example=example_instance, order=order, text=step_text)
+                for order, step_text in get_step_rows(example_data.get('steps', []))
+            ]
+
+        Answer.objects.bulk_update(changed_answers, ['answer'])
+        Answer.objects.bulk_create(new_answers)
+
+        if removed_skill_example_ids:
+            ExampleSkill.objects.filter(example_id__in=removed_skill_example_ids).exclude(skill_id__in=new_skill_ids).delete()
+        ExampleSkill.objects.bulk_create(new_example_skills)
+
+        if removed_step_ids:
+            Step.objects.filter(id__in=removed_step_ids).delete()
+        Step.objects.bulk_update(changed_steps, ['text'])
+        Step.objects.bulk_create(new_steps)
+
+        if edited_examples:
+            create_skill_relations(skill_ids)
 
-        example_serializer = ExampleSerializer(example_instance)
-        updated_examples.append(example_serializer.data)
+        # Skills and their relations changed
+        catalogue_changed(skill_sets_before, skill_sets_after)
 
+    updated_examples = ExampleSerializer(edited_examples, many=True).data
     
     return Response({"updated_examples": updated_examples}, status=status.HTTP_200_OK)
 
 # Get skill data by provided skill id
 @api_view(['GET'])
+@catalogue_cached
 def get_skill(request, skill_id):
     try:
         skill = Skill.objects.get(id=skill_id)
@@ -221,6 +319,31 @@ def get_skill(request, skill_id):
     except Skill.DoesNotExist:
         return Response({"error": "Skill not found"}, status=status.HTTP_404_NOT_FOUND)
 
+# Get examples matching at least one of the skill paths annotated with the paths they match
+def get_matching_examples(skill_paths):
+
+    # Count skills of each path the example has, example matches the path if it has all of them
+    path_counts = {
+        f"path_{index}": Count('exampleskill__skill', filter=Q(exampleskill__skill__in=path), distinct=True)
+        for index, path in enumerate(skill_paths)
+    }
+
+    matches_path = Q()
+    for index, path in enumerate(skill_paths):
+        matches_path |= Q(**{f"path_{index}": len(set(path))})
+
+    # One grouped query for all paths
+    return Example.objects.filter(
+        exampleskill__skill__in={skill_id for path in skill_paths for skill_id in path}
+    ).annotate(**path_counts).filter(matches_path)
+
+# Get indexes of the skill paths the annotated example matches
+def get_matched_paths(example_counts, skill_paths):
+    return [
+        index for index, path in enumerate(skill_paths)
+        if example_counts[index] == len(set(path))
+    ]
+
 # Get all examples for the provided skill ids
 @api_view(['GET'])
 def get_examples(request):
@@ -236,47 +359,89 @@ def get_examples(request):
     except json.JSONDecodeError:
         return Response({"error": "Invalid JSON format for topics"}, status=status.HTTP_400_BAD_REQUEST)
 
+    # Optional count of examples to return and seed of the random selection
+    limit = request.query_params.get('limit')
+    seed = request.query_params.get('seed')
+
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+
+        if limit <= 0:
+            return Response({"error": "Limit must be a positive number"}, status=status.HTTP_400_BAD_REQUEST)
+
+    rng = random.Random(seed)
+
     # Get skill paths to get examples containing them
     skill_paths = get_skill_paths(skills_data)
 
     example_data = []
 
-    for path in skill_paths:
+    if skill_paths:
+        examples = get_matching_examples(skill_paths)
+        path_keys = [f"path_{index}" for index in range(len(skill_paths))]
+
+        # Sample example ids balanced across the paths, then load only the sampled examples
+        if limit is not None:
+            rows = (
+                (row[0], get_matched_paths(row[1:], skill_paths))
+                for row in examples.order_by('id').values_list('id', *path_keys).iterator(chunk_size=2000)
+            )
+            sampled_ids = sample_stratified(rows, len(skill_paths), limit, rng)
 
-        examples = Example.objects.filter(
-            exampleskill__skill__id__in=path
-        ).distinct()
+            examples = Example.objects.filter(id__in=sampled_ids)
 
-        for example in examples:
+        examples = examples.order_by('id').prefetch_related(
+            Prefetch('answers', queryset=Answer.objects.order_by('id')),
+            Prefetch('steps', queryset=Step.objects.order_by('order'))
+        )
 
-            example_skill_ids = set(example.exampleskill_set.values_list('skill__id', flat=True))
+        # Answers of the examples are parsed ahead so checking the attempts does not query them
+        first_answers = {}
 
-            # Check if the example skill ids contain all the skills in the current path (no missing skills)
-            if example_skill_ids.issuperset(set(path)):
+        for example in examples:
 
-                example_data.append({
-                    "id": example.id,
-                    "example": example.example,
-                    "input_type": example.input_type,
-                    "answers": [
-                        {
-                            "id": answer.id,
-                            "answer": answer.answer
-                        }
-                        for answer in example.answers.all()
-                    ],
-                    "steps": [
-                        {
-                            "id": step.id,
-                            "order": step.order,
-                            "text": step.text
-                        }
-                        for step in example.steps.all().order_by('order')
-                    ]
-                })
+            answers = example.answers.all()
+            if answers:
+                first_answers[example.id] = answers[0].answer
+
+            example_item = {
+                "id": example.id,
+                "example": example.example,
+                "input_type": example.input_type,
+                "answers": [
+                    {
+                        "id": answer.id,
+                        "answer": answer.answer
+                    }
+                    for answer in answers
+                ],
+                "steps": [
+                    {
+                        "id": step.id,
+                        "order": step.order,
+                        "text": step.text
+                    }
+                    for step in example.steps.all()
+                ]
+            }
+
+            # Sampled example is listed once
+            if limit is not None:
+                example_data.append(example_item)
+
+            # Example is listed once for every path it matches
+            else:
+                counts = [getattr(example, key) for key in path_keys]
+                for _ in get_matched_paths(counts, skill_paths):
+                    example_data.append(example_item)
+
+        prewarm_compiled_answers(first_answers)
 
     # Shuffle the final list of examples to ensure they are mixed
-    random.shuffle(example_data)
+    rng.shuffle(example_data)
 
     return Response(example_data, status=status.HTTP_200_OK)
 
@@ -285,11 +450,13 @@ def get_examples(request):
 def create_example_record(request):
     student = request.data.get('student_id')
     example = request.data.get('example_id')
+    session_id = request.data.get('session_id')
     
     if not student:
         return Response({"error": "Student ID is required"}, status=status.HTTP_400_BAD_REQUEST)
     if not example:
         return Response({"error": "Example ID is required"}, status=status.HTTP_400_BAD_REQUEST)
+
     
     init_data = {
         'student': student,
@@ -298,8 +465,13 @@ def create_example_record(request):
 
     record_init_serializer = RecordInitSerializer(data=init_data)
 
+    # Serializer only validates that the student and the example exist
     if record_init_serializer.is_valid():
-        record = record_init_serializer.save()
+        # Record of the practice session gets the attempts sent in its batches
+        if session_id and not session_exists(session_id, student):
+            return Response({"error": "Practice session not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        record = create_record(student, example, session_id or None)
 
         response_data = record_init_serializer.data
         response_data['date'] = record.date
@@ -321,24 +493,20 @@ def update_example_record(request):
   
     if not student or not example or not duration:
         return Response({"error": "Missing required fields"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if parse_duration(duration) is None:
+        return Response({"error": "Invalid duration"}, status=status.HTTP_400_BAD_REQUEST)
     
-    student_example = get_object_or_404(StudentExample, student_id=student, example_id=example, date=date)
-    
-    try:
-        with transaction.atomic():
-            # Update record data
-            student_example.attempts += 1
-            student_example.duration = duration
-
-            # Determine if limit of tries is reached and new example should be shown to user
-            next_example = student_example.attempts == 3
-                         
-            student_example.save()
-        
-        return Response({"message": "Record updated successfully", "next_example": next_example}, status=status.HTTP_200_OK)
+    # Update record data
+    attempts = record_attempt(student, example, date, duration)
 
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    if attempts is None:
+        return Response({"error": "Record not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    # Determine if limit of tries is reached and new example should be shown to user
+    next_example = attempts >= ATTEMPT_LIMIT
+
+    return Response({"message": "Record updated successfully", "next_example": next_example}, status=status.HTTP_200_OK)
 
 # Deletes record that user practiced the example        
 @api_view(['POST'])
@@ -351,17 +519,11 @@ def delete_example_record(request):
     if not student or not example or not date:
         return Response({"error": "Missing required fields"}, status=status.HTTP_400_BAD_REQUEST)
     
-    student_example = get_object_or_404(StudentExample, student_id=student, example_id=example, date=date)
-
-    try:
-        with transaction.atomic():
-            student_example.delete()
-
-        return Response({"message": "Record successfully deleted"}, status=status.HTTP_204_NO_CONTENT)
-
-    except StudentExample.DoesNotExist:
+    if not delete_record(student, example, date):
         return Response({"error": "Record not found"}, status=status.HTTP_404_NOT_FOUND)
 
+    return Response({"message": "Record successfully deleted"}, status=status.HTTP_204_NO_CONTENT)
+
 # Updates example record to skipped
 @api_view(['POST'])
 def skip_example(request):
@@ -373,24 +535,50 @@ def skip_example(request):
     if not student or not example or not date:
         return Response({"error": "Missing required fields"}, status=status.HTTP_400_BAD_REQUEST)
     
-    student_example = get_object_or_404(StudentExample, student_id=student, example_id=example, date=date)
+    # Record is marked as skipped and attempts and duration are not relevant
+    if not skip_record(student, example, date):
+        return Response({"error": "Record not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({"message": "Example skipped"}, status=status.HTTP_200_OK)
+
+# Start a practice session, its attempts are then sent in batches
+@api_view(['POST'])
+def create_practice_session(request):
+    student = request.data.get('student_id')
 
+    if not student:
+        return Response({"error": "Student ID is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not Student.objects.filter(id=student).exists():
+        return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    session = create_session(student)
+
+    return Response({"session_id": session.id, "started": session.started}, status=status.HTTP_201_CREATED)
+
+# Write a batch of attempts of the practice session (repeated batch with the same idempotency key is not applied again)
+@api_view(['POST'])
+def add_practice_attempts(request, session_id):
     try:
-        with transaction.atomic():
+        result = apply_attempts(
+            session_id,
+            request.data.get('attempts', []),
+            idempotency_key=request.data.get('idempotency_key'),
+            finished=request.data.get('finished', False)
+        )
+    except InvalidAttemptError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Record is marked as skipped and attempts and duration are not relevant
-            student_example.skipped = True
-            student_example.attempts = 0
-            student_example.duration = 0
-                        
-            student_example.save()
-        
-        return Response({"message": "Example skipped"}, status=status.HTTP_200_OK)
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    if result is None:
+        return Response({"error": "Practice session not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    records, duplicate = result
+
+    return Response({"records": records, "duplicate": duplicate}, status=status.HTTP_200_OK)
 
 # Get all tasks and their examples
 @api_view(['GET'])
+@catalogue_cached
 def get_tasks(request):
     tasks = Task.objects.prefetch_related(
         'example_set__answers',         
@@ -458,7 +646,10 @@ def delete_example(request, example_id):
     
     try:
         with transaction.atomic():
+            skill_sets = get_example_skill_sets([example.id])
             example.delete()
+
+            catalogue_changed(before=skill_sets)
         
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -474,22 +665,46 @@ def delete_task(request, task_id):
             
             related_skills = list(task.skills.all())  
 
+            # Skills of the examples which are deleted with the task
+            skill_sets = get_example_skill_sets(list(task.example_set.values_list('id', flat=True)))
+
             # Remove connections from the skill-task relationship
             task.skills.clear()
 
             # Delete the task and its related data (examples, answers, steps)
             task.delete()
 
-            # Check skill relationships and remove them if no other task uses them
-            for skill in related_skills:
-                for related_skill in skill.related_skills.all():
-                    # Get all tasks where both skills are used together
-                    shared_tasks = Task.objects.filter(skills=skill).filter(skills=related_skill)
-                    
-                    # If this was the last task using this relationship, remove the relation
-                    if not shared_tasks.exists():
-                        skill.related_skills.remove(related_skill)
-                        related_skill.related_skills.remove(skill)
+            catalogue_changed(before=skill_sets)
+
+            # Check skill relationships and remove them if no example and no other task uses both skills anymore
+            RelatedSkills = Skill.related_skills.through
+            relations = list(RelatedSkills.objects.filter(
+                from_skill_id__in=[skill.id for skill in related_skills]
+            ).values_list('from_skill_id', 'to_skill_id'))
+
+            relation_skill_ids = {skill_id for relation in relations for skill_id in relation}
+            pair_counts = get_skill_pair_counts(relation_skill_ids)
+
+            # Tasks without examples keep the relations of their skills too
+            task_skills = {}
+            for other_task_id, skill_id in Task.skills.through.objects.filter(
+                skill_id__in=relation_skill_ids
+            ).values_list('task_id', 'skill_id'):
+                task_skills.setdefault(other_task_id, set()).add(skill_id)
+
+            unused_relations = [
+                relation for relation in relations
+                if not pair_counts.get(relation)
+                and not any(set(relation) <= skill_ids for skill_ids in task_skills.values())
+            ]
+
+            # Remove both directions of each unused relation in one query
+            if unused_relations:
+                condition = Q()
+                for skill_id, related_skill_id in unused_relations:
+                    condition |= Q(from_skill_id=skill_id, to_skill_id=related_skill_id)
+                    condition |= Q(from_skill_id=related_skill_id, to_skill_id=skill_id)
+                RelatedSkills.objects.filter(condition).delete()
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -529,6 +744,8 @@ def create_skill(request):
             existing_skill.deleted = False
             existing_skill.save()
 
+            catalogue_changed()
+
             return JsonResponse({
                 "id": existing_skill.id,
                 "name": existing_skill.name,
@@ -546,6 +763,11 @@ def create_skill(request):
                     height=height
                 )
 
+                # Link the skill to its ancestors
+                add_skill_to_closure(skill)
+
+            catalogue_changed()
+
             return JsonResponse({
                 "id": skill.id,
                 "name": skill.name,
@@ -558,6 +780,7 @@ def create_skill(request):
 
 # Get all skills in a tree structure
 @api_view(['GET'])
+@catalogue_cached
 def get_skill_tree(request):
     skills = Skill.objects.filter(deleted=False)
     skill_list = SkillSerializer(skills, many=True).data
@@ -612,6 +835,7 @@ def search_skills(request):
 
 # Get skills which should be displayed on landing page
 @api_view(['GET'])
+@catalogue_cached
 def get_landing_page_skills(request):
 
     # Get non-deleted skills
@@ -635,103 +859,91 @@ def get_landing_page_skills(request):
 
 # Get all skills related to the selected skill  
 @api_view(['GET'])
+@catalogue_cached
 def get_related_skills_tree(request, skill_id):
-    try:
-        main_skill = Skill.objects.get(id=skill_id, deleted=False)  
-        visited = set()
-        tree = []
+    graph = get_skill_graph()
+
+    if not graph.exists(skill_id):
+        return Response({"error": "Skill not found"}, status=404)
 
-        related_skills = main_skill.related_skills.filter(deleted=False)    
+    visited = set()
+    tree = []
 
-        # Build tree structure to be visualized in the frontend
-        for skill in related_skills:
-            skill_ids = [main_skill.id, skill.id] 
-            if skill.id not in visited:
-                subtree = build_skill_tree(skill, visited, skill_ids, related_skills, None)
-                if subtree:
-                    tree.append(subtree)
+    related_skills = set(graph.get_related(skill_id))
 
-        return Response(tree)
+    # Build tree structure to be visualized in the frontend
+    for related_id in sorted(related_skills):
+        skill_ids = [skill_id, related_id] 
+        if related_id not in visited:
+            subtree = build_skill_tree(related_id, visited, skill_ids, related_skills, None)
+            if subtree:
+                tree.append(subtree)
 
-    except Skill.DoesNotExist:
-        return Response({"error": "Skill not found"}, status=404)
+    return Response(tree)
 
 # Get all children skills of the selected skill
 @api_view(['GET'])
+@catalogue_cached
 def get_children_skills_tree(request, skill_id):
 
     # Edge case for Equation skills
     withCounts = request.GET.get('with_counts', 'false') == 'true'
 
-    try:
-        main_skill = Skill.objects.get(id=skill_id)  
+    graph = get_skill_graph()
 
-        if main_skill.deleted:
-            return Response({"error": "Skill not found"}, status=404)   
-        visited = set()  
-        tree = []
-        
-        # Get all children skills of the selected skill
-        children = Skill.objects.filter(parent_skill=main_skill, deleted=False)
+    if not graph.exists(skill_id):
+        return Response({"error": "Skill not found"}, status=404)   
 
-        # Build subtree structure of each child to be visualized in the frontend
-        for skill in children:
-            if skill.id not in visited:
-                subtree = build_skill_tree(skill, visited, None, None, withCounts) 
-                if subtree:
-                    tree.append(subtree)
+    visited = set()  
+    tree = []
 
-        return Response(tree)  
+    # Build subtree structure of each child to be visualized in the frontend
+    for child_id in graph.get_children(skill_id):
+        if child_id not in visited:
+            subtree = build_skill_tree(child_id, visited, None, None, withCounts) 
+            if subtree:
+                tree.append(subtree)
 
-    except Skill.DoesNotExist:
-        return Response({"error": "Skill not found"}, status=404)
+    return Response(tree)  
 
 # Get all operation skills related to the selected skill    
 @api_view(['GET'])
 def get_operation_skills(request, skill_id):
-    try:
-        main_skill = get_object_or_404(Skill, id=skill_id)
-
-        if main_skill.deleted:
-            return Response({"error": "Skill not found"}, status=404)
+    graph = get_skill_graph()
 
-        # Get all children skills of the selected skill
-        children_skills = main_skill.subskills.filter(deleted=False)
+    if not graph.exists(skill_id):
+        return Response({"error": "Skill not found"}, status=404)
 
-        # Get all operation skills related to the selected skill    
-        related_operation_skills = main_skill.related_skills.filter(skill_type='OPERATION', deleted=False)
+    # Get all children skills of the selected skill
+    children_skill_ids = graph.get_children(skill_id)
 
-        skills_data = []
+    # Get all operation skills related to the selected skill    
+    operation_skill_ids = graph.get_related(skill_id, skill_type='OPERATION')
 
-        for operation_skill in related_operation_skills:
-            child_data = []
+    # Count of examples that have both operation skill and child skill for every pair
+    pair_counts = get_skill_pair_counts(set(children_skill_ids) | set(operation_skill_ids))
 
-            for child_skill in children_skills:
-                # Count examples that have both operation_skill and child_skill
-                examples_count = ExampleSkill.objects.filter(
-                    skill=operation_skill
-                ).filter(
-                    example__in=ExampleSkill.objects.filter(skill=child_skill).values('example')
-                ).count()
+    skills_data = []
 
-                child_data.append({
-                    "related_id": child_skill.id,
-                    "related_name": child_skill.name,
-                    "examples": examples_count
-                })
+    for operation_skill_id in operation_skill_ids:
+        operation_skill = graph.get(operation_skill_id)
 
-            # Include only single operations not parent skill Operations
-            if operation_skill.height >= 3:
-                skills_data.append({
-                "id": operation_skill.id,
-                "name": operation_skill.name,
-                "related_skills": child_data
-                })
+        # Include only single operations not parent skill Operations
+        if operation_skill["height"] >= 3:
+            skills_data.append({
+            "id": operation_skill_id,
+            "name": operation_skill["name"],
+            "related_skills": [
+                {
+                    "related_id": child_skill_id,
+                    "related_name": graph.get(child_skill_id)["name"],
+                    "examples": pair_counts.get((operation_skill_id, child_skill_id), 0)
+                }
+                for child_skill_id in children_skill_ids
+            ]
+            })
 
-        return Response(skills_data)
-    
-    except Skill.DoesNotExist:
-        return Response({"error": "Skill not found"}, status=404)
+    return Response(skills_data)
 
 # Soft delete a skill and remove all its relations
 @api_view(['PATCH'])
@@ -744,6 +956,9 @@ def delete_skill(request, skill_id):
         skill.save()
         
         # Remove this skill from all related examples
+        skill_sets = get_example_skill_sets(
+            list(ExampleSkill.objects.filter(skill=skill).values_list('example_id', flat=True))
+        )
         ExampleSkill.objects.filter(skill=skill).delete()
         
         # Remove this skill from realtions with tasks
@@ -753,6 +968,11 @@ def delete_skill(request, skill_id):
         # Remove this skill from all related_skills
         for related_skill in skill.related_skills.all():
             skill.related_skills.remove(related_skill)
+
+        catalogue_changed(
+            before=skill_sets,
+            after={example_id: skills - {skill.id} for example_id, skills in skill_sets.items()}
+        )
         
         return Response(
             {"message": f"Skill '{skill.name}' marked as deleted and all relations removed."},
@@ -833,11 +1053,24 @@ def check_answer(request):
     date = request.data.get('date')
     duration = request.data.get('duration')
 
+    # Answer of a practice session is only evaluated, the attempt is sent in a batch of the session
+    session_id = request.data.get('session_id')
+    attempts = request.data.get('attempts', 0)
+
     student_answer = request.data.get('student_answer')
     answer_type = request.data.get('answer_type')
 
-    if not student_id or not example_id or not date or not duration or not answer_type:
+    if not student_id or not example_id or not (date or session_id) or not duration or not answer_type:
         return Response({'error': 'Missing required fields'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if parse_duration(duration) is None:
+        return Response({'error': 'Invalid duration'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if session_id:
+        date = None
+
+        if not isinstance(attempts, int) or isinstance(attempts, bool) or attempts < 0:
+            return Response({'error': 'Invalid attempts'}, status=status.HTTP_400_BAD_REQUEST)
     
     # Choose the answer checker based on the answer type
     match answer_type:
@@ -856,6 +1089,10 @@ def check_answer(request):
         case _:
             return Response({'error': 'Invalid answer type'}, status=status.HTTP_400_BAD_REQUEST)
     
+    # Attempts of the session were counted by the client before this one
+    if session_id:
+        continue_with_next = should_continue(attempts + 1, isCorrect)
+
     # Return if answer was corrrect and if new example should be shown
     return Response({'isCorrect': isCorrect, 'continue_with_next': continue_with_next}, status=status.HTTP_200_OK)    
 
@@ -884,7 +1121,7 @@ def get_skill_related_counts(request):
 
     task_count = Task.objects.filter(skills=skill).count()
 
-    example_count = ExampleSkill.objects.filter(skill=skill).count()
+    example_count = get_skill_pair_counts([skill.id]).get((skill.id, skill.id), 0)
 
     data = {
         "task_count": task_count,
@@ -928,4 +1165,12 @@ def save_survey_answer(request):
     with open(json_filepath, "w", encoding="utf-8") as json_file:
         json.dump(survey_question_data, json_file, indent=4, ensure_ascii=False)
     
-    return Response(status=status.HTTP_200_OK)
\ No newline at end of file
+    return Response(status=status.HTTP_200_OK)
+
+# Get state of the Gemini client and counters of reused LLM verdicts of this process
+@api_view(['GET'])
+def get_llm_status(request):
+    return Response({
+        "gemini": gemini_client.get_state(),
+        "verdicts": get_verdict_stats()
+    }, status=status.HTTP_200_OK)
@@ -0,0 +1,134 @@
+"""
+================================================================================
+ Module: voiceActivity.py
+ Description:
+        Voice activity detection of the 16 kHz 16-bit mono stream sent by
+        the client. Audio is split into short frames, energy and zero
+        crossing rate of all frames of a chunk are computed at once with
+        NumPy. Frames with speech are forwarded to speech recognition with
+        a short part of audio before them and a hangover after them. Only
+        the beginning of each pause is kept (recognition needs it to end
+        the utterance), the rest of the silence is dropped. The end of an
+        utterance is reported once the pause is long enough.
+ Author: Dominik Horut (xhorut01)
+================================================================================
+"""
+
+from collections import deque
+import numpy as np
+from be.settings import SPEECH_VAD, SPEECH_VAD_ENERGY_THRESHOLD, SPEECH_VAD_ZCR_THRESHOLD
+from be.settings import SPEECH_VAD_HANGOVER_MS, SPEECH_VAD_KEEP_SILENCE_MS, SPEECH_VAD_END_SILENCE_MS
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+FRAME_MS = 20
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+FRAME_BYTES = FRAME_SAMPLES * SAMPLE_WIDTH
+
+# Audio before the detected start of speech which is forwarded too (quiet beginning of the first word)
+PREROLL_MS = 200
+
+# Quiet frames with many zero crossings (s, š, f) are speech if they are at most this much below the energy threshold
+ZCR_ENERGY_MARGIN = 10
+
+# Energy in dBFS and zero crossing rate of each frame of the samples (frames x samples)
+def get_frame_features(frames):
+    samples = frames.astype(np.float32) / 32768
+    energy = 10 * np.log10(np.mean(samples ** 2, axis=1) + 1e-10)
+
+    signs = np.signbit(frames)
+    zero_crossings = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+    return energy, zero_crossings
+
+# Frames which contain speech
+def detect_speech(frames, energy_threshold, zcr_threshold):
+    energy, zero_crossings = get_frame_features(frames)
+
+    loud = energy > energy_threshold
+    fricative = (energy > energy_threshold - ZCR_ENERGY_MARGIN) & (zero_crossings > zcr_threshold)
+
+    return loud | fricative
+
+class VoiceActivityDetector:
+
+    def __init__(self, enabled=SPEECH_VAD, energy_threshold=SPEECH_VAD_ENERGY_THRESHOLD,
+                 zcr_threshold=SPEECH_VAD_ZCR_THRESHOLD, hangover_ms=SPEECH_VAD_HANGOVER_MS,
+                 keep_silence_ms=SPEECH_VAD_KEEP_SILENCE_MS, end_silence_ms=SPEECH_VAD_END_SILENCE_MS):
+        self.enabled = enabled
+        self.energy_threshold = energy_threshold
+        self.zcr_threshold = zcr_threshold
+        self.hangover_frames = hangover_ms // FRAME_MS
+        self.end_frames = max(end_silence_ms // FRAME_MS, 1)
+
+        # Pause is kept at least until its end is reported
+        self.keep_frames = max(keep_silence_ms // FRAME_MS, self.end_frames)
+
+        # Bytes not forming a whole frame, processed with the next chunk
+        self.remainder = b""
+
+        # Recently dropped frames, forwarded when speech starts
+        self.preroll = deque(maxlen=PREROLL_MS // FRAME_MS)
+
+        self.hangover = 0
+        self.silent_frames = self.keep_frames
+        self.in_utterance = False
+
+        self.received_bytes = 0
+        self.forwarded_bytes = 0
+
+    # Filter a chunk of audio, returns (audio to forward, True if an utterance ended in the chunk)
+    def process(self, data):
+        self.received_bytes += len(data)
+
+        if not self.enabled:
+            self.forwarded_bytes += len(data)
+            return data, False
+
+        data = self.remainder + data
+        frame_count = len(data) // FRAME_BYTES
+        self.remainder = data[frame_count * FRAME_BYTES:]
+
+        if not frame_count:
+            return b"", False
+
+        frames = np.frombuffer(data, dtype="<i2", count=frame_count * FRAME_SAMPLES).reshape(frame_count, FRAME_SAMPLES)
+        speech = detect_speech(frames, self.energy_threshold, self.zcr_threshold)
+
+        output = bytearray()
+        utterance_ended = False
+
+        for index in range(frame_count):
+            frame = data[index * FRAME_BYTES:(index + 1) * FRAME_BYTES]
+
+            if speech[index]:
+                # Start of speech, audio just before it is forwarded too
+                if self.silent_frames > self.keep_frames:
+                    for previous_frame in self.preroll:
+                        output.extend(previous_frame)
+                self.preroll.clear()
+
+                output.extend(frame)
+                self.hangover = self.hangover_frames
+                self.silent_frames = 0
+                self.in_utterance = True
+
+            elif self.hangover:
+                # Short pauses inside speech are speech
+                output.extend(frame)
+                self.hangover -= 1
+
+            else:
+                self.silent_frames += 1
+
+                if self.silent_frames <= self.keep_frames:
+                    output.extend(frame)
+                else:
+                    self.preroll.append(frame)
+
+                if self.in_utterance and self.silent_frames >= self.end_frames:
+                    self.in_utterance = False
+                    utterance_ended = True
+
+        self.forwarded_bytes += len(output)
+        return bytes(output), utterance_ended
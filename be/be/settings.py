@@ -96,6 +96,94 @@ DATABASES = {
     }
 }
 
+# Cache
+# Local memory cache by default, set CACHE_REDIS_URL to share cached catalogue between processes
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        },
+        'catalogue': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'KEY_PREFIX': 'catalogue',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'default',
+        },
+        'catalogue': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'catalogue',
+            'OPTIONS': {'MAX_ENTRIES': 1000},
+        },
+    }
+
+# Maximum number of spoken answers evaluated at once in one process
+SPEECH_EVALUATION_WORKERS = int(os.getenv('SPEECH_EVALUATION_WORKERS', 8))
+
+# Threads starting and stopping speech recognizers of all connections in one process
+SPEECH_RECOGNIZER_THREADS = int(os.getenv('SPEECH_RECOGNIZER_THREADS', 4))
+
+# Prepared recognizer sessions kept for each language, the pool is refilled to the minimal size
+SPEECH_POOL_LANGUAGES = os.getenv('SPEECH_POOL_LANGUAGES', 'cs-CZ,en-US').split(',')
+SPEECH_POOL_MIN_SIZE = int(os.getenv('SPEECH_POOL_MIN_SIZE', 2))
+SPEECH_POOL_MAX_SIZE = int(os.getenv('SPEECH_POOL_MAX_SIZE', 10))
+
+# Prepared sessions older than this many seconds are closed instead of being handed out (Azure drops idle connections)
+SPEECH_POOL_SESSION_TTL = float(os.getenv('SPEECH_POOL_SESSION_TTL', 180))
+
+# Voice activity detection, energy threshold in dBFS, durations in milliseconds
+# (kept silence has to be longer than the pause after which Azure ends the utterance, about 500 ms)
+SPEECH_VAD = os.getenv('SPEECH_VAD', 'true').lower() == 'true'
+SPEECH_VAD_ENERGY_THRESHOLD = float(os.getenv('SPEECH_VAD_ENERGY_THRESHOLD', -45))
+SPEECH_VAD_ZCR_THRESHOLD = float(os.getenv('SPEECH_VAD_ZCR_THRESHOLD', 0.3))
+SPEECH_VAD_HANGOVER_MS = int(os.getenv('SPEECH_VAD_HANGOVER_MS', 200))
+SPEECH_VAD_KEEP_SILENCE_MS = int(os.getenv('SPEECH_VAD_KEEP_SILENCE_MS', 800))
+SPEECH_VAD_END_SILENCE_MS = int(os.getenv('SPEECH_VAD_END_SILENCE_MS', 300))
+
+# Interim transcripts are sent to the client at most once per interval (seconds)
+SPEECH_INTERIM_INTERVAL = float(os.getenv('SPEECH_INTERIM_INTERVAL', 0.3))
+
+# Skip, finish and correct answers are decided from interim transcripts once the same decision
+# comes from this many hypotheses in a row, or from fewer of them when the student stops speaking
+SPEECH_EARLY_EVALUATION = os.getenv('SPEECH_EARLY_EVALUATION', 'true').lower() == 'true'
+SPEECH_EARLY_STABLE_HYPOTHESES = int(os.getenv('SPEECH_EARLY_STABLE_HYPOTHESES', 3))
+SPEECH_EARLY_END_HYPOTHESES = int(os.getenv('SPEECH_EARLY_END_HYPOTHESES', 1))
+
+# Audio of one answer kept in memory, older audio of longer answers is overwritten
+SPEECH_CAPTURE_MAX_SECONDS = float(os.getenv('SPEECH_CAPTURE_MAX_SECONDS', 30))
+
+# Audio answers with their evaluation are saved as WAV and JSON files to the directory
+SPEECH_DUMP_AUDIO = os.getenv('SPEECH_DUMP_AUDIO', 'false').lower() == 'true'
+SPEECH_DUMP_DIR = os.getenv('SPEECH_DUMP_DIR', 'audioprompts')
+
+# Attempts of records are written by a background thread every interval (seconds) or when this many records changed,
+# the optional journal (path of its files) keeps changes not written yet when the process crashes
+# (only for deployments where answers of one student are handled by one process, off by default)
+RECORD_BUFFER = os.getenv('RECORD_BUFFER', 'false').lower() == 'true'
+RECORD_BUFFER_FLUSH_INTERVAL = float(os.getenv('RECORD_BUFFER_FLUSH_INTERVAL', 2))
+RECORD_BUFFER_MAX_PENDING = int(os.getenv('RECORD_BUFFER_MAX_PENDING', 500))
+RECORD_BUFFER_JOURNAL = os.getenv('RECORD_BUFFER_JOURNAL', '')
+
+# Gemini requests are limited per process, circuit is opened after failures in a row and probed again after the timeout
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv('GEMINI_REQUESTS_PER_MINUTE', 15))
+GEMINI_BURST = int(os.getenv('GEMINI_BURST', 5))
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', 5))
+GEMINI_FAILURE_THRESHOLD = int(os.getenv('GEMINI_FAILURE_THRESHOLD', 3))
+GEMINI_RESET_TIMEOUT = float(os.getenv('GEMINI_RESET_TIMEOUT', 30))
+
+# Verdicts of the LLM answer evaluation are reused for the same transcript of the same answer
+LLM_VERDICT_CACHE_SIZE = int(os.getenv('LLM_VERDICT_CACHE_SIZE', 5000))
+LLM_VERDICT_TTL = int(os.getenv('LLM_VERDICT_TTL', 30 * 24 * 3600))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
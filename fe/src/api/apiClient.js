@@ -22,13 +22,15 @@ const apiClient = axios.create({
  * 
  * @param {number} studentId - id of the student.
  * @param {number} exampleId - id of the example.
+ * @param {string} [sessionId] - id of the practice session the record belongs to.
  * @returns {string} timestamp of record.
  */
-export const createRecord = async (studentId, exampleId) => {
+export const createRecord = async (studentId, exampleId, sessionId) => {
     try {
       const response = await apiClient.post('create-record/', {
         student_id: studentId,
         example_id: exampleId,
+        session_id: sessionId,
       });
 
       return response.data; 
@@ -77,6 +79,49 @@ export const skipExample = async (studentId, exampleId, date) => {
     }
 };
 
+/**
+ * Starts a practice session whose attempts are sent in batches.
+ * 
+ * @param {number} studentId - id of the student.
+ * @returns {Promise<Object>} session id and time of the start.
+ */
+export const createPracticeSession = async (studentId) => {
+  try {
+    const response = await apiClient.post('practice-sessions/', {
+      student_id: studentId,
+    });
+
+    return response.data;
+
+  } catch (error) {
+    throw error.response?.data?.error || 'Error creating practice session.';
+  }
+};
+
+/**
+ * Sends a batch of attempts of the practice session, a batch repeated with the same key is not applied again.
+ * 
+ * @param {string} sessionId - id of the practice session.
+ * @param {Array<Object>} attempts - attempts with example_id, duration, solved and skipped.
+ * @param {string} idempotencyKey - key of the batch.
+ * @param {boolean} finished - practice session ended with this batch.
+ * @returns {Promise<Object>} states of the records and whether the batch was applied before.
+ */
+export const addPracticeAttempts = async (sessionId, attempts, idempotencyKey, finished) => {
+  try {
+    const response = await apiClient.post(`practice-sessions/${sessionId}/attempts/`, {
+      attempts,
+      idempotency_key: idempotencyKey,
+      finished,
+    });
+
+    return response.data;
+
+  } catch (error) {
+    throw error.response?.data?.error || 'Error sending practice attempts.';
+  }
+};
+
 /**
  * Creates or updates a task along with its associated examples.
  * 
@@ -134,13 +179,17 @@ export const getSkill = async (id) => {
  * Fetches a list of examples based on the provided skill ids.
  * 
  * @param {Array<string|number>} topics - array of skill or topic identifiers.
+ * @param {number} [limit] - maximum count of examples, all matching examples are returned if omitted.
+ * @param {string|number} [seed] - seed of the random example selection.
  * @returns {Promise<Array<Object>>} list of example objects.
  */
-export const getExamples = async (topics) => {
+export const getExamples = async (topics, limit, seed) => {
   try {
     const response = await apiClient.get('examples/', {
       params: {
         topics: JSON.stringify(topics),
+        limit,
+        seed,
       },
       paramsSerializer: (params) => {
         return qs.stringify(params, { arrayFormat: 'repeat' });
@@ -424,9 +473,11 @@ export const loginAdmin = async (username, password) => {
  * @param {number} duration - elapsed time user practiced example.
  * @param {string} student_answer - users answer.
  * @param {string} answer_type - type of answer type ('inline', 'frac', 'var').
+ * @param {string} [session_id] - id of the practice session, the answer is then only evaluated.
+ * @param {number} [attempts] - attempts of the example in the session before this answer.
  * @returns {Promise<Object>} evaluation result from the server.
  */
-export const checkAnswer = async (student_id, example_id, date, duration, student_answer, answer_type) => {
+export const checkAnswer = async (student_id, example_id, date, duration, student_answer, answer_type, session_id, attempts) => {
   try {
     const response = await apiClient.post('check-answer/', {
       student_id,
@@ -434,7 +485,9 @@ export const checkAnswer = async (student_id, example_id, date, duration, studen
       date,
       duration,
       student_answer,
-      answer_type
+      answer_type,
+      session_id,
+      attempts
     });
 
     return response.data;
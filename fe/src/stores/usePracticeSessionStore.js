@@ -0,0 +1,112 @@
+/**
+ * ================================================================================
+ * File: usePracticeSessionStore.js
+ * Description:
+ *       Pinia store for managing the practice session, attempts of typed answers
+ *       and skips are collected and sent to the server in batches. A batch which
+ *       was not delivered is sent again with the same key, so it is not applied twice.
+ * Author: Dominik Horut (xhorut01)
+ * ================================================================================
+ */
+
+import { defineStore } from 'pinia';
+import { ref } from 'vue';
+import { createPracticeSession, addPracticeAttempts } from '@/api/apiClient';
+
+// Number of attempts sent in one batch
+const BATCH_SIZE = 10;
+
+export const usePracticeSessionStore = defineStore('practiceSession', () => {
+
+  const sessionId = ref(null);
+
+  // Attempts not sent yet and batches waiting for delivery
+  let pending = [];
+  let batches = [];
+  let batchCount = 0;
+
+  // Batches are sent one after another
+  let sending = Promise.resolve();
+
+  // Start a new practice session
+  const start = async (studentId) => {
+    // Undelivered batches of the previous session keep its id and are still sent
+    pending = [];
+    batchCount = 0;
+
+    const session = await createPracticeSession(studentId);
+    sessionId.value = session.session_id;
+  };
+
+  // Add an attempt of a typed answer
+  const addAttempt = (exampleId, duration, solved) => {
+    pending.push({ example_id: exampleId, duration, solved });
+
+    if (pending.length >= BATCH_SIZE) {
+      flush();
+    }
+  };
+
+  // Add a skip of the example
+  const addSkip = (exampleId) => {
+    pending.push({ example_id: exampleId, skipped: true });
+
+    if (pending.length >= BATCH_SIZE) {
+      flush();
+    }
+  };
+
+  // Drop attempts of the example which were not sent yet
+  const discard = (exampleId) => {
+    pending = pending.filter(attempt => attempt.example_id !== exampleId);
+  };
+
+  // Send the collected attempts, the last batch of the session is marked as finished
+  const flush = (finished = false) => {
+    if (sessionId.value && (pending.length > 0 || finished)) {
+      batchCount++;
+      batches.push({
+        sessionId: sessionId.value,
+        attempts: pending,
+        key: `${batchCount}`,
+        finished,
+      });
+      pending = [];
+    }
+
+    sending = sending.then(sendBatches);
+    return sending;
+  };
+
+  // Send waiting batches in order, the rest is sent again with the next flush
+  const sendBatches = async () => {
+    while (batches.length > 0) {
+      const batch = batches[0];
+
+      try {
+        await addPracticeAttempts(batch.sessionId, batch.attempts, batch.key, batch.finished);
+      } catch (error) {
+        console.error("Error sending practice attempts:", error);
+        return;
+      }
+
+      batches.shift();
+    }
+  };
+
+  // Send the remaining attempts and end the session
+  const finish = async () => {
+    await flush(true);
+    sessionId.value = null;
+  };
+
+  return {
+    sessionId,
+    start,
+    addAttempt,
+    addSkip,
+    discard,
+    flush,
+    finish,
+  };
+});
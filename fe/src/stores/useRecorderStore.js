@@ -11,6 +11,8 @@
 import { defineStore } from "pinia";
 import { ref, onUnmounted } from "vue";
 import { useLanguageStore } from "./useLanguageStore";
+import { useToastStore } from "./useToastStore";
+import { dictionary } from "@/utils/dictionary";
 
 export const useRecorderStore = defineStore("recorder", () => {
 
@@ -30,6 +32,9 @@ export const useRecorderStore = defineStore("recorder", () => {
   const continueWithNext = ref(null);
   const student_answer = ref(null);
 
+  // Live transcript of the answer being spoken
+  const interim_transcript = ref('');
+
   // User allowed his voice to be recorded
   const allowedRecording = ref(false);
 
@@ -49,6 +54,28 @@ export const useRecorderStore = defineStore("recorder", () => {
     emitFunction = emit;
   };
 
+  // Notify user that the result sent early was changed by the final transcript, the example was already left
+  const showRetraction = (data) => {
+    const langStore = useLanguageStore();
+    const toastStore = useToastStore();
+    const texts = dictionary[langStore.language];
+
+    let message = texts.retractedResult;
+
+    // Final transcript was evaluated as an answer
+    if (data.isCorrect !== undefined) {
+      isCorrect.value = data.isCorrect;
+      student_answer.value = data.student_answer;
+      message += `: ${data.student_answer} (${data.isCorrect ? texts.retractedCorrect : texts.retractedIncorrect})`;
+    }
+
+    toastStore.addToast({
+      message: message,
+      type: 'warning',
+      visible: true,
+    });
+  };
+
   // AudioWorklet processor code as a string
   const processorCode = `
     class PCMProcessor extends AudioWorkletProcessor {
@@ -117,9 +144,29 @@ export const useRecorderStore = defineStore("recorder", () => {
         // Handle incoming WebSocket messages - answer evaluation results
         ws.onmessage = (event) => {
           const data = JSON.parse(event.data);
-          
+
+          // Interim transcript of the answer being spoken
+          if(data.interim !== undefined){
+            interim_transcript.value = data.interim;
+
+          // Reply to the audio format sent in metadata
+          } else if(data.format !== undefined || data.format_error !== undefined){
+            if (data.format_error) {
+              console.error("Audio format not accepted:", data.format_error);
+            }
+
+          // Final transcript did not confirm the result sent early, the example was already left
+          } else if(data.retracted == true){
+            interim_transcript.value = '';
+            showRetraction(data);
+
+          // Final transcript of survey answer
+          } else if(data.transcription !== undefined){
+            interim_transcript.value = '';
+
           // User skipped the question by voice
-          if(data.skipped == true){
+          } else if(data.skipped == true){
+            interim_transcript.value = '';
             // Update ExampleView
             if (emitFunction) {
               emitFunction("skipped", {skipped: true});
@@ -127,6 +174,7 @@ export const useRecorderStore = defineStore("recorder", () => {
           
           // User terminated practice by voice
           } else if(data.finished == true){
+            interim_transcript.value = '';
             // Update ExampleView
             if (emitFunction) {
               emitFunction("finished");
@@ -134,6 +182,7 @@ export const useRecorderStore = defineStore("recorder", () => {
           
           // User answered the question by voice
           } else {
+            interim_transcript.value = '';
             isCorrect.value = data.isCorrect;
             continueWithNext.value = data.continue_with_next;
             student_answer.value = data.student_answer;
@@ -286,6 +335,7 @@ export const useRecorderStore = defineStore("recorder", () => {
     isCorrect,
     continueWithNext,
     student_answer,
+    interim_transcript,
     setEmitFunction,
     changeASRLanguage,
   };
@@ -59,6 +59,9 @@ export const dictionary = {
         clickMicText: "Klikni na mikrofon a odpověz prosím na otázku",
         chooseOptionText: "Vyber možnost která pro tebe platí",
         searchPlaceholderText: "Napiš název cvičení, které hledáš",
+        retractedResult: "Předchozí odpověď byla po dokončení přepisu vyhodnocena jinak",
+        retractedCorrect: "správně",
+        retractedIncorrect: "špatně",
 
     },
 
@@ -112,6 +115,9 @@ export const dictionary = {
         clickMicText: "Click on the microphone and please answer the question",
         chooseOptionText: "Choose the option that applies to you",
         searchPlaceholderText: "Type the name of the exercise you are looking for",
+        retractedResult: "Your previous answer was evaluated differently after the full transcript",
+        retractedCorrect: "correct",
+        retractedIncorrect: "incorrect",
     }
 };
 